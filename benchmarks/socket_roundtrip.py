@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# benchmarks/socket_roundtrip.py
+"""
+Round-trip latency of the menu framing over loopback TCP vs a UNIX domain socket.
+
+An echo server answers every frame with the same frame, using the same send_frame/recv_frame
+as socket-server/socket-client. Connection setup is timed separately from the round trips.
+
+    python benchmarks/socket_roundtrip.py --iterations 5000 --size 64 --size 65536
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from menu_manager.payload import send_frame, recv_frame
+from core.core_service import bind_unix_listener
+
+
+def echo(listener):
+    conn, _ = listener.accept()
+    with conn:
+        while (frame := recv_frame(conn)) is not None:
+            send_frame(conn, frame)
+
+
+def open_transport(kind, directory):
+    """Returns (listener, address, family) for 'tcp' or 'unix'."""
+    if kind == "unix":
+        path = os.path.join(directory, "bench.sock")
+        return bind_unix_listener(path), path, socket.AF_UNIX
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    return listener, listener.getsockname(), socket.AF_INET
+
+
+def measure(kind, sizes, iterations, directory):
+    listener, address, family = open_transport(kind, directory)
+    server = threading.Thread(target=echo, args=(listener,), daemon=True)
+    server.start()
+
+    client = socket.socket(family, socket.SOCK_STREAM)
+    start = time.perf_counter()
+    client.connect(address)
+    connect_us = (time.perf_counter() - start) * 1e6
+    if family == socket.AF_INET:
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    results = {}
+    with client:
+        for size in sizes:
+            payload = b"x" * size
+            for _ in range(min(100, iterations)):  # Warm up
+                send_frame(client, payload)
+                recv_frame(client)
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                send_frame(client, payload)
+                recv_frame(client)
+                samples.append((time.perf_counter() - start) * 1e6)
+            samples.sort()
+            results[size] = (statistics.median(samples), samples[int(len(samples) * 0.99) - 1])
+    server.join()
+    listener.close()
+    return connect_us, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare frame round-trip latency over TCP and UNIX sockets")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--size", type=int, action="append", help="Payload size in bytes (repeatable)")
+    args = parser.parse_args()
+    sizes = args.size or [64, 4096, 256 * 1024]
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'transport':<10}{'size':>10}{'median us':>12}{'p99 us':>12}")
+        for kind in ("tcp", "unix"):
+            connect_us, results = measure(kind, sizes, args.iterations, directory)
+            for size, (median, p99) in results.items():
+                print(f"{kind:<10}{size:>10}{median:>12.1f}{p99:>12.1f}")
+            print(f"{kind:<10}{'connect':>10}{connect_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,41 +3,72 @@
 # Plugins can run on server or client side.
 
 import os
+import signal
 import socket
 import selectors
 import threading
 import json
+import logging
 from pathlib import Path
 
 SOCKET_PATH = "/tmp/workspace_manager.sock"
 
+def bind_unix_listener(socket_path):
+    """
+    Returns a listening AF_UNIX socket at `socket_path`. It is bound and listening under a
+    temporary name first and then renamed into place, so a client that can see the socket
+    file can always connect and nobody has to retry on ECONNREFUSED. A stale socket file
+    from a previous run is replaced.
+    """
+    tmp_path = f"{socket_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(tmp_path)
+    sock.listen()
+    os.replace(tmp_path, socket_path)
+    return sock
+
 # --- Server Side ---
 
 class WorkspaceServer:
+    """
+    Clients get a full `snapshot` of the workspace when they connect (or ask to `resync`), then
+    only `delta` messages with a sequence number, so a client that sees a gap knows to resync.
+    Writes are queued per client and flushed when the socket is writable; a client whose queue
+    grows past MAX_PENDING_BYTES isn't keeping up and is dropped.
+    """
+    MAX_PENDING_BYTES = 1 << 20
+
     def __init__(self, socket_path):
         self.socket_path = socket_path
         self.sel = selectors.DefaultSelector()
-        self.clients = {}
+        self.clients = {}  # conn -> bytes received but not yet a full line
+        self.outbox = {}  # conn -> bytearray waiting for EVENT_WRITE
         self.workspace = set()  # current files in workspace
+        self.seq = 0  # sequence number of the last delta
 
     def start(self):
-        if os.path.exists(self.socket_path):
-            os.remove(self.socket_path)
-        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.sock.bind(self.socket_path)
-        self.sock.listen()
+        self.sock = bind_unix_listener(self.socket_path)
         self.sock.setblocking(False)
         self.sel.register(self.sock, selectors.EVENT_READ, self.accept)
         threading.Thread(target=self.event_loop, daemon=True).start()
         print("Server started")
 
-    def accept(self, sock):
+    def accept(self, sock, mask=None):
         conn, _ = sock.accept()
         conn.setblocking(False)
-        self.sel.register(conn, selectors.EVENT_READ, self.read)
+        self.sel.register(conn, selectors.EVENT_READ, self.on_event)
         self.clients[conn] = b""
+        self.outbox[conn] = bytearray()
         self.send_state(conn)
 
+    def on_event(self, conn, mask):
+        if mask & selectors.EVENT_WRITE:
+            self.flush(conn)
+        if mask & selectors.EVENT_READ and conn in self.clients:
+            self.read(conn)
+
     def read(self, conn):
         try:
             data = conn.recv(4096)
@@ -45,7 +76,8 @@ class WorkspaceServer:
                 self.disconnect(conn)
                 return
             self.clients[conn] += data
-            while b"\n" in self.clients[conn]:
+            # A reply can get the client dropped, so check it's still here
+            while conn in self.clients and b"\n" in self.clients[conn]:
                 line, rest = self.clients[conn].split(b"\n", 1)
                 self.clients[conn] = rest
                 self.handle_message(conn, line)
@@ -59,38 +91,160 @@ class WorkspaceServer:
             return
         if msg.get("action") == "add_file":
             f = msg.get("file")
-            if f:
+            if f and f not in self.workspace:
                 self.workspace.add(f)
-                self.broadcast_state()
+                self.broadcast_delta(added=[f])
         elif msg.get("action") == "remove_file":
             f = msg.get("file")
             if f and f in self.workspace:
                 self.workspace.remove(f)
-                self.broadcast_state()
+                self.broadcast_delta(removed=[f])
+        elif msg.get("action") == "resync":
+            self.send_state(conn)
 
     def send_state(self, conn):
-        state = json.dumps({"type": "state", "workspace": list(self.workspace)}) + "\n"
-        conn.send(state.encode())
+        state = json.dumps({"type": "snapshot", "seq": self.seq, "workspace": list(self.workspace)}) + "\n"
+        self.queue(conn, state.encode())
 
-    def broadcast_state(self):
-        state = json.dumps({"type": "state", "workspace": list(self.workspace)}) + "\n"
+    def broadcast_delta(self, added=(), removed=()):
+        self.seq += 1
+        delta = json.dumps({"type": "delta", "seq": self.seq, "added": list(added), "removed": list(removed)}) + "\n"
+        data = delta.encode()  # Serialized once for every client
         for c in list(self.clients):
-            try:
-                c.send(state.encode())
-            except Exception:
-                self.disconnect(c)
+            self.queue(c, data)
+
+    def queue(self, conn, data):
+        pending = self.outbox.get(conn)
+        if pending is None:
+            return
+        # Checked before appending, so one large snapshot never counts as lagging
+        if len(pending) > self.MAX_PENDING_BYTES:
+            logging.warning(f"[Server] Dropping client with {len(pending)} unsent bytes")
+            self.disconnect(conn)
+            return
+        was_empty = not pending
+        pending += data
+        if was_empty:
+            self.flush(conn)
+
+    def flush(self, conn):
+        """Writes as much as the socket takes now and waits for EVENT_WRITE for the rest."""
+        pending = self.outbox.get(conn)
+        if pending is None:
+            return
+        try:
+            sent = conn.send(pending) if pending else 0
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.disconnect(conn)
+            return
+        del pending[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+        if self.sel.get_key(conn).events != events:
+            self.sel.modify(conn, events, self.on_event)
 
     def disconnect(self, conn):
+        if conn not in self.clients:
+            return
         self.sel.unregister(conn)
         conn.close()
         del self.clients[conn]
+        self.outbox.pop(conn, None)
 
     def event_loop(self):
         while True:
             events = self.sel.select()
             for key, mask in events:
                 callback = key.data
-                callback(key.fileobj)
+                callback(key.fileobj, mask)
+
+# --- Daemon ---
+
+class WorkspaceDaemon(WorkspaceServer):
+    """
+    Long-running server for selector clients (socket-client, rofi/fzf keybindings).
+    One warm State (workspace, cache, watchers) lives for the life of the process; every
+    accepted connection gets its own MenuManager session on a worker thread, so any number
+    of launchers can be open at once and none of them pays for startup. `session_factory`
+    should give each session its own view of the State (State.session_view()). "Exit
+    Application" ends that client's session; the daemon runs until SIGINT/SIGTERM.
+    """
+    def __init__(self, socket_path, session_factory, session_timeout=None, query_handler=None):
+        super().__init__(socket_path)
+        self.session_factory = session_factory # Returns a MenuManager with its own view of the shared State
+        self.query_handler = query_handler # (source, text, limit) -> top results, for query clients
+        self.sessions = set()
+        self._sessions_lock = threading.Lock() # Session threads add and remove themselves
+        self._stopped = threading.Event()
+        self.registry = None # With a session timeout, sessions survive their client disconnecting
+        if session_timeout:
+            from menu_manager.session import SessionRegistry
+            self.registry = SessionRegistry(session_factory, session_timeout)
+
+    def accept(self, sock, mask=None):
+        conn, _ = sock.accept()
+        conn.setblocking(True) # Menu sessions use blocking request/response I/O
+        threading.Thread(target=self.run_session, args=(conn,), daemon=True).start()
+
+    def run_session(self, conn):
+        from menu_manager.interface import serve_connection, serve_query
+        from menu_manager.protocol import MenuChannel
+        try:
+            hello = MenuChannel.read_hello(conn)
+        except (OSError, ConnectionError) as e:
+            conn.close()
+            print(f"[Daemon] Session error: {e}")
+            return
+        if hello and "query" in hello and self.query_handler is not None:
+            with conn:
+                try:
+                    serve_query(conn, hello, self.query_handler)
+                except OSError as e:
+                    logging.debug(f"[Daemon] Query client went away: {e}")
+            return
+        if self.registry is not None:
+            with conn:
+                try:
+                    self.registry.serve(conn, hello)
+                except Exception as e:
+                    print(f"[Daemon] Session error: {e}")
+            return
+        manager = self.session_factory()
+        with self._sessions_lock:
+            self.sessions.add(manager)
+            active = len(self.sessions)
+        logging.info(f"[Daemon] Session started ({active} active)")
+        try:
+            with conn:
+                serve_connection(manager, conn, MenuChannel.from_hello(conn, hello))
+        except Exception as e:
+            print(f"[Daemon] Session error: {e}")
+        finally:
+            with self._sessions_lock:
+                self.sessions.discard(manager)
+                active = len(self.sessions)
+            logging.info(f"[Daemon] Session ended ({active} active)")
+
+    def serve_forever(self, ready_fd=None):
+        """Starts the accept loop and blocks until SIGINT/SIGTERM."""
+        from menu_manager.interface import signal_ready
+        self.start()
+        signal_ready(ready_fd)
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        print(f"Daemon listening on {self.socket_path}")
+        self._stopped.wait()
+
+    def stop(self):
+        try:
+            self.sel.unregister(self.sock)
+        except (KeyError, ValueError):
+            pass
+        self.sock.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._stopped.set()
 
 # --- Client Side ---
 
@@ -100,8 +254,9 @@ class WorkspaceClient:
         self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self.sock.connect(socket_path)
         self.buffer = b""
-        threading.Thread(target=self.listen, daemon=True).start()
         self.workspace = set()
+        self.seq = None  # None until the first snapshot, and while waiting for a resync
+        threading.Thread(target=self.listen, daemon=True).start()
 
     def listen(self):
         while True:
@@ -119,17 +274,31 @@ class WorkspaceClient:
             msg = json.loads(line.decode())
         except Exception:
             return
-        if msg.get("type") == "state":
+        if msg.get("type") == "snapshot":
             self.workspace = set(msg.get("workspace", []))
+            self.seq = msg.get("seq", 0)
+            print("Workspace updated:", self.workspace)
+        elif msg.get("type") == "delta":
+            if self.seq is None:
+                return  # Resync requested; the snapshot will include this change
+            if msg.get("seq") != self.seq + 1:
+                logging.warning(f"[Client] Missed deltas {self.seq + 1}..{msg.get('seq') - 1}, resyncing")
+                self.seq = None
+                self.send({"action": "resync"})
+                return
+            self.seq = msg["seq"]
+            self.workspace.update(msg.get("added", []))
+            self.workspace.difference_update(msg.get("removed", []))
             print("Workspace updated:", self.workspace)
 
+    def send(self, msg):
+        self.sock.sendall((json.dumps(msg) + "\n").encode())
+
     def add_file(self, filepath):
-        msg = {"action": "add_file", "file": filepath}
-        self.sock.send((json.dumps(msg) + "\n").encode())
+        self.send({"action": "add_file", "file": filepath})
 
     def remove_file(self, filepath):
-        msg = {"action": "remove_file", "file": filepath}
-        self.sock.send((json.dumps(msg) + "\n").encode())
+        self.send({"action": "remove_file", "file": filepath})
 
 # --- Usage Example ---
 
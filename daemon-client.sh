@@ -0,0 +1,17 @@
+#!/usr/bin/env bash
+# set -x
+source /srv/projects/editor-menu/editor.sh
+
+socket=/tmp/workspace_manager.sock
+client=(--interface=socket-client --frontend=rofi --socket-path="$socket" --session-file=/tmp/workspace_manager.session)
+
+if [[ -S "$socket" ]]; then
+    run "${client[@]}"
+else
+    # No daemon yet: start one, and connect as soon as it says it is listening (no polling)
+    ready=$(mktemp -u /tmp/workspace_manager.ready.XXXXXX)
+    mkfifo "$ready"
+    setsid "$root_dir/daemon.sh" --ready-fd=3 3>"$ready" >/dev/null 2>&1 &
+    run "${client[@]}" --ready-fd=3 3<"$ready"
+    rm -f "$ready"
+fi
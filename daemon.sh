@@ -0,0 +1,11 @@
+#!/usr/bin/env bash
+# set -x
+readarray -t projects < <(find /srv/projects -mindepth 1 -maxdepth 1 -type d)
+dirs=("$0" "${projects[@]}")
+
+source /srv/projects/editor-menu/editor.sh
+# echo "${dirs[@]}"
+
+# Keeps the workspace, cache and watchers warm; connect with daemon-client.sh
+# Extra arguments (e.g. --ready-fd) are passed on to the daemon
+run --cwd=/srv/projects --interface=daemon --socket-path=/tmp/workspace_manager.sock --session-timeout=900 --workspace-file=workspace.json "$@" -- "${dirs[@]}"
@@ -1,17 +1,16 @@
 # filesystem.py
 from pathlib import Path
+from filesystem.listing import directory_listings
 
 def list_directories(base_dir):
-    base = Path(base_dir)
     try:
-        return [p.name for p in base.iterdir() if p.is_dir()]
+        return directory_listings.get(base_dir).dirs()
     except Exception:
         return []
 
 def list_files(base_dir):
-    base = Path(base_dir)
     try:
-        return [p.name for p in base.iterdir() if p.is_file()]
+        return directory_listings.get(base_dir).files()
     except Exception:
         return []
 
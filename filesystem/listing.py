@@ -0,0 +1,368 @@
+# listing.py
+"""
+Cached directory listings for the browsing menus.
+
+A listing is read once with os.scandir (file types come from d_type, so no stat per child),
+sorted once (directories first, then by lowercased name) and kept in an LRU. Directories
+under a watched workspace root are trusted until the file watcher invalidates them, so going
+back and forth costs no syscalls. The watcher doesn't follow symlinks, so that only applies
+to paths with no symlink in them (checked once, when the listing is read). Anything else is
+re-checked with one stat of the directory: an unchanged mtime means an unchanged listing.
+
+While a menu is open, prefetch() loads the directories the user is likely to open next on a
+small thread pool, so descending a level usually finds the listing ready (or being read, in
+which case get() waits for that read instead of starting another; one still queued behind
+other prefetches is cancelled and read right away).
+
+Directories with more than LARGE_DIRECTORY_ENTRIES entries come back as a LargeListing: a
+sorted preview right away, the full sort in the background (see LargeListing).
+"""
+import fnmatch
+import heapq
+import itertools
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+LISTING_CACHE_SIZE = 512  # Directories kept
+RACY_WINDOW_NS = 2_000_000_000  # A listing this close to the directory's mtime may have missed a change
+PREFETCH_LIMIT = 32  # Directories prefetched per menu
+PREFETCH_SCAN = 2000  # Candidates looked at per menu; huge directories only get their first ones
+PREFETCH_WORKERS = 4
+LARGE_DIRECTORY_ENTRIES = 20_000  # Bigger directories are sorted in the background
+PREVIEW_ENTRIES = 1000  # Shown from a large directory while the rest is sorted
+RUN_ENTRIES = 100_000  # Entries sorted in memory at a time; sorted runs are merged from disk
+SPILL_CHUNK = 4096  # Entries per pickle in a spill file
+
+
+def _sort_key(entry):
+    return (not entry[1], entry[0].lower())
+
+def name_filter(pattern):
+    """Case-insensitive test for names: a glob if `pattern` has wildcards, else a substring."""
+    pattern = pattern.lower()
+    if any(c in pattern for c in "*?["):
+        return lambda name: fnmatch.fnmatchcase(name.lower(), pattern)
+    return lambda name: pattern in name.lower()
+
+def _spill(path, entries):
+    it = iter(entries)
+    with open(path, "wb") as f:
+        while chunk := list(itertools.islice(it, SPILL_CHUNK)):
+            pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+
+def _unspill(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+
+class Listing:
+    """
+    One directory's entries as (name, is_dir), directories first, then by lowercased name.
+    `special` names the entries that are neither directories nor regular files (broken
+    symlinks, FIFOs, sockets, devices): they are listed, but files() leaves them out.
+    """
+    __slots__ = ("path", "mtime_ns", "racy", "entries", "special", "canonical", "_kinds", "_display")
+    partial = False  # True for a LargeListing, whose `entries` are only a preview
+
+    def __init__(self, path, mtime_ns, entries, racy=False, special=frozenset()):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.racy = racy
+        self.entries = entries
+        self.special = special
+        self.canonical = False  # `path` has no symlink in it; set by the cache
+        self._kinds = None
+        self._display = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_dir(self, name):
+        """True/False for a listed name, None if it isn't in the listing."""
+        if self._kinds is None:
+            self._kinds = dict(self.entries)
+        return self._kinds.get(name)
+
+    def dirs(self):
+        return [name for name, is_dir in self.entries if is_dir]
+
+    def files(self):
+        """Regular files (or symlinks to them), like Path.is_file()."""
+        special = self.special
+        return [name for name, is_dir in self.entries if not is_dir and name not in special]
+
+    def display(self):
+        """Names with a trailing slash on directories, as the browse menus show them."""
+        if self._display is None:
+            self._display = [f"{name}/" if is_dir else name for name, is_dir in self.entries]
+        return self._display
+
+
+class LargeListing(Listing):
+    """
+    A directory too big to read and sort before showing anything. `entries` is a preview: the
+    PREVIEW_ENTRIES first in sort order among the entries read so far (`head`, in directory
+    order), not the head of the whole directory. A thread reads the rest, sorts it in runs of
+    RUN_ENTRIES spilled to a temporary directory and merges the runs into one sorted spill,
+    so memory stays bounded however big the directory is. The spill goes away with the listing.
+    """
+    partial = True
+
+    def __init__(self, path, mtime_ns, head, it, racy, special):
+        # `special` is still being added to by the thread; files() waits for it to finish
+        super().__init__(path, mtime_ns, heapq.nsmallest(PREVIEW_ENTRIES, head, key=_sort_key), racy, special)
+        self.count = len(head)  # Entries read so far
+        self.previewed_from = len(head)
+        self.done = threading.Event()
+        self.error = None
+        self._tmp = tempfile.TemporaryDirectory(prefix="listing-")
+        self._sorted = os.path.join(self._tmp.name, "sorted")
+        threading.Thread(target=self._sort_rest, args=(head, it), daemon=True).start()
+
+    def _sort_rest(self, buffer, it):
+        runs = []
+        try:
+            with it:
+                while True:
+                    buffer.extend(_read_entry(entry, self.special) for entry in itertools.islice(it, RUN_ENTRIES - len(buffer)))
+                    self.count = len(runs) * RUN_ENTRIES + len(buffer)
+                    if buffer:
+                        buffer.sort(key=_sort_key)
+                        runs.append(os.path.join(self._tmp.name, f"run{len(runs)}"))
+                        _spill(runs[-1], buffer)
+                    if len(buffer) < RUN_ENTRIES:
+                        break
+                    buffer = []
+            _spill(self._sorted, heapq.merge(*map(_unspill, runs), key=_sort_key))
+            for run in runs:
+                os.remove(run)
+            logging.debug(f"[Listing] Sorted {self.count} entries of {self.path} in {len(runs)} runs")
+        except Exception as e:
+            logging.error(f"[Listing] Sorting {self.path} failed: {e}")
+            self.error = e
+        finally:
+            self.done.set()
+
+    def __len__(self):
+        return self.count
+
+    def iter_entries(self):
+        """Every entry, sorted. Waits for the background sort."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return _unspill(self._sorted)
+
+    def dirs(self):
+        return [name for name, is_dir in self.iter_entries() if is_dir]
+
+    def files(self):
+        entries = self.iter_entries()
+        special = self.special
+        return [name for name, is_dir in entries if not is_dir and name not in special]
+
+    def matching(self, pattern, limit=LARGE_DIRECTORY_ENTRIES):
+        """
+        Sorted entries whose name matches `pattern` (see name_filter), at most `limit`. The filter
+        runs while reading: over the sorted spill once it's ready, else over the directory itself.
+        """
+        test = name_filter(pattern)
+        if self.done.is_set() and self.error is None:
+            return list(itertools.islice((e for e in self.iter_entries() if test(e[0])), limit))
+        with os.scandir(self.path) as it:
+            matches = list(itertools.islice(((entry.name, _is_dir(entry)) for entry in it if test(entry.name)), limit))
+        matches.sort(key=_sort_key)
+        return matches
+
+
+def _is_dir(entry):
+    try:
+        return entry.is_dir()  # d_type; only symlinks (and DT_UNKNOWN filesystems) need a stat
+    except OSError:
+        return False
+
+def _read_entry(entry, special):
+    """(name, is_dir) of a scandir entry; adds its name to `special` if it's not a directory or regular file."""
+    is_dir = _is_dir(entry)
+    if not is_dir:
+        try:
+            is_file = entry.is_file()
+        except OSError:
+            is_file = False
+        if not is_file:
+            special.add(entry.name)
+    return entry.name, is_dir
+
+def scan_directory(path) -> Listing:
+    """Reads and sorts one directory. Raises OSError if it can't be listed."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    it = os.scandir(path)
+    special = set()
+    try:
+        entries = [_read_entry(entry, special) for entry in itertools.islice(it, LARGE_DIRECTORY_ENTRIES + 1)]
+    except OSError:
+        it.close()
+        raise
+    racy = time.time_ns() - mtime_ns < RACY_WINDOW_NS
+    if len(entries) > LARGE_DIRECTORY_ENTRIES:
+        return LargeListing(path, mtime_ns, entries, it, racy, special)  # Its thread reads the rest of `it`
+    it.close()
+    entries.sort(key=_sort_key)
+    return Listing(path, mtime_ns, entries, racy, special)
+
+
+class DirectoryListingCache:
+    def __init__(self, capacity=LISTING_CACHE_SIZE):
+        self.capacity = capacity
+        self._listings = OrderedDict()  # absolute path -> Listing, least recently used first
+        self._watched = set()  # Roots whose changes reach invalidate()
+        self._lock = threading.Lock()
+        self._inflight = {}  # path -> Future of a prefetch reading it
+        self._wanted = {}  # path -> latest generation whose menu asked to prefetch it
+        self._visits = {}  # path -> when the menus last opened it, to prefetch favourites first
+        self._generation = 0  # Bumped per prefetch(); queued work for older menus is skipped
+        self._executor = None
+        self._epoch = 0  # Bumped by invalidate(), so a read that raced a change isn't cached
+
+    def _is_watched(self, path):
+        return any(path == root or path.startswith(root + os.sep) for root in self._watched)
+
+    def _cached(self, key):
+        """The cached listing of `key` if it's still valid, else None."""
+        with self._lock:
+            listing = self._listings.get(key)
+            if listing is None:
+                return None
+            self._listings.move_to_end(key)
+            if listing.canonical and self._is_watched(key):
+                return listing
+        if listing.partial and not listing.done.is_set():
+            return listing  # Still sorting; a rescan would only start over (and never finish on a busy directory)
+        if listing.racy:
+            return None
+        try:
+            if os.stat(key).st_mtime_ns == listing.mtime_ns:
+                return listing
+        except OSError:
+            pass
+        return None
+
+    def _load(self, key):
+        epoch = self._epoch
+        listing = scan_directory(key)
+        # Through a symlink the watcher never reports changes, however "under" a root it looks
+        listing.canonical = os.path.realpath(key) == key
+        with self._lock:
+            if epoch != self._epoch:
+                return listing  # Something changed while reading; good for now, not for later
+            self._listings[key] = listing
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.capacity:
+                self._listings.popitem(last=False)
+        return listing
+
+    def get(self, path) -> Listing:
+        """The listing of `path`, from the cache when it's still valid. Raises OSError."""
+        key = os.path.abspath(path)
+        with self._lock:
+            self._visits[key] = time.monotonic()
+            if len(self._visits) > 4 * self.capacity:
+                for old in sorted(self._visits, key=self._visits.get)[:self.capacity]:
+                    del self._visits[old]
+            inflight = self._inflight.get(key)
+        listing = self._cached(key)
+        if listing is not None:
+            return listing
+        if inflight is not None:
+            if inflight.cancel():
+                # Still queued behind other prefetches: reading it now beats waiting for them
+                with self._lock:
+                    if self._inflight.get(key) is inflight:
+                        del self._inflight[key]
+                        self._wanted.pop(key, None)
+            else:
+                listing = inflight.result()  # Being read right now (or just done); no second read
+                if listing is not None:
+                    return listing
+        return self._load(key)
+
+    def prefetch(self, paths):
+        """
+        Reads the listings of `paths` in the background, recently opened ones first, at most
+        PREFETCH_LIMIT of them. Work still queued from an earlier call is dropped.
+        """
+        candidates = [os.path.abspath(p) for p in itertools.islice(paths, PREFETCH_SCAN)]
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            visits = self._visits
+            # Stable sort: favourites by recency, then the rest in menu order
+            candidates.sort(key=lambda key: -visits.get(key, 0.0))
+            chosen = candidates[:PREFETCH_LIMIT]
+            if not chosen:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="listing-prefetch")
+            for key in chosen:
+                # Still queued from an older menu: re-tagged, so it runs for this one too
+                self._wanted[key] = generation
+                if key not in self._inflight:
+                    self._inflight[key] = self._executor.submit(self._prefetch_one, key)
+
+    def _prefetch_one(self, key):
+        with self._lock:
+            if self._wanted.get(key) != self._generation:
+                # The user has moved on. Dropped under the lock, so prefetch() either re-tags
+                # this future before the check or submits a new one after it
+                self._inflight.pop(key, None)
+                self._wanted.pop(key, None)
+                return None
+        try:
+            listing = self._cached(key)
+            return self._load(key) if listing is None else listing
+        except OSError as e:
+            logging.debug(f"[Listing] Prefetch of {key} failed: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._wanted.pop(key, None)
+
+    def invalidate(self, path):
+        """Forgets the listings that a change to `path` affects: its parent's, its own and any below it."""
+        key = os.path.abspath(path)
+        prefix = key + os.sep
+        with self._lock:
+            self._epoch += 1
+            self._listings.pop(os.path.dirname(key), None)
+            for cached in [p for p in self._listings if p == key or p.startswith(prefix)]:
+                del self._listings[cached]
+
+    def watch(self, root):
+        """Trust listings under `root` until invalidated; the caller feeds watcher events to invalidate()."""
+        key = os.path.realpath(root)  # Trusted listings have symlink-free paths
+        self.invalidate(key)  # Changes made before the watch started were never reported
+        with self._lock:
+            self._watched.add(key)
+
+    def unwatch(self, root):
+        with self._lock:
+            self._watched.discard(os.path.realpath(root))
+
+    def clear(self):
+        with self._lock:
+            self._listings.clear()
+
+
+directory_listings = DirectoryListingCache()  # Shared by the menus and the workspace's file watcher
@@ -0,0 +1,107 @@
+# filters/blacklist.py
+import logging
+import re
+
+# required_literal reads the regex parser's private parse tree, which isn't a stable API. Checked
+# on CPython 3.11 (re._parser); 3.10 and older ship it as sre_parse. If it's missing or its layout
+# changes, required_literal just returns None and patterns are matched without a prefilter.
+try:
+    from re import _parser as sre_parse, _constants as sre_constants  # Python 3.11+
+except ImportError:
+    try:
+        import sre_parse, sre_constants
+    except ImportError:
+        sre_parse = sre_constants = None
+
+# Patterns with backreferences can't be merged into one alternation without renumbering their groups
+_BACKREF = re.compile(r'\\[1-9]|\(\?P=')
+
+def required_literal(pattern: str) -> str | None:
+    """
+    Returns the longest run of literal characters that every match of `pattern` must contain,
+    or None if there isn't one (alternation at the top level, case-insensitive, unparsable...).
+    Only top-level literals are considered, which is conservative but always correct.
+    """
+    try:
+        literal = _top_level_literal(pattern)
+    except Exception as e:
+        logging.debug(f"[required_literal] No prefilter for {pattern!r}: {e!r}")
+        return None
+    return literal if isinstance(literal, str) and literal else None
+
+def _top_level_literal(pattern: str) -> str | None:
+    if sre_parse is None:
+        return None
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    flags = parsed.state.flags if hasattr(parsed, 'state') else parsed.pattern.flags  # `pattern` before 3.8
+    if flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+
+    best, run = "", []
+    for op, arg in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(arg))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    if len(run) > len(best):
+        best = "".join(run)
+    return best or None
+
+
+def _compile_group(patterns: list[str]) -> list[re.Pattern]:
+    """Compiles patterns into a single alternation when possible, otherwise one regex each."""
+    if len(patterns) > 1 and not any(_BACKREF.search(p) for p in patterns):
+        try:
+            return [re.compile("|".join(f"(?:{p})" for p in patterns))]
+        except re.error:
+            pass  # e.g. inline global flags; fall back to separate regexes
+    return [re.compile(p) for p in patterns]
+
+
+class PatternMatcher:
+    """
+    Matches strings against a list of regex patterns with `re.search` semantics.
+    Patterns are validated and compiled once. Patterns that require a literal substring are
+    grouped by it and only run when `literal in text`; the rest share one combined regex.
+    """
+    def __init__(self, patterns=()):
+        self.patterns = list(patterns)
+        self._unconditional: list[re.Pattern] = []
+        self._guarded: list[tuple[str, list[re.Pattern]]] = []
+
+        by_literal: dict[str, list[str]] = {}
+        plain: list[str] = []
+        for pattern in self.patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                print(f"[ERROR] Invalid regex pattern in blacklist: '{pattern}' - {e}")
+                continue
+            literal = required_literal(pattern)
+            if literal:
+                by_literal.setdefault(literal, []).append(pattern)
+            else:
+                plain.append(pattern)
+
+        self._unconditional = _compile_group(plain) if plain else []
+        self._guarded = [(literal, _compile_group(group)) for literal, group in by_literal.items()]
+        logging.debug(f"PatternMatcher: {len(self.patterns)} patterns, {len(self._guarded)} literal-guarded groups, {len(plain)} unguarded.")
+
+    def __bool__(self):
+        return bool(self._unconditional or self._guarded)
+
+    def search(self, text: str) -> bool:
+        for literal, regexes in self._guarded:
+            if literal in text:
+                for regex in regexes:
+                    if regex.search(text):
+                        return True
+        for regex in self._unconditional:
+            if regex.search(text):
+                return True
+        return False
@@ -0,0 +1,310 @@
+# filters/fuzzy.py
+"""
+fzf-style fuzzy matching in-process, for selectors that don't run fzf themselves.
+
+A term matches an entry if its characters appear in order (a subsequence). Matches are scored
+like fzf's: points per matched character, bonuses for characters right after a path
+separator or word boundary and for consecutive runs, penalties for gaps. Space-separated
+terms must all match; the query is case-insensitive unless it has an uppercase letter.
+
+The subsequence test is one anchored regex per term (`[^a]*a[^b]*b...`), which runs in C and
+never backtracks; a second one with groups gives the match positions to score. A FuzzyMatcher
+also remembers the candidates of recent queries, so typing another character only re-checks
+the entries that matched the query before it.
+
+Scoring is the slow part, so when only the best `limit` matches are wanted they're scored
+shortest first. Once `limit` of them are kept, a longer entry only gets in with a higher score,
+and no entry can beat the bound in _Term.bound, so the scan stops when the worst kept match
+reaches it. A short query over a big list usually gets there after a few thousand entries.
+Callers that have to answer in time can also pass a deadline, after which the best of the
+entries scored so far is returned.
+"""
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import time
+
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY_WHITE = 10  # Start of the entry or after whitespace
+BONUS_BOUNDARY_DELIMITER = 9  # After a path separator
+BONUS_BOUNDARY = 8  # After other punctuation
+BONUS_CAMEL = 7  # fooBar, foo2
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+
+MEMO_DEPTH = 32  # Prefix queries remembered for narrowing (and backspacing)
+DEADLINE_CHECK = 1024  # Entries scored between looks at the clock
+
+_PREV_BONUS = {
+    " ": BONUS_BOUNDARY_WHITE, "\t": BONUS_BOUNDARY_WHITE,
+    "/": BONUS_BOUNDARY_DELIMITER, "\\": BONUS_BOUNDARY_DELIMITER,
+    "_": BONUS_BOUNDARY, "-": BONUS_BOUNDARY, ".": BONUS_BOUNDARY,
+    ":": BONUS_BOUNDARY, ",": BONUS_BOUNDARY, "(": BONUS_BOUNDARY, "[": BONUS_BOUNDARY,
+}
+
+_PAIR_BONUS = {}  # Bonus of a character by (previous, current) pair, filled as pairs are seen
+PAIR_BONUS_MAX = 1 << 16  # Pairs remembered, so odd input can't grow the table forever
+
+def _pair_bonus(prev: str, cur: str) -> int:
+    bonus = _PREV_BONUS.get(prev)
+    if bonus is not None:
+        return bonus
+    if (prev.islower() and cur.isupper()) or (cur.isdigit() and not prev.isdigit() and prev.isalpha()):
+        return BONUS_CAMEL
+    return 0
+
+def _bonus(text: str, i: int) -> int:
+    if i == 0:
+        return BONUS_BOUNDARY_WHITE
+    pair = text[i - 1:i + 1]
+    bonus = _PAIR_BONUS.get(pair)
+    if bonus is None:
+        bonus = _pair_bonus(pair[0], pair[1])
+        if len(_PAIR_BONUS) < PAIR_BONUS_MAX:
+            _PAIR_BONUS[pair] = bonus
+    return bonus
+
+def score_positions(text: str, positions) -> int:
+    """fzf-style score of matching `text` at `positions` (ascending)."""
+    score = 0
+    prev = -2
+    chunk_bonus = 0
+    first = True
+    for i in positions:
+        bonus = _bonus(text, i)
+        if i == prev + 1:
+            # A consecutive run keeps the bonus of the boundary it started on
+            if bonus < chunk_bonus:
+                bonus = chunk_bonus
+            elif bonus < BONUS_CONSECUTIVE:
+                bonus = BONUS_CONSECUTIVE
+            chunk_bonus = bonus
+        elif first:
+            bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+            chunk_bonus = bonus
+        else:
+            score += SCORE_GAP_START + SCORE_GAP_EXTENSION * (i - prev - 2)
+            chunk_bonus = bonus
+        score += SCORE_MATCH + bonus
+        prev = i
+        first = False
+    return score
+
+
+def _unbounded(entries, lengths) -> set[int]:
+    """Indices of the entries _Term.bound doesn't hold for: not starting with a separator, or with whitespace."""
+    text = "\n" + "\n".join(entries)  # Searched in C; usually nothing is found
+    hits = [m.start() for m in re.finditer(r"\n[^/\\]", text)]
+    for c in " \t":
+        i = text.find(c)
+        while i != -1:
+            hits.append(i)
+            i = text.find(c, i + 1)
+    if not hits:
+        return set()
+    starts = list(itertools.accumulate((n + 1 for n in lengths), initial=0))
+    return {bisect.bisect_right(starts, i) - 1 for i in hits}
+
+
+def _subsequence(term: str, flags: int = 0, groups: bool = True) -> re.Pattern:
+    pattern = "[^{0}]*({0})" if groups else "[^{0}]*{0}"
+    return re.compile("".join(pattern.format(re.escape(c)) for c in term), flags)
+
+
+class _Term:
+    """One query term: regexes to filter (lowercased) entries by it, and to score matches."""
+    def __init__(self, term: str, ignore_case: bool):
+        flags = re.IGNORECASE if ignore_case else 0
+        self.length = len(term)
+        self.last = term[-1]
+        self.filter = _subsequence(term, groups=False)  # Run against lowercased entries when ignoring case
+        self.subsequence = _subsequence(term, flags)
+        self.substring = re.compile(re.escape(term), flags)
+        # Highest score in an entry that starts with a path separator and has no whitespace:
+        # no character there gets a bonus above BONUS_BOUNDARY_DELIMITER, doubled for the first
+        # character of the term (and the run it starts). A term with a separator in it can match
+        # the entry's first character, which gets more.
+        self.bound = None if "/" in term or "\\" in term else \
+            (SCORE_MATCH + BONUS_FIRST_CHAR_MULTIPLIER * BONUS_BOUNDARY_DELIMITER) * self.length
+
+    def score(self, text: str, match: re.Match) -> int:
+        """
+        Scores one placement of the term, the first that applies: as a substring of the file
+        name, as a subsequence of the file name, or the leftmost `match`.
+        """
+        name_start = text.rfind("/") + 1
+        if name_start and match.start(1) < name_start:
+            exact = self.substring.search(text, name_start)
+            if exact:
+                return score_positions(text, range(exact.start(), exact.end()))
+            in_name = self.subsequence.match(text, name_start)
+            if in_name:
+                match = in_name
+        return score_positions(text, [match.start(k) for k in range(1, self.length + 1)])
+
+
+class FuzzyMatcher:
+    """
+    Ranks `entries` against fuzzy queries. `entries` must not change while the matcher is in
+    use; build a new matcher for a new list. Safe to call from several threads.
+    """
+    def __init__(self, entries):
+        self.entries = entries if isinstance(entries, list) else list(entries)
+        self._folded = None  # Lowercased entries, built on the first case-insensitive query
+        self._by_length = None  # (entry lengths, indices shortest first, _unbounded())
+        self._memo = []  # [(query, candidate indices)], each query a prefix of the next
+        self._lock = threading.Lock()
+
+    def _lowercased(self) -> list[str]:
+        with self._lock:
+            if self._folded is None:
+                self._folded = [e.lower() for e in self.entries]
+            return self._folded
+
+    def _length_order(self):
+        with self._lock:
+            if self._by_length is None:
+                lengths = list(map(len, self.entries))
+                order = sorted(range(len(lengths)), key=lengths.__getitem__)  # Stable: list order within a length
+                self._by_length = lengths, order, _unbounded(self.entries, lengths)
+            return self._by_length
+
+    def _candidates(self, query: str):
+        """
+        Indices that can match `query` (those that matched the longest remembered prefix of it),
+        and how many of the query's terms they are already known to match.
+        """
+        with self._lock:
+            while self._memo and not query.startswith(self._memo[-1][0]):
+                self._memo.pop()
+            if self._memo:
+                prefix, candidates = self._memo[-1]
+                if prefix == query:
+                    return candidates, len(query.split())
+                # Only the prefix's last term can still grow
+                done = prefix.split() if prefix[-1].isspace() else prefix.split()[:-1]
+                return candidates, len(done)
+            return range(len(self.entries)), 0
+
+    def _remember(self, query: str, candidates: list[int]):
+        with self._lock:
+            while self._memo and not query.startswith(self._memo[-1][0]):
+                self._memo.pop()
+            if self._memo and self._memo[-1][0] == query:
+                return
+            self._memo.append((query, candidates))
+            del self._memo[:-MEMO_DEPTH]
+
+    def _filter(self, query: str):
+        """The query's terms, and the indices of the entries matching all of them."""
+        ignore_case = query == query.lower()
+        terms = [_Term(t, ignore_case) for t in query.split()]
+        texts = self._lowercased() if ignore_case else self.entries
+        candidates, done = self._candidates(query)
+        for term in terms[done:]:
+            # The `in` test is much cheaper than the regex and rules out most non-matches
+            last, match = term.last, term.filter.match
+            candidates = [i for i in candidates if last in (text := texts[i]) and match(text)]
+        self._remember(query, candidates)
+        return terms, candidates
+
+    def _scorer(self, terms):
+        """Function scoring the entry at an index, or returning None if it doesn't match after all."""
+        entries = self.entries
+        if len(terms) == 1:
+            subsequence, score = terms[0].subsequence.match, terms[0].score
+
+            def score_one(i):
+                text = entries[i]
+                m = subsequence(text)
+                # Lowercasing can disagree with IGNORECASE for a few non-ASCII characters
+                return score(text, m) if m else None
+            return score_one
+
+        def score_all(i):
+            text = entries[i]
+            matches = [term.subsequence.match(text) for term in terms]
+            if all(matches):
+                return sum(term.score(text, m) for term, m in zip(terms, matches))
+            return None
+        return score_all
+
+    def count(self, query: str) -> int:
+        """Number of entries matching `query`. Cheap right after a match of the same query."""
+        if not query.split():
+            return len(self.entries)
+        return len(self._filter(query)[1])
+
+    def scored(self, query: str) -> list[tuple[int, int]]:
+        """(score, index) of every entry matching `query`, unordered."""
+        terms, candidates = self._filter(query)
+        score = self._scorer(terms)
+        return [(s, i) for i in candidates if (s := score(i)) is not None]
+
+    def _best(self, terms, candidates, limit, deadline=None):
+        """The `limit` best of `candidates` as (score, -length, -index), worst first (see the module docstring)."""
+        lengths, order, unbounded = self._length_order()
+        score = self._scorer(terms)
+        bounds = [t.bound for t in terms]
+        bound = None if None in bounds else sum(bounds)
+        if len(candidates) * 4 < len(order):
+            order = sorted(candidates, key=lengths.__getitem__)
+            members = None
+        else:
+            members = None if isinstance(candidates, range) else set(candidates)
+        heap = []
+
+        def offer(i):
+            s = score(i)
+            if s is None:
+                return
+            item = (s, -lengths[i], -i)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        first = set()
+        if bound is not None and unbounded:
+            # These can score above the bound, so they go first whatever their length
+            first = unbounded.intersection(candidates)
+            for i in first:
+                offer(i)
+        scanned = 0
+        for i in order:
+            if members is not None and i not in members or i in first:
+                continue
+            offer(i)
+            # Whatever is left is longer (or later), so scores at most `bound` behind this entry
+            if bound is not None and len(heap) == limit and heap[0] >= (bound, -lengths[i], -i):
+                break
+            scanned += 1
+            if deadline is not None and scanned % DEADLINE_CHECK == 0 and time.monotonic() > deadline:
+                break
+        return sorted(heap)
+
+    def match_indices(self, query: str, limit: int | None = None, deadline: float | None = None) -> list[int]:
+        """
+        Indices of the entries matching `query`, best first: highest score, then shortest, then
+        list order. With a `limit`, past a `deadline` (time.monotonic()) the best of the entries
+        scored by then is returned.
+        """
+        if not query.split():
+            return list(range(min(limit, len(self.entries)) if limit else len(self.entries)))
+        terms, candidates = self._filter(query)
+        if limit and len(candidates) > limit:
+            return [-i for _, _, i in reversed(self._best(terms, candidates, limit, deadline))]
+        entries = self.entries
+        score = self._scorer(terms)
+        keyed = sorted((-s, len(entries[i]), i) for i in candidates if (s := score(i)) is not None)
+        return [i for _, _, i in keyed]
+
+    def match(self, query: str, limit: int | None = None, deadline: float | None = None) -> list[str]:
+        """Entries matching `query`, best first."""
+        if not query.split():
+            return self.entries[:limit] if limit else list(self.entries)
+        return [self.entries[i] for i in self.match_indices(query, limit, deadline)]
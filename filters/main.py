@@ -34,7 +34,9 @@ def fast_list_children(entry):
 
 def expand_directories(entries: list[Path], state, current_depth: int,
                        active_gitignore_specs: list[tuple],
-                       visited_inodes_for_current_traversal: set) -> list[Path]:
+                       visited_inodes_for_current_traversal: set,
+                       blacklist=None, pruned=None) -> list[Path]:
+    """`pruned`, if given, collects the paths the blacklist cut off (their subtrees aren't read)."""
     logging.debug(f"expand_directories: Called (depth {current_depth}) with {len(entries)} input entries.") # NEW
     expanded = []
     for entry in entries:
@@ -67,6 +69,12 @@ def expand_directories(entries: list[Path], state, current_depth: int,
             logging.debug(f"expand_directories: IGNORED '{entry}' at current depth, skipping.") # More precise
             continue
 
+        if blacklist and blacklist.search(str(entry)):
+            logging.debug(f"expand_directories: BLACKLISTED '{entry}', pruning its subtree.")
+            if pruned is not None:
+                pruned.append(entry)
+            continue
+
         expanded.append(entry) # Add to list ONLY if not ignored at this point
         logging.debug(f"expand_directories: ADDED '{entry}' to expanded list.") # NEW
 
@@ -99,11 +107,19 @@ def expand_directories(entries: list[Path], state, current_depth: int,
         # end = time.perf_counter()
         # print(f"children2: Execution time: {end - start:.6f} seconds")
 
+        if blacklist:
+            kept = [c for c in children if not blacklist.search(str(c))]
+            if pruned is not None and len(kept) != len(children):
+                kept_set = set(kept)
+                pruned.extend(c for c in children if c not in kept_set)
+            children = kept
+
         if state.expansion_recursion: 
             logging.debug(f"expand_directories: Recursing into children of {entry}") # NEW
             expanded.extend(expand_directories(
                 children, state, current_depth + 1, new_active_gitignore_specs,
-                visited_inodes_for_current_traversal
+                visited_inodes_for_current_traversal,
+                blacklist=blacklist, pruned=pruned
             ))
         else:
             logging.debug(f"expand_directories: Filtering children of {entry} (non-recursive)") # NEW
@@ -159,7 +175,8 @@ def get_entries(state):
             current_depth=0,
             # Pass the global gitignore specs to ALL expansions, regardless of depth or origin
             active_gitignore_specs=global_gitignore_specs,
-            visited_inodes_for_current_traversal=visited_inodes_for_this_project
+            visited_inodes_for_current_traversal=visited_inodes_for_this_project,
+            blacklist=state.workspace.get_generator_blacklist_matcher()
         )
         logging.debug(f"get_entries: Expanded {len(expanded_for_this_root)} entries for root '{initial_path_root}'.")
         all_expanded_entries.extend(expanded_for_this_root)
@@ -0,0 +1,84 @@
+# filters/query.py
+import bisect
+import threading
+import time
+
+from filters.fuzzy import FuzzyMatcher
+
+QUERY_LIMIT = 2000  # Results a frontend gets per query
+QUERY_TIME_LIMIT = 0.1  # Seconds spent ranking per query; then the best of what was scored is sent
+QUERY_MODE_MIN_ENTRIES = 50_000  # Smaller lists are left to the frontend's own filtering
+MERGE_MAX_CHANGES = 1000  # More changes than this and the snapshot is re-sorted instead
+
+class QueryIndex:
+    """
+    Answers top-K queries over a live collection of paths (the workspace cache) from a sorted
+    snapshot of it. Whoever changes the collection calls invalidate(), and the next query
+    refreshes the snapshot, so a burst of keystrokes with no changes in between reuses one.
+    A refresh doesn't re-sort: it diffs the collection against the snapshot and bisects the
+    changes in. Queries are fuzzy (filters.fuzzy); the matcher and its memo of recent queries
+    are kept until the snapshot's contents actually change, so each keystroke only re-checks
+    the previous query's matches.
+    """
+    def __init__(self, source, lock=None):
+        self.source = source  # Callable returning the current collection
+        self.lock = lock
+        self._entries = []  # Sorted; replaced, never changed in place, so callers can keep it
+        self._members = set()  # Same contents as _entries
+        self._matcher = FuzzyMatcher([])
+        self._stale = True
+        self._build_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.source())
+
+    def invalidate(self):
+        """The collection changed; cheap enough to call on every file system event."""
+        self._stale = True
+
+    def snapshot(self) -> list[str]:
+        with self._build_lock:
+            if self._stale:
+                self._stale = False  # Cleared first: a change during the diff marks it stale again
+                if self.lock is not None:
+                    with self.lock:
+                        added, removed = self._diff(self.source())
+                else:
+                    added, removed = self._diff(self.source())
+                if added or removed:
+                    self._entries = self._merged(added, removed)
+                    self._members.difference_update(removed)
+                    self._members.update(added)
+                    self._matcher = FuzzyMatcher(self._entries)
+            return self._entries
+
+    def _diff(self, collection):
+        """(added, removed) of `collection` against the snapshot."""
+        if not isinstance(collection, (set, frozenset)):
+            collection = set(collection)
+        added = collection - self._members
+        # Every member still there unless fewer of them were kept than there are
+        removed = self._members - collection if len(collection) - len(added) != len(self._members) else set()
+        return added, removed
+
+    def _merged(self, added, removed) -> list[str]:
+        """A new sorted list: small changes are bisected into a copy, big ones re-sorted."""
+        if len(added) + len(removed) > MERGE_MAX_CHANGES:
+            entries = [e for e in self._entries if e not in removed] if removed else self._entries[:]
+            entries.extend(added)
+            entries.sort()
+            return entries
+        entries = self._entries[:]
+        for e in removed:
+            del entries[bisect.bisect_left(entries, e)]
+        for e in added:
+            bisect.insort(entries, e)
+        return entries
+
+    def matcher(self) -> FuzzyMatcher:
+        self.snapshot()
+        return self._matcher
+
+    def top(self, query: str, limit: int = QUERY_LIMIT) -> list[str]:
+        """The best `limit` fuzzy matches for `query`; the first `limit` entries for an empty one."""
+        return self.matcher().match(query, limit, time.monotonic() + QUERY_TIME_LIMIT)
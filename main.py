@@ -2,11 +2,8 @@
 # main.py
 import argparse
 import socket
-import subprocess
-import sys
 import time
 import logging
-import signal
 from threading import Thread
 
 
@@ -15,25 +12,14 @@ from menu_manager import MenuManager
 from state.state import State
 from pathlib import Path
 from state.workspace import Workspace
-from menu_manager.interface import run_socket_client, run_socket_server, run_cli_app
+from menu_manager.interface import run_socket_client, run_socket_server, run_cli_app, serve_connection, run_client_session, workspace_query_handler
+from core.core_service import WorkspaceDaemon, SOCKET_PATH
 
 def get_free_port():
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.bind(('', 0))
         return s.getsockname()[1]
 
-def terminate_process(proc, name, timeout=5):
-    if proc.poll() is None:  # Process still running
-        logging.info(f"Terminating {name} (pid={proc.pid})")
-        proc.terminate()
-        try:
-            proc.wait(timeout=timeout)
-            logging.info(f"{name} exited gracefully")
-        except subprocess.TimeoutExpired:
-            logging.warning(f"{name} did not exit in {timeout}s; killing")
-            proc.kill()
-            proc.wait()
-
 # def main():
 #     args = get_args()
 #     # Begin threading
@@ -115,44 +101,33 @@ def terminate_process(proc, name, timeout=5):
 #     else:
 #         logging.info("[INFO] Starting application in CLI mode.")
 #         run_cli_app(menu_manager)
-def spawn_socket_process(interface, common_args):
-    return subprocess.Popen([
-        sys.executable, __file__,
-        "--interface", interface,
-        *common_args
-    ])
-
-
-
 def run_dual_socket_mode(args):
-    common_args = [
-        "--host", args.host,
-        "--port", str(args.port),
-        "--workspace-file", args.workspace_file,
-        *args.paths
-    ]
-    if args.cwd:
-        common_args.extend(["--cwd", args.cwd])
-    if args.frontend:
-        common_args.extend(["--frontend", args.frontend])
-    
+    """
+    Runs the socket server and client in this process, joined by a socketpair.
+    The client reuses the already warm interpreter and the server needs no port, so there
+    is no second interpreter start and no waiting for the server to come up.
+    """
     from menu_manager.payload import get_timestamp
     print(f"Server starting at {get_timestamp()}")
-    server_proc = spawn_socket_process("socket-server", common_args)
-    client_proc = spawn_socket_process("socket-client", common_args)
-
-    def cleanup(signum=None, frame=None):
-        terminate_process(client_proc, "Client")
-        terminate_process(server_proc, "Server")
-        sys.exit(0)
-
-    signal.signal(signal.SIGINT, cleanup)
-    signal.signal(signal.SIGTERM, cleanup)
-
-    try:
-        client_proc.wait()
-    finally:
-        cleanup()
+    state = configure_stateful_components(args)
+    args.interface = "socket-server"
+    manager = configure_menu_manager(state, args)
+    server_sock, client_sock = socket.socketpair()
+
+    def serve():
+        with server_sock:
+            try:
+                serve_connection(manager, server_sock)
+            except Exception as e:
+                print(f"[Server] Error: {e}")
+
+    Thread(target=serve, daemon=True).start()
+    with client_sock:
+        try:
+            run_client_session(client_sock, args.frontend or "fzf")
+        except Exception as e:
+            print(f"[Client] Error: {e}")
+    state.workspace.flush_autosave()
 
 
 def configure_stateful_components(args):
@@ -175,10 +150,22 @@ def configure_stateful_components(args):
 def configure_menu_manager(state, args) -> MenuManager:
     return MenuManager(state, args.interface, args.frontend, args.host, args.port)
 
+def run_daemon(state, args):
+    socket_path = args.socket_path or SOCKET_PATH
+    def new_session():
+        manager = configure_menu_manager(state.session_view(), args)
+        manager.serves_queries = True
+        return manager
+    daemon = WorkspaceDaemon(socket_path, new_session, args.session_timeout, workspace_query_handler(state))
+    daemon.serve_forever(ready_fd=args.ready_fd)
+
 def main():
     args = get_args()
     args.host = args.host or '127.0.0.1'
-    args.port = int(args.port) if getattr(args, 'port', None) else get_free_port()
+    if getattr(args, 'port', None):
+        args.port = int(args.port)
+    elif not args.socket_path:
+        args.port = get_free_port()
 
     if args.interface in {'socket', 'sockets'}:
         print("Starting in socket mode")
@@ -187,27 +174,38 @@ def main():
 
     if args.interface in {"socket-client", "sockets-client"}:
         logging.info("[INFO] Starting application in client mode (interface: socket-client).")
-        run_socket_client(args.host, args.port, args.frontend)
+        run_socket_client(args.host, args.port, args.frontend, socket_path=args.socket_path, ready_fd=args.ready_fd, session_file=args.session_file)
         return
 
     state = configure_stateful_components(args)
 
-    if args.interface in {"socket-server", "sockets-server"}:
-        logging.info("[INFO] Starting application in server mode (interface: socket-server).")
-        run_socket_server(configure_menu_manager(state, args))
-    else:
-        logging.info("[INFO] Starting application in CLI mode.")
-        run_cli_app(configure_menu_manager(state, args))
+    try:
+        if args.interface in {"socket-server", "sockets-server"}:
+            logging.info("[INFO] Starting application in server mode (interface: socket-server).")
+            run_socket_server(configure_menu_manager(state, args), ready_fd=args.ready_fd, socket_path=args.socket_path, session_timeout=args.session_timeout)
+        elif args.interface == "daemon":
+            logging.info("[INFO] Starting application in daemon mode (interface: daemon).")
+            run_daemon(state, args)
+        else:
+            logging.info("[INFO] Starting application in CLI mode.")
+            run_cli_app(configure_menu_manager(state, args))
+    finally:
+        # Don't leave a debounced auto-save to atexit: write it before reporting we're done
+        state.workspace.flush_autosave()
 
 
 def get_args():
     parser = argparse.ArgumentParser(description="Manage workspace state")
     parser.add_argument("--workspace-file", default="workspace.json")
     parser.add_argument("--cwd", default=None)
-    parser.add_argument("--frontend", default=None, help="Available frontends: fzf rofi cli")
-    parser.add_argument("--interface", default=None, help="Interface type: 'socket-server' for stand-alone server, 'socket-client' for stand-alone client, 'socket' to launch both, or 'cli' for console.")
+    parser.add_argument("--frontend", default=None, help="Available frontends: fzf fzf-session rofi cli curses")
+    parser.add_argument("--interface", default=None, help="Interface type: 'socket-server' for stand-alone server, 'socket-client' for stand-alone client, 'socket' to launch both, 'daemon' for a persistent multi-client server, or 'cli' for console.")
     parser.add_argument("--host", help="Host for socket communication")
     parser.add_argument("--port", type=int, help="Port number for socket communication")
+    parser.add_argument("--socket-path", default=None, help=f"Use a UNIX socket at this path instead of TCP host/port for socket-server/socket-client (default for --interface daemon: {SOCKET_PATH})")
+    parser.add_argument("--ready-fd", type=int, default=None, help="Readiness handshake: servers write to this fd once listening, clients block reading it before connecting (e.g. both ends of a FIFO)")
+    parser.add_argument("--session-timeout", type=float, default=None, help="Servers keep a menu session alive this many seconds after its client disconnects, so the next client resumes it")
+    parser.add_argument("--session-file", default=None, help="Clients store the server session token here and resume that session on the next launch")
     parser.add_argument("paths", nargs="*")
     return parser.parse_args()
 
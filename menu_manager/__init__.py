@@ -1 +1,10 @@
-from .manager import MenuManager
+# MenuManager pulls in the workspace, filters and filesystem modules. It is loaded on first
+# access (PEP 562) so light users of the package, like the socket client and the rofi
+# script bridge, don't pay for it on every start.
+__all__ = ["MenuManager"]
+
+def __getattr__(name):
+    if name == "MenuManager":
+        from .manager import MenuManager
+        return MenuManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
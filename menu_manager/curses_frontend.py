@@ -0,0 +1,244 @@
+# menu_manager/curses_frontend.py
+"""
+In-terminal selector drawn with curses, for when there's no fzf or rofi (or no X).
+
+Only the rows that fit on screen are drawn. A list or other sequence is used as-is; a
+generator or EntryStream is read a chunk at a time while waiting for keys, so a huge menu
+opens at once and fills in behind the cursor. Typing filters with filters.fuzzy, and the
+matcher narrows incrementally as the query grows. Only the best RANKED_ROWS matches are listed,
+and ranking them stops after MATCH_TIME_LIMIT so a keystroke never stalls the screen.
+
+Keys: Up/Down, Ctrl-P/Ctrl-N, PgUp/PgDn, Home/End move; Tab marks (multi-select); Enter
+accepts; Esc, Ctrl-C and Ctrl-G cancel; Backspace, Ctrl-W and Ctrl-U edit the query.
+"""
+import curses
+import itertools
+import logging
+import time
+from collections.abc import Sequence
+
+from filters.fuzzy import FuzzyMatcher
+from menu_manager.protocol import EntryStream
+
+LOAD_CHUNK = 8192  # Entries read from a lazy source per idle tick
+LOAD_TICK_MS = 20  # How long to wait for a key before reading more entries
+HEADER_ROWS = 2  # Prompt line and status line
+RANKED_ROWS = 1000  # Matches listed for a query; typing more narrows the rest down
+MATCH_TIME_LIMIT = 0.1  # Seconds spent ranking per query
+
+KEY_ESC = "\x1b"
+CTRL_C, CTRL_G, CTRL_N, CTRL_P, CTRL_U, CTRL_W = "\x03", "\x07", "\x0e", "\x10", "\x15", "\x17"
+BACKSPACE_KEYS = {curses.KEY_BACKSPACE, "\x7f", "\b"}
+ENTER_KEYS = {curses.KEY_ENTER, "\n", "\r"}
+
+
+class _Source:
+    """The menu's entries: a sequence used as-is, or an iterable read LOAD_CHUNK at a time."""
+    def __init__(self, entries):
+        if isinstance(entries, Sequence) and not isinstance(entries, str):
+            self.items = entries
+            self._it = None
+        else:
+            self.items = []
+            self._it = iter(entries)
+
+    @property
+    def loading(self):
+        return self._it is not None
+
+    def load_more(self):
+        if self._it is None:
+            return
+        batch = list(itertools.islice(self._it, LOAD_CHUNK))
+        self.items.extend(batch)
+        if len(batch) < LOAD_CHUNK:
+            self._it = None
+
+
+class CursesSelector:
+    def __init__(self, entries, prompt, multi_select=False, text_input=True, indices=False):
+        self.source = _Source(entries)
+        self.prompt = prompt
+        self.multi_select = multi_select
+        self.text_input = text_input
+        self.indices = indices
+        self.query = ""
+        self.rows = None  # Entry indices matching the query, best first; None lists every entry
+        self.match_count = 0  # Entries matching the query, listed or not
+        self.cursor = 0
+        self.top = 0  # First row on screen
+        self.marked = {}  # Indices of marked entries, in the order they were marked
+        self._matcher = None
+        self._matched_count = -1  # Entries loaded when the matcher was built
+
+    def _row_count(self):
+        return len(self.source.items) if self.rows is None else len(self.rows)
+
+    def _entry_index(self, row):
+        return row if self.rows is None else self.rows[row]
+
+    def _refilter(self):
+        if not self.query.split():
+            self.rows = None
+        else:
+            items = self.source.items
+            if self._matcher is None or self._matched_count != len(items):
+                # Rebuilt only once more entries have loaded; until then it keeps narrowing
+                self._matcher = FuzzyMatcher(list(items))
+                self._matched_count = len(items)
+            deadline = time.monotonic() + MATCH_TIME_LIMIT
+            self.rows = self._matcher.match_indices(self.query, RANKED_ROWS, deadline)
+            self.match_count = self._matcher.count(self.query)
+        self.cursor = self.top = 0
+
+    def _move(self, delta):
+        if self._row_count():
+            self.cursor = max(0, min(self._row_count() - 1, self.cursor + delta))
+
+    def _handle(self, key, page):
+        """Applies one key. Returns the selection once the menu is done, otherwise None."""
+        if key in (KEY_ESC, CTRL_C, CTRL_G):
+            return []
+        if key in ENTER_KEYS:
+            return self._accept()
+        if key in (curses.KEY_UP, CTRL_P):
+            self._move(-1)
+        elif key in (curses.KEY_DOWN, CTRL_N):
+            self._move(1)
+        elif key == curses.KEY_PPAGE:
+            self._move(-page)
+        elif key == curses.KEY_NPAGE:
+            self._move(page)
+        elif key == curses.KEY_HOME:
+            self.cursor = 0
+        elif key == curses.KEY_END:
+            self._move(self._row_count())
+        elif key == "\t":
+            if self.multi_select and self._row_count():
+                index = self._entry_index(self.cursor)
+                if self.marked.pop(index, None) is None:
+                    self.marked[index] = True
+                self._move(1)
+        elif key in BACKSPACE_KEYS:
+            self.query = self.query[:-1]
+        elif key == CTRL_U:
+            self.query = ""
+        elif key == CTRL_W:
+            self.query = self.query.rstrip().rpartition(" ")[0]
+        elif isinstance(key, str) and key.isprintable():
+            self.query += key
+        return None
+
+    def _accept(self):
+        if self.marked:
+            chosen = list(self.marked)
+        elif self._row_count():
+            chosen = [self._entry_index(self.cursor)]
+        elif self.text_input and self.query and not self.indices:
+            return [self.query]  # Free text that matches nothing, e.g. a new path
+        else:
+            return []
+        return chosen if self.indices else [self.source.items[i] for i in chosen]
+
+    def _draw(self, screen):
+        height, width = screen.getmaxyx()
+        visible = max(1, height - HEADER_ROWS)
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + visible:
+            self.top = self.cursor - visible + 1
+
+        screen.erase()
+        total = len(self.source.items)
+        status = f"  {self.match_count}/{total}" if self.rows is not None else f"  {total}"
+        if self.source.loading:
+            status += " (loading)"
+        if self.marked:
+            status += f"  [{len(self.marked)} marked]"
+        self._put(screen, 1, status, width, curses.A_DIM)
+        for row in range(self.top, min(self.top + visible, self._row_count())):
+            index = self._entry_index(row)
+            y = HEADER_ROWS + row - self.top
+            mark = "*" if index in self.marked else " "
+            entry = self.source.items[index]  # Index, don't slice: any Sequence will do
+            self._put(screen, y, f"{mark} {entry}", width, curses.A_REVERSE if row == self.cursor else 0)
+        line = f"{self.prompt}: {self.query}"
+        self._put(screen, 0, line, width, curses.A_BOLD)
+        screen.move(0, min(len(line), width - 1))
+        screen.refresh()
+
+    @staticmethod
+    def _put(screen, y, text, width, attr):
+        try:
+            screen.addnstr(y, 0, text, width - 1, attr)
+        except curses.error:
+            pass  # Wide characters running off the edge
+
+    @staticmethod
+    def _swallow_escape_sequence(screen):
+        """After an Esc: reads the rest of a CSI/SS3 sequence if one follows right away."""
+        try:
+            key = screen.get_wch()
+        except curses.error:
+            return False
+        if key not in ("[", "O"):
+            curses.unget_wch(key)
+            return False
+        while True:
+            try:
+                key = screen.get_wch()
+            except curses.error:
+                return True
+            if not isinstance(key, str) or "@" <= key <= "~":
+                return True
+
+    def run(self, screen):
+        if hasattr(curses, "set_escdelay"):
+            curses.set_escdelay(25)  # Esc should cancel right away, not after a second
+        try:
+            curses.use_default_colors()
+        except curses.error:
+            pass
+        screen.keypad(True)
+        while True:
+            self._draw(screen)
+            height = screen.getmaxyx()[0]
+            screen.timeout(LOAD_TICK_MS if self.source.loading else -1)
+            try:
+                key = screen.get_wch()
+            except curses.error:
+                # No key yet: read more entries and show them
+                self.source.load_more()
+                if self.rows is not None and not self.source.loading:
+                    self._refilter()  # Everything's in; match the query against all of it
+                continue
+
+            query = self.query
+            # Apply keys that are already waiting (typing fast, pasting) before filtering once
+            screen.timeout(0)
+            while key is not None:
+                if key == KEY_ESC and self._swallow_escape_sequence(screen):
+                    key = None  # An escape sequence curses doesn't know, not the Esc key
+                else:
+                    result = self._handle(key, max(1, height - HEADER_ROWS))
+                    if result is not None:
+                        return result
+                try:
+                    key = screen.get_wch()
+                except curses.error:
+                    key = None
+            if self.query != query:
+                self._refilter()
+
+
+def run_curses(entries, prompt, multi_select=False, text_input=True, indices=False):
+    try:
+        return curses.wrapper(CursesSelector(entries, prompt, multi_select, text_input, indices).run)
+    except KeyboardInterrupt:
+        return []
+    except curses.error as e:
+        logging.error(f"[curses] Could not start the terminal UI: {e}")
+        return []
+    finally:
+        if isinstance(entries, EntryStream):
+            entries.drain()  # Keep the socket protocol in step
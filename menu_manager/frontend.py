@@ -1,46 +1,156 @@
 # interface.py
+import itertools
 import subprocess
+import tempfile
 import json
 import logging 
 from menu_manager.payload import send_message, recv_message
+from menu_manager.protocol import EntryStream
+from menu_manager.query_client import query_env
+from filters.fuzzy import FuzzyMatcher
 
-def run_fzf(entries, prompt, multi_select=False, text_input=True):
+CHUNK_ENTRIES = 4096  # Entries encoded and written to the selector per write
+CLI_MATCHES_SHOWN = 20  # Fuzzy matches listed per query in the CLI selector
+
+def iter_chunks(entries):
+    """
+    Newline-terminated UTF-8 chunks of `entries`: a list, any iterable or generator of str,
+    or an EntryStream. Only one chunk is encoded at a time.
+    """
+    if isinstance(entries, EntryStream):
+        for chunk in entries.chunks():
+            yield bytes(chunk) + b"\n"
+        return
+    it = iter(entries)
+    while batch := list(itertools.islice(it, CHUNK_ENTRIES)):
+        batch.append("")  # Trailing newline
+        yield "\n".join(batch).encode('utf-8')
+
+def numbered_lines(entries):
+    """`index<TAB>entry` lines, for selectors told to print back only the index column."""
+    return (f"{i}\t{entry}" for i, entry in enumerate(entries))
+
+def parse_indices(lines):
+    """Leading index column of each output line; anything else (custom text, -1) is dropped."""
+    indices = []
+    for line in lines:
+        head = line.split("\t", 1)[0].strip()
+        if head.isdigit():
+            indices.append(int(head))
+    return indices
+
+def selection_indices(entries, selection):
+    """
+    Resolves a selection to indices into `entries`. Selectors asked for indices return ints
+    already; strings (older socket clients, typed text) are looked up by first occurrence, and
+    anything that isn't an entry is dropped.
+    """
+    lookup = None
+    indices = []
+    for item in selection:
+        if isinstance(item, int) and not isinstance(item, bool):
+            if 0 <= item < len(entries):
+                indices.append(item)
+        elif isinstance(item, str):
+            if lookup is None:
+                lookup = {}
+                for i, entry in enumerate(entries):
+                    lookup.setdefault(entry, i)
+            if item in lookup:
+                indices.append(lookup[item])
+    return indices
+
+def _run(cmd, entries, env=None, numbered=False):
+    """
+    Starts the selector right away and writes the entries to its stdin while it runs.
+    With `numbered`, each line is prefixed with its index (see numbered_lines).
+    """
+    # stderr goes to a temp file rather than a pipe: it's still kept off the terminal like
+    # capture_output did, but a chatty selector can't fill it and stall while we write stdin.
+    stderr = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr, env=env)
+    try:
+        for chunk in iter_chunks(numbered_lines(entries) if numbered else entries):
+            proc.stdin.write(chunk)
+    except BrokenPipeError:
+        pass  # Selection was made before the whole list was written
+    try:
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    if isinstance(entries, EntryStream):
+        entries.drain()  # Keep the socket protocol in step
+    output = proc.stdout.read()
+    proc.wait()
+    stderr.seek(0)
+    errors = stderr.read().decode('utf-8', errors='replace').strip()
+    stderr.close()
+    if errors:
+        logging.debug(f"[MenuManager._run] {cmd[0]} stderr: {errors}")
+    return proc.returncode, output.decode('utf-8', errors='replace')
+
+def run_fzf(entries, prompt, multi_select=False, text_input=True, query_command=None, indices=False):
+    """
+    With `query_command`, fzf doesn't filter itself: every keystroke reloads the list from it.
+    With `indices`, returns the indices of the selected entries instead of their text (fzf
+    gets a hidden index column via --with-nth).
+    """
     cmd = ["fzf", "--prompt", prompt + ": "]
     if multi_select:
         cmd.append("--multi")
     if not text_input:
         cmd.append("--no-sort")
-    proc = subprocess.run(cmd, input="\n".join(entries), text=True, capture_output=True)
-    if proc.returncode != 0:
+    if indices:
+        cmd += ["--delimiter", "\t", "--with-nth", "2.."]
+    env = None
+    if query_command:
+        cmd += ["--disabled", "--bind", f"change:reload:{query_command} {{q}}"]
+        env = query_env()
+    returncode, output = _run(cmd, entries, env, numbered=indices)
+    if returncode != 0:
         return []
-    result = proc.stdout.strip()
-    return result.splitlines() if multi_select else [result] if result else []
+    result = output.strip()
+    lines = result.splitlines() if multi_select else [result] if result else []
+    return parse_indices(lines) if indices else lines
 
 
-def run_rofi(entries, prompt, multi_select=False, text_input=True):
+def run_rofi(entries, prompt, multi_select=False, text_input=True, indices=False):
+    """With `indices`, returns the indices of the selected entries (rofi's `-format i`)."""
     cmd = ["rofi", "-dmenu", "-p", prompt]
     if multi_select:
         cmd.append("-multi-select")
-    proc = subprocess.run(cmd, input="\n".join(entries), text=True, capture_output=True)
-    if proc.returncode != 0:
+    if indices:
+        cmd += ["-format", "i"]
+    returncode, output = _run(cmd, entries)
+    if returncode != 0:
         return []
-    result = proc.stdout.strip()
-    return result.splitlines() if multi_select else [result] if result else []
+    result = output.strip()
+    lines = result.splitlines() if multi_select else [result] if result else []
+    return parse_indices(lines) if indices else lines
 
-def run_cli_selector(entries, prompt, multi_select, text_input):
+def run_cli_selector(entries, prompt, multi_select, text_input, indices=False):
     """
     Handles user input via standard command-line input (input()).
     This is used for the 'cli' interface or as a fallback for socket-client
     if no graphical frontend is available/specified.
+    Input that isn't a number or an entry is a fuzzy query: a single match is selected,
+    several are listed (numbered) to pick from or to refine with a longer query.
     Args:
         entries (list): List of menu options to display.
         prompt (str): The prompt string.
         multi_select (bool): True if multiple selections are allowed.
         text_input (bool): True if arbitrary text input is expected.
+        indices (bool): Return indices into `entries` instead of the entries.
     Returns:
         list: A list containing the selected items, or ["QUIT_SIGNAL"].
     """
+    if not isinstance(entries, list):
+        entries = list(entries)  # Numbered options need the whole list anyway
     logging.debug(f"[MenuManager.run_cli_selector] Using CLI selector: Prompt='{prompt}', Entries={entries}")
+
+    def picked(chosen):
+        return chosen if indices else [entries[i] for i in chosen]
+
     try:
         print(f"\n{prompt}:")
         if entries:
@@ -49,34 +159,59 @@ def run_cli_selector(entries, prompt, multi_select, text_input):
         else:
             print("(No options provided, enter text directly)")
 
-        selected_input = input("Your choice: ").strip()
+        shown = range(len(entries))  # Indices of the entries the numbers refer to
+        matcher = None
+        while True:
+            selected_input = input("Your choice: ").strip()
 
-        if not selected_input:
-            logging.info("[MenuManager.run_cli_selector] Empty input received from CLI. Simulating Quit.")
-            return ["QUIT_SIGNAL"] # Treat empty input as a signal to quit/cancel
+            if not selected_input:
+                logging.info("[MenuManager.run_cli_selector] Empty input received from CLI. Simulating Quit.")
+                return ["QUIT_SIGNAL"] # Treat empty input as a signal to quit/cancel
+
+            # If it's primarily a text input prompt (and potentially no predefined entries)
+            if text_input and not entries:
+                return [selected_input]
+            elif multi_select:
+                # For CLI multi-select, assume comma-separated input
+                parts = [s.strip() for s in selected_input.split(',') if s.strip()]
+                if not indices:
+                    return parts
+                chosen = []
+                for part in parts:
+                    if part.isdigit() and 0 < int(part) <= len(shown):
+                        chosen.append(shown[int(part) - 1])
+                    else:
+                        chosen.extend(selection_indices(entries, [part]))
+                return chosen
 
-        # If it's primarily a text input prompt (and potentially no predefined entries)
-        if text_input and not entries:
-            return [selected_input]
-        elif multi_select:
-            # For CLI multi-select, assume comma-separated input
-            return [s.strip() for s in selected_input.split(',') if s.strip()]
-        else:
             # Try to convert to int for numbered options, otherwise assume direct string input
             try:
                 idx = int(selected_input) - 1
-                if 0 <= idx < len(entries):
-                    return [entries[idx]]
+                if 0 <= idx < len(shown):
+                    return picked([shown[idx]])
                 else:
                     logging.warning(f"[MenuManager._run_cli_selector] Invalid numeric selection: '{selected_input}'.")
                     return [] # Return empty if invalid
             except ValueError:
-                # Not a number, treat as direct string input matching an entry
-                if selected_input in entries:
-                    return [selected_input]
-                else:
-                    logging.warning(f"[MenuManager._run_cli_selector] Invalid text selection: '{selected_input}'.")
-                    return []
+                pass
+            if selected_input in entries:
+                return picked([entries.index(selected_input)])
+
+            # Not a number or an entry: treat it as a fuzzy query. The matcher is kept across
+            # queries so a longer query only re-checks the previous matches.
+            matcher = matcher or FuzzyMatcher(entries)
+            matches = matcher.match_indices(selected_input, CLI_MATCHES_SHOWN)
+            if len(matches) == 1:
+                return picked(matches)
+            if not matches:
+                if text_input and not indices:
+                    return [selected_input]  # Free text, like fzf returning the query
+                logging.warning(f"[MenuManager._run_cli_selector] Invalid text selection: '{selected_input}'.")
+                return []
+            shown = matches
+            print(f"Matches for '{selected_input}' (pick a number or refine the query):")
+            for n, i in enumerate(shown):
+                print(f"  {n+1}. {entries[i]}")
 
     except EOFError: # Handles Ctrl+D on stdin
         logging.info("[MenuManager._run_cli_selector] EOF received (Ctrl+D), simulating Quit.")
@@ -0,0 +1,186 @@
+# menu_manager/fzf_session.py
+"""
+One fzf that stays open for the whole run instead of a new fzf per prompt.
+
+fzf is started once with `--listen` on a UNIX socket (fzf 0.56+). Each prompt is shown by
+POSTing actions to it: change-prompt, change-multi, clear-query and reload-sync of a file
+holding the entries. Enter and Esc are rebound to execute-silent commands that save the
+selection ({+f}) and query ({q}) and write "accept" or "cancel" to a FIFO, which is what
+run_fzf_session() waits on. Ctrl-C still quits fzf; the next prompt starts a new one.
+Entries always carry a hidden index column, so menus can ask for indices without a restart.
+"""
+import atexit
+import http.client
+import logging
+import os
+import select
+import shlex
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+from menu_manager.frontend import iter_chunks, numbered_lines, parse_indices
+
+# fzf accepts any of these pairs around action arguments; pick one the argument doesn't contain
+_DELIMITERS = ["()", "[]", "{}", "<>", "~~", "!!", "@@", "##", "%%", "^^"]
+
+def _action(name, arg=""):
+    for opening, closing in _DELIMITERS:
+        if opening not in arg and closing not in arg:
+            return f"{name}{opening}{arg}{closing}"
+    raise ValueError(f"No fzf delimiter available for {arg!r}")
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=5.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class FzfSession:
+    START_TIMEOUT = 3.0  # How long to wait for fzf's --listen socket
+
+    def __init__(self):
+        self.proc = None
+        self.dir = None
+        self.fifo_fd = None
+        self.sorting = True
+        atexit.register(self.close)
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    @property
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def _write_entries(self, entries):
+        with open(self._path("entries"), "wb") as f:
+            for chunk in iter_chunks(numbered_lines(entries)):
+                f.write(chunk)
+
+    def _start(self, entries, prompt, multi_select, text_input):
+        self.close()
+        self.dir = tempfile.mkdtemp(prefix="fzf-session-")
+        self._write_entries(entries)
+        os.mkfifo(self._path("fifo"))
+        # Opened read-write so we never see EOF between fzf's writes
+        self.fifo_fd = os.open(self._path("fifo"), os.O_RDWR | os.O_NONBLOCK)
+        items, query, fifo = (shlex.quote(self._path(n)) for n in ("items", "query", "fifo"))
+        accept = _action("execute-silent", f"cat {{+f}} > {items}; printf '%s' {{q}} > {query}; echo accept > {fifo}")
+        cancel = _action("execute-silent", f"echo cancel > {fifo}")
+        cmd = [
+            "fzf", "--listen", self._path("fzf.sock"),
+            "--prompt", prompt + ": ",
+            "--delimiter", "\t", "--with-nth", "2..",
+            "--bind", f"enter:{accept}+clear-selection",
+            "--bind", f"esc:{cancel}",
+        ]
+        if multi_select:
+            cmd.append("--multi")
+        self.sorting = text_input
+        if not text_input:
+            cmd.append("--no-sort")
+        with open(self._path("entries"), "rb") as stdin:
+            self.proc = subprocess.Popen(cmd, stdin=stdin)
+
+    def _post(self, actions):
+        deadline = time.monotonic() + self.START_TIMEOUT
+        while True:
+            conn = _UnixHTTPConnection(self._path("fzf.sock"))
+            try:
+                conn.request("POST", "/", body="+".join(actions).encode('utf-8'))
+                conn.getresponse().read()
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline or not self.alive:
+                    raise
+                time.sleep(0.02)  # fzf hasn't opened its socket yet
+            finally:
+                conn.close()
+
+    def _show(self, prompt, multi_select, text_input):
+        actions = [
+            _action("change-prompt", prompt + ": "),
+            _action("change-multi", "" if multi_select else "0"),
+            "clear-query",
+        ]
+        if self.sorting != text_input:
+            actions.append("toggle-sort")
+            self.sorting = text_input
+        actions.append(_action("reload-sync", f"cat {shlex.quote(self._path('entries'))}"))
+        self._post(actions)
+
+    def _drop_stale_answers(self):
+        """Discards keypresses answered while no prompt was waiting (e.g. a double Esc)."""
+        try:
+            while os.read(self.fifo_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _wait_for_answer(self):
+        """Returns "accept" or "cancel", or None if fzf exited."""
+        while True:
+            readable, _, _ = select.select([self.fifo_fd], [], [], 0.2)
+            if readable:
+                return os.read(self.fifo_fd, 64).decode().split()[0]
+            if not self.alive:
+                return None
+
+    def select(self, entries, prompt, multi_select=False, text_input=True, indices=False):
+        if self.alive:
+            self._drop_stale_answers()
+            self._write_entries(entries)
+            self._show(prompt, multi_select, text_input)
+        else:
+            self._start(entries, prompt, multi_select, text_input)
+
+        answer = self._wait_for_answer()
+        if answer != "accept":
+            if answer is None:
+                logging.info("[fzf-session] fzf exited; a new one starts at the next prompt.")
+                self.close()
+            return []
+        with open(self._path("items"), encoding='utf-8', errors='replace') as f:
+            lines = [line for line in f.read().splitlines() if line]  # {+f} has one empty line when nothing matched
+        if not lines and text_input and not indices:
+            # Free text that matches nothing, e.g. a new pattern or path
+            with open(self._path("query"), encoding='utf-8') as f:
+                query = f.read().strip()
+            return [query] if query else []
+        lines = lines if multi_select else lines[:1]
+        if indices:
+            return parse_indices(lines)
+        return [line.split("\t", 1)[-1] for line in lines]
+
+    def close(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+        if self.fifo_fd is not None:
+            os.close(self.fifo_fd)
+            self.fifo_fd = None
+        if self.dir is not None:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self.dir = None
+
+
+_session = None
+
+def run_fzf_session(entries, prompt, multi_select=False, text_input=True, indices=False):
+    global _session
+    if _session is None:
+        _session = FzfSession()
+    return _session.select(entries, prompt, multi_select, text_input, indices)
@@ -40,3 +40,63 @@ class HashCache:
             return False
         self.map[path] = h
         return True
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+import os
+
+class FileChangeDetector:
+    """
+    Cheap change detection for a single file.
+    A (mtime_ns, size, inode) signature is compared on every check; the content
+    hash is only computed when the signature differs, to rule out touches and
+    rewrites with identical content.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self._signature = None
+        self._digest = None
+
+    @staticmethod
+    def _signature_of(st):
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _stat_signature(self):
+        try:
+            return self._signature_of(os.stat(self.path))
+        except OSError:
+            return None
+
+    def mark_synced(self, digest=None, stat_result=None):
+        """
+        Records the file as it is on disk now.
+        Callers that just read or wrote the file should pass the digest of those bytes and an
+        fstat() of the open descriptor, so a concurrent rewrite is not mistaken for our own.
+        """
+        if stat_result is not None:
+            self._signature = self._signature_of(stat_result)
+        else:
+            self._signature = self._stat_signature()
+        if self._signature is None:
+            self._digest = None
+        else:
+            self._digest = digest if digest is not None else hash_file(self.path)
+
+    def retarget(self, path):
+        self.path = Path(path)
+        self.mark_synced()
+
+    def has_changed(self) -> bool:
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return False
+        if signature is None or self._signature is None:
+            return True  # File appeared or disappeared
+
+        digest = hash_file(self.path)
+        if digest is not None and digest == self._digest:
+            # Same content under a new signature (touch, identical rewrite); remember it
+            self._signature = signature
+            return False
+        return True
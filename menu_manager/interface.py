@@ -1,73 +1,256 @@
 # menu_manager/interface.py
+import os
 import socket
-import json
+import select
+import signal
 import logging
-import errno
+import threading
 import time
 
 from menu_manager.payload import send_message, recv_message
 from menu_manager.frontend import run_fzf, run_rofi, run_cli_selector
+from menu_manager.fzf_session import run_fzf_session
+from menu_manager.curses_frontend import run_curses
 from menu_manager.payload import get_timestamp
+from menu_manager.protocol import MenuChannel, ClientChannel
+from menu_manager.query_client import query_command
+from menu_manager.session import SessionRegistry, read_session_token, write_session_token
+from core.core_service import bind_unix_listener
 
-def run_socket_client(host, port, frontend, timeout=2.0, interval=0.05):
-    start = time.time()
-    connection = False
-    while time.time() - start < timeout:
+# Interfaces whose menus are answered by a remote selector client
+SOCKET_SERVER_INTERFACES = {"socket-server", "sockets-server", "daemon"}
+# Frontends that can re-query the server as the user types
+QUERY_FRONTENDS = {"fzf"}
+
+def run_client_session(s, frontend, session_file=None, query_socket=None):
+    """
+    Answers menu requests from the server on an already connected socket until it hangs up.
+    With `session_file` the client resumes the server session stored there. Cancelling a menu
+    still answers [] (that's how the menus go back up a level); only interrupting the client
+    (Ctrl-C, SIGTERM, SIGHUP) leaves a menu unanswered, for the next client started with the
+    same file to pick up.
+    `query_socket` is the server's UNIX socket path, which query menus connect to again.
+    """
+    token = read_session_token(session_file) if session_file else None
+    channel = ClientChannel(s, session=token)
+    channel.hello(queries=frontend in QUERY_FRONTENDS and query_socket is not None)
+    try:
+        _answer_menus(channel, frontend, session_file, token, query_socket)
+    except KeyboardInterrupt:
+        if not channel.session:
+            raise
+        logging.info("[Client] Interrupted; leaving the session to be resumed.")
+
+def _answer_menus(channel, frontend, session_file, token, query_socket):
+    while True:
+        args = channel.recv_menu()
+        if not args:
+            print("No data received, exiting")
+            break
+        if session_file and channel.session != token:
+            token = channel.session
+            write_session_token(session_file, token)
+        options = {}
+        if args.get('query') and frontend in QUERY_FRONTENDS and query_socket:
+            options['query_command'] = query_command(query_socket, args['query'])
+        if args.get('indices'):
+            options['indices'] = True
+        selection = selector(
+            frontend, 
+            args['entries'],
+            args['prompt'],
+            args['multi_select'],
+            args['text_input'],
+            **options
+        )
+        channel.send_selection(selection)
+
+def _interrupt_on_termination():
+    """SIGTERM/SIGHUP interrupt the client like Ctrl-C, so a killed launcher detaches from its session."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for signum in (signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, signal.default_int_handler)
+
+def signal_ready(ready_fd):
+    """Tells whoever holds the other end of `ready_fd` (pipe or FIFO) that the server is listening."""
+    if ready_fd is None:
+        return
+    try:
+        os.write(ready_fd, b"ready\n")
+    finally:
+        os.close(ready_fd)
+
+def wait_until_ready(ready_fd, timeout=10.0):
+    """Blocks until the server writes to `ready_fd`. EOF without a write means it died while starting."""
+    try:
+        readable, _, _ = select.select([ready_fd], [], [], timeout)
+        if not readable:
+            raise TimeoutError(f"Server did not signal readiness within {timeout} seconds.")
+        if not os.read(ready_fd, 64):
+            raise ConnectionError("Server exited before it was ready.")
+    finally:
+        os.close(ready_fd)
+
+def _connect(family, address, deadline, interval):
+    """
+    Connects, retrying every `interval` seconds while nothing listens yet, until `deadline`.
+    UNIX sockets get one attempt: servers only make the socket file visible once they are
+    listening, so a missing (or refusing) one means no server is running or starting.
+    """
+    while True:
+        s = socket.socket(family, socket.SOCK_STREAM)
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                try:
-                    connected = True
-                    print(f"Client connecting to {host}:{port}")
-                    print(f"Client connecting at {get_timestamp()}")
-                    s.connect((host, port))
-                    print(f"Client connected at {get_timestamp()}")
-                    while True:
-                        data = recv_message(s, 'client')
-                        if not data:
-                            print("No data received, exiting")
-                            break
-                        args = json.loads(data)
-                        selection = selector(
-                            frontend, 
-                            args['entries'],
-                            args['prompt'],
-                            args['multi_select'],
-                            args['text_input']
-                        )
-                        send_message(s, json.dumps({"selection": selection}), 'client')
-                except Exception as e:
-                    print(f"[Client] Error: {e}")
-        except OSError as e:
-            if e.errno not in (errno.ECONNREFUSED, errno.EHOSTUNREACH):
-                raise
+            s.connect(address)
+            return s
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            s.close()
+            if family == socket.AF_UNIX or time.monotonic() >= deadline:
+                raise ConnectionError(f"No server listening at {address}: {e}") from e
+        except BaseException:
+            s.close()
+            raise
         time.sleep(interval)
-    if not connected:
-        raise TimeoutError(f"Server did not become ready at {host}:{port} within {timeout} seconds.")
 
+def run_socket_client(host, port, frontend, socket_path=None, ready_fd=None, timeout=10.0, session_file=None, interval=0.05):
+    """
+    Connects and serves menus until the server hangs up.
+    With `ready_fd` the client first blocks on the server's readiness signal and then connects
+    once. Without it (server and client started separately) a TCP client retries connect() for
+    up to `timeout` seconds while the server comes up; a UNIX socket client fails right away
+    when there is no socket to connect to (see _connect).
+    """
+    if ready_fd is not None:
+        wait_until_ready(ready_fd, timeout)
+        deadline = time.monotonic()
+    else:
+        deadline = time.monotonic() + timeout
+
+    family = socket.AF_UNIX if socket_path else socket.AF_INET
+    address = socket_path if socket_path else (host, port)
+    print(f"Client connecting to {address}")
+    print(f"Client connecting at {get_timestamp()}")
+    try:
+        s = _connect(family, address, deadline, interval)
+    except ConnectionError as e:
+        print(f"[Client] Error: {e}")
+        return
+    with s:
+        print(f"Client connected at {get_timestamp()}")
+        if session_file:
+            _interrupt_on_termination()
+        try:
+            run_client_session(s, frontend, session_file, query_socket=socket_path)
+        except Exception as e:
+            print(f"[Client] Error: {e}")
+
+
+def serve_query(conn, hello, handler):
+    """Answers a query client's hello with the top results for its query, then returns."""
+    request = hello["query"]
+    channel = MenuChannel.from_hello(conn, hello)
+    try:
+        results = handler(request.get("source"), request.get("text", ""), request.get("limit"))
+    except Exception as e:
+        logging.error(f"[Server] Query failed: {e}")
+        results = []
+    channel.send_menu(results, prompt="")
+
+
+def workspace_query_handler(state):
+    def handle(source, text, limit):
+        index = state.workspace.get_query_index()
+        return index.top(text, limit) if limit else index.top(text)
+    return handle
 
-def run_socket_server(manager):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+
+def serve_connection(manager, conn, channel=None):
+    """Runs the menus of `manager` against one connected selector client."""
+    manager.socket_conn = channel or MenuChannel.accept(conn)
+    def send(msg): send_message(conn, msg)
+    def recv(): return recv_message(conn, 'server')
+    manager.send = send
+    manager.recv = recv
+    try:
+        return manager.navigate_menu(manager.menu_structure_callable)
+    finally:
+        manager.socket_conn = None
+
+
+def open_listener(host, port, socket_path=None):
+    """A listening AF_UNIX socket at `socket_path` if given, otherwise TCP on host:port."""
+    if socket_path:
+        return bind_unix_listener(socket_path)
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.bind((host, port))
+        s.listen()
+    except OSError:
+        s.close()
+        raise
+    return s
+
+
+def serve_sessions(listener, manager, timeout):
+    """
+    Accepts clients until the manager's session ends: clients that disconnect can come back
+    within `timeout` seconds and resume at the menu they left.
+    """
+    registry = SessionRegistry(lambda: manager, timeout, single=True)
+    manager.serves_queries = True
+    handle_query = workspace_query_handler(manager.state)
+    listener.settimeout(0.5)  # So the loop notices when the session is over
+    started = False
+    while not (started and registry.finished.is_set()):
         try:
-            s.bind((manager.host, manager.port))
-            s.listen()
+            conn, _ = listener.accept()
+        except socket.timeout:
+            continue
+        conn.settimeout(None)
+        started = True
+
+        def serve(conn=conn):
+            with conn:
+                try:
+                    hello = MenuChannel.read_hello(conn)
+                except OSError as e:
+                    logging.warning(f"[Server] Dropping connection: {e}")
+                    return
+                if hello and "query" in hello:
+                    serve_query(conn, hello, handle_query)
+                else:
+                    registry.serve(conn, hello)
+        threading.Thread(target=serve, daemon=True).start()
+
+
+def run_socket_server(manager, ready_fd=None, socket_path=None, session_timeout=None):
+    address = socket_path or f"{manager.host}:{manager.port}"
+    try:
+        listener = open_listener(manager.host, manager.port, socket_path)
+    except OSError as e:
+        print(f"[Server] Error: {e}")
+        return
+    try:
+        with listener as s:
             print("Server Listening...")
+            signal_ready(ready_fd)
+            if session_timeout:
+                print(f"Accepting connections at {address} (sessions resumable for {session_timeout}s)")
+                serve_sessions(s, manager, session_timeout)
+                return
             conn, _ = s.accept()
-            print(f"Accepting connections at {manager.host}:{manager.port}")
+            print(f"Accepting connections at {address}")
             print(f"Server Listening at {get_timestamp()}")
             with conn:
-                manager.socket_conn = conn
-                def send(msg): send_message(conn, msg)
-                def recv(): return recv_message(conn, 'server')
-                manager.send = send
-                manager.recv = recv
-                result = manager.navigate_menu(manager.menu_structure_callable)
-                if result in ['EXIT_SIGNAL']:
-                    return
+                result = serve_connection(manager, conn)
+            if result in ['EXIT_SIGNAL']:
+                return
 
-        except Exception as e:
-            print(f"[Server] Error: {e}")
-        finally:
-            manager.socket_conn = None
+    except Exception as e:
+        print(f"[Server] Error: {e}")
+    finally:
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
 
 def run_cli_app(manager):
     # This loop is primarily for non-socket (CLI) interfaces
@@ -90,35 +273,23 @@ def run_cli_app(manager):
 def selector(frontend, *args, **kwargs):
     if frontend == "fzf":
         return run_fzf(*args, **kwargs)
+    elif frontend == "fzf-session":
+        return run_fzf_session(*args, **kwargs)
     elif frontend == "rofi":
         return run_rofi(*args, **kwargs)
     elif frontend == "cli":
         return run_cli_selector(*args, **kwargs)
+    elif frontend == "curses":
+        return run_curses(*args, **kwargs)
     else:
         print(f"No selector found for {frontend}")
         exit(1)
 
 
-def run_via_socket(conn, entries, prompt, multi_select=False, text_input=True):
-    
-    menu_data_to_send = {
-        "prompt": prompt,
-        "entries": entries,
-        "multi_select": multi_select,
-        "text_input": text_input
-    }
-    print("Sending socket packet", menu_data_to_send)
-    send_message(conn, json.dumps(menu_data_to_send), 'server')
-
-    data = recv_message(conn, 'server')
-    if not data:
-        return []
-    try:
-        selection_data = json.loads(data)
-        print("Received pacet: ", selection_data)
-        selection = selection_data.get("selection", [])
-        if isinstance(selection, list):
-            return selection
-        return [selection]
-    except (json.JSONDecodeError, KeyError):
-        return []
+def run_via_socket(channel, entries, prompt, multi_select=False, text_input=True, query=None, indices=False):
+    if not isinstance(entries, list):
+        entries = list(entries)  # Hashing, deltas and chunking need the whole list
+    logging.debug(f"Sending menu '{prompt}' ({len(entries)} entries, protocol v{channel.version})")
+    selection = channel.exchange(entries, prompt, multi_select, text_input, query, indices)
+    logging.debug(f"Received selection: {selection}")
+    return selection
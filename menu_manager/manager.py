@@ -1,18 +1,26 @@
 from pathlib import Path
 from filesystem.filesystem import list_files, list_directories
+from filesystem.listing import directory_listings
 from core.core import edit_files
 from state.search_options import SearchOptions
 from filters.main import get_entries
+from filters.query import QUERY_MODE_MIN_ENTRIES
 # from filesystem.tree_utils import build_tree, flatten_tree
 
 from .menu_workspace import WorkspaceActions
 from .menu_clipboard import ClipboardActions
+import os
 import re
 import logging
-from menu_manager.interface import selector, run_via_socket
+from menu_manager.interface import selector, run_via_socket, SOCKET_SERVER_INTERFACES
+from menu_manager.frontend import selection_indices
 
 # logging.basicConfig(level=logging.DEBUG)
 
+# Starts the large-directory actions in the browse menu. File names can't contain a "/" so
+# these never collide with an entry (directories only have one at the end).
+LARGE_DIRECTORY_ACTION = "//"
+
 class MenuManager(WorkspaceActions, ClipboardActions):
     def __init__(self, state, interface=None, frontend=None, host=None, port=None):
         self.state = state
@@ -21,6 +29,7 @@ class MenuManager(WorkspaceActions, ClipboardActions):
         self.search_options = SearchOptions(self, state)
         self.menu_structure_callable = self._get_main_menu_structure
         self.socket_conn = None
+        self.serves_queries = False # The server also answers query clients on its socket
         self.host = host or '127.0.0.1'
         self.port = int(port or 65432)
 
@@ -58,16 +67,21 @@ class MenuManager(WorkspaceActions, ClipboardActions):
             'Remove from clipboard queue': self.remove_from_clipboard,
         }
 
-    def run_selector(self, entries, prompt, multi_select=False, text_input=True):
+    def run_selector(self, entries, prompt, multi_select=False, text_input=True, query=None, indices=False):
+        """With `indices`, returns the positions of the selected entries in `entries` instead of the strings."""
+        if indices and not isinstance(entries, list):
+            entries = list(entries)
         try:
-            if self.interface == "socket-server" or self.interface == "sockets-server":
-                selected_option = run_via_socket(self.socket_conn, entries, prompt, multi_select, text_input)
+            if self.interface in SOCKET_SERVER_INTERFACES:
+                selected_option = run_via_socket(self.socket_conn, entries, prompt, multi_select, text_input, query, indices)
             else:
-                selected_option = selector(self.frontend, entries, prompt, multi_select, text_input)
+                selected_option = selector(self.frontend, entries, prompt, multi_select, text_input, indices=indices)
+            if indices:
+                return selection_indices(entries, selected_option)
             return selected_option
         except EOFError:
             logging.info("[MenuManager] EOF received, exiting CLI.")
-            return ["Quit"]
+            return [] if indices else ["Quit"]
         
     def navigate_menu(self, menu_source):
         while True:
@@ -103,13 +117,14 @@ class MenuManager(WorkspaceActions, ClipboardActions):
 
   
     def search_workspace(self):
-        entries = self.state.workspace.cache
-
-        entries_str = [str(e) for e in entries]
+        # Query mode only for clients that said they can re-query; the rest get every path
+        if self.serves_queries and getattr(self.socket_conn, "queries", False) \
+                and len(self.state.workspace.cache) >= QUERY_MODE_MIN_ENTRIES:
+            return self._search_workspace_by_query()
         # These are redundant, but may become useful if future features require it
         # tree = build_tree(entries_str) # Create a directory tree
         # choices = flatten_tree(tree)
-        choices = sorted(entries_str)
+        choices = self.state.workspace.get_query_index().snapshot()  # Sorted, and kept sorted as the cache changes
 
         while True:
             selection = self.run_selector(choices, prompt="Workspace Files")
@@ -117,9 +132,22 @@ class MenuManager(WorkspaceActions, ClipboardActions):
                 return
             edit_files([Path(s) for s in selection])
 
+    def _search_workspace_by_query(self):
+        """Sends only the top results; the selector re-queries the server as the user types."""
+        index = self.state.workspace.get_query_index()
+        while True:
+            selection = self.run_selector(index.top(""), prompt="Workspace Files", query="workspace")
+            if not selection:
+                return
+            cache = self.state.workspace.cache
+            paths = [s for s in selection if s in cache]
+            if paths:
+                edit_files([Path(s) for s in paths])
+
     def browse_workspace(self):
         while True:
             entries = sorted(str(p) for p in self.state.workspace.list())
+            directory_listings.prefetch(entries)  # Roots that are files just fail quietly
             choice = self.run_selector(entries, prompt="Select Root")
             if not choice:
                 return
@@ -135,12 +163,22 @@ class MenuManager(WorkspaceActions, ClipboardActions):
 
         while True:
             try:
-                entries = sorted(cur_path.iterdir(), key=lambda p: (not p.is_dir(), p.name.lower()))
+                listing = directory_listings.get(cur_path)
+                display = listing.display()
             except Exception:
-                entries = []
+                listing, display = None, []
+            if listing is not None:
+                # Read the subdirectories while the menu is open; descending is then a cache hit.
+                # `entries`, not dirs(): a large listing's dirs() waits for its full sort
+                directory_listings.prefetch(os.path.join(listing.path, name) for name, is_dir in listing.entries if is_dir)
+                if listing.partial:
+                    display = self._large_directory_actions(listing) + display
 
-            display = [f"{e.name}/" if e.is_dir() else e.name for e in entries]
             choice = self.run_selector(display, prompt=str(cur_path))
+            if choice and choice[0].startswith(LARGE_DIRECTORY_ACTION):
+                choice = self._large_directory_pick(listing, choice[0])
+                if choice is None:
+                    continue  # Back to the preview
             if not choice:
                 if stack:
                     cur_path = stack.pop()
@@ -150,12 +188,47 @@ class MenuManager(WorkspaceActions, ClipboardActions):
             name = choice[0].rstrip("/")
             next_path = cur_path / name
             logging.info(next_path)
-            if next_path.is_dir():
+            is_dir = listing.is_dir(name) if listing is not None else None
+            if is_dir is None:
+                is_dir = next_path.is_dir()  # Typed text rather than a listed entry
+            if is_dir:
                 stack.append(cur_path)
                 cur_path = next_path
             else:
                 edit_files([next_path])
 
+    @staticmethod
+    def _large_directory_actions(listing):
+        if listing.done.is_set():
+            everything = f"{LARGE_DIRECTORY_ACTION} Show all {listing.count} entries"
+        else:
+            everything = (f"{LARGE_DIRECTORY_ACTION} Showing {len(listing.entries)} of the first {listing.previewed_from} read;"
+                          f" still sorting {listing.count}+ (select to refresh)")
+        return [f"{LARGE_DIRECTORY_ACTION} Filter this directory", everything]
+
+    def _large_directory_pick(self, listing, action):
+        """
+        Runs one of the large-directory actions: a filter pushed down to the listing, or every
+        entry streamed from the sorted spill. Returns the selection, or None to show the preview again.
+        """
+        if action.endswith("Filter this directory"):
+            pattern = self.run_selector([], prompt=f"Filter {listing.path} (text or glob)")
+            pattern = pattern[0].strip() if pattern else ""
+            if not pattern:
+                return None
+            prompt = f"{listing.path} [{pattern}]"
+        elif listing.done.is_set():
+            pattern, prompt = None, listing.path
+        else:
+            return None
+        try:
+            entries = listing.matching(pattern) if pattern else listing.iter_entries()
+            selection = self.run_selector((f"{name}/" if is_dir else name for name, is_dir in entries), prompt=prompt)
+        except Exception as e:  # A failed background sort re-raises whatever stopped it
+            logging.error(f"[Browse] Could not read {listing.path}: {e}")
+            return None
+        return selection or None
+
     def manage_generator_blacklist(self):
         blacklist_menu = {
             'View current patterns': self._view_blacklist_patterns,
@@ -206,24 +279,20 @@ class MenuManager(WorkspaceActions, ClipboardActions):
             return
         
         display_patterns = [f"{i+1}. {p}" for i, p in enumerate(patterns)]
-        selection_list = self.run_selector(display_patterns, prompt="Select pattern(s) to remove", multi_select=True)
+        selection_list = self.run_selector(display_patterns, prompt="Select pattern(s) to remove", multi_select=True, indices=True)
         if not selection_list:
             logging.debug("No pattern selected for removal.")
             return
 
         removed_any = False
-        for sel_str in selection_list:
+        for i in selection_list:
+            pattern_to_remove = patterns[i]
             try:
-                parts = sel_str.split(' ', 1)
-                if len(parts) > 1:
-                    pattern_to_remove = parts[1]
-                    self.state.workspace.remove_generator_blacklist_pattern(pattern_to_remove)
-                    removed_any = True
-                    logging.info(f"Removed generator blacklist pattern: '{pattern_to_remove}'")
-                else:
-                    logging.warning(f"Could not parse selection string '{sel_str}', skipping.")
+                self.state.workspace.remove_generator_blacklist_pattern(pattern_to_remove)
+                removed_any = True
+                logging.info(f"Removed generator blacklist pattern: '{pattern_to_remove}'")
             except Exception as e:
-                logging.error(f"Error removing pattern '{sel_str}': {e}")
+                logging.error(f"Error removing pattern '{pattern_to_remove}': {e}")
         
         if removed_any:
             # Manually set dirty flag for now.
@@ -12,22 +12,22 @@ class WorkspaceActions:
     def traverse_directory(self):
         while True:
             dirs = list_directories(self.get_root_dir())
-            selection = self.run_selector([str(d) for d in dirs], prompt="Select Directory")
+            selection = self.run_selector([str(d) for d in dirs], prompt="Select Directory", indices=True)
             if not selection:
                 return
-            self.state.root_dir = dirs[[str(d) for d in dirs].index(selection[0])]
+            self.state.root_dir = dirs[selection[0]]
 
     def add_files(self):
         root_dir = self.get_root_dir()
         entries = list_files(root_dir)
-        selection = self.run_selector([str(e) for e in entries], prompt="Select Files to Add", multi_select=True)
+        selection = self.run_selector([str(e) for e in entries], prompt="Select Files to Add", multi_select=True, indices=True)
         if selection:
-            self.state.workspace.add([entries[[str(e) for e in entries].index(s)] for s in selection], root_dir=root_dir)
-        self.update_file_watcher()
+            self.state.workspace.add([entries[i] for i in selection], root_dir=root_dir)
+        self.state.workspace.update_file_watcher()
 
     def remove_files(self):
         entries = self.state.workspace.list()
-        selection = self.run_selector([str(p) for p in entries], prompt="Select Files to Remove", multi_select=True)
+        selection = self.run_selector([str(p) for p in entries], prompt="Select Files to Remove", multi_select=True, indices=True)
         if selection:
-            self.state.workspace.remove([entries[[str(e) for e in entries].index(s)] for s in selection])
-        self.update_file_watcher()
+            self.state.workspace.remove([entries[i] for i in selection])
+        self.state.workspace.update_file_watcher()
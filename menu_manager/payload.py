@@ -1,32 +1,117 @@
 # payload.py
+import atexit
+import collections
+import os
 import struct
+import threading
 import time
 from datetime import datetime
 
+HEADER = struct.Struct('!I')  # Big-endian length prefix of every message
+
 def get_timestamp():
     now = datetime.now()
     return now.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]  # trim to milliseconds
 
+class PacketTracer:
+    """
+    Per-packet trace lines go into a bounded ring buffer and are appended to `log_path`
+    by a background thread, so tracing never does file I/O on the send/receive path.
+    Off unless EDITOR_MENU_PACKET_TRACE names a log file.
+    """
+    def __init__(self, log_path, capacity=4096, interval=1.0):
+        self.log_path = log_path
+        self.enabled = bool(log_path)
+        self.interval = interval
+        self._buffer = collections.deque(maxlen=capacity)  # Oldest lines are dropped if the flusher falls behind
+        self._flusher = None
+        self._lock = threading.Lock()
+
+    def record(self, message):
+        if not self.enabled:
+            return
+        self._buffer.append(message)
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run, name="packet-tracer", daemon=True)
+                    self._flusher.start()
+                    atexit.register(self.flush)
+
+    def flush(self):
+        lines = []
+        while self._buffer:
+            try:
+                lines.append(self._buffer.popleft())
+            except IndexError:
+                break
+        if not lines:
+            return
+        try:
+            with open(self.log_path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+        except OSError:
+            pass
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+tracer = PacketTracer(os.environ.get('EDITOR_MENU_PACKET_TRACE'))
+
 def write_log(message):
-    with open('/srv/projects/editor-menu/packet_times.log', 'a') as f:
-        f.write(message + '\n')
-
-def send_message(sock, message: str, name):
-    data = message.encode('utf-8')
-    length = struct.pack('!I', len(data))
-    sock.sendall(length + data)
-    write_log(f"{name} sent packet at {get_timestamp()}")
-
-def recv_message(sock, name):
-    raw_len = sock.recv(4)
-    if not raw_len:
-        return None
-    length = struct.unpack('!I', raw_len)[0]
-    data = b''
-    while len(data) < length:
-        chunk = sock.recv(length - len(data))
-        if not chunk:
+    tracer.record(message)
+
+def _sendall_vectored(sock, buffers):
+    """sendall() for several buffers at once, without concatenating them first."""
+    views = [memoryview(b) for b in buffers if len(b)]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+def _recv_exact(sock, length, allow_eof=False):
+    """Reads exactly `length` bytes into one preallocated buffer. Returns None on a clean EOF if allowed."""
+    buf = bytearray(length)
+    view = memoryview(buf)
+    received = 0
+    while received < length:
+        count = sock.recv_into(view[received:], length - received)
+        if count == 0:
+            if allow_eof and received == 0:
+                return None
             raise ConnectionError("Connection closed before full message received")
-        data += chunk
-    write_log(f"{name} received packet at {get_timestamp()}")
+        received += count
+    return buf
+
+def send_frame(sock, data: bytes, name=None):
+    send_frame_parts(sock, [data], name)
+
+def send_frame_parts(sock, parts, name=None):
+    """Sends several buffers as the body of one frame."""
+    length = sum(len(p) for p in parts)
+    _sendall_vectored(sock, [HEADER.pack(length), *parts])
+    if tracer.enabled:
+        write_log(f"{name} sent packet at {get_timestamp()}")
+
+def recv_frame(sock, name=None):
+    raw_len = _recv_exact(sock, HEADER.size, allow_eof=True)
+    if raw_len is None:
+        return None
+    data = _recv_exact(sock, HEADER.unpack(raw_len)[0])
+    if tracer.enabled:
+        write_log(f"{name} received packet at {get_timestamp()}")
+    return data
+
+def send_message(sock, message: str, name=None):
+    send_frame(sock, message.encode('utf-8'), name)
+
+def recv_message(sock, name=None):
+    data = recv_frame(sock, name)
+    if data is None:
+        return None
     return data.decode('utf-8')
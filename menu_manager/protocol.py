@@ -0,0 +1,422 @@
+# menu_manager/protocol.py
+"""
+Menu exchange between a server (which runs the menus) and a selector client, on top of the
+length-prefixed frames in menu_manager.payload.
+
+Clients open with a `hello` frame naming the protocol version they speak, and the server
+answers with `welcome`. Clients that predate the hello wait silently for the first menu, so a
+connection that says nothing within HELLO_WINDOW is served as version 1; a hello that shows up
+after that is skipped like any other stray one and the connection stays on version 1.
+Version 1 (legacy) sends every menu as a JSON object with an `entries` array. Version 2 sends
+menus as binary frames:
+
+    MENU_TAG | meta length (!I) | meta JSON | entries joined by "\\n" (optionally compressed)
+
+Line-format menus also carry a generation id (a hash of the list). Both ends keep the last few
+lists in an LRU keyed by that id and update it the same way, so a menu whose list the client
+already has is sent as `reuse` with an empty body, and one that differs a little from the list
+last shown under the same prompt is sent as a `delta` (adds and removes) against it.
+
+Lists of STREAM_MIN_ENTRIES or more are streamed to clients that support it: a MENU_TAG frame
+with `stream` set and no body, then STREAM_TAG frames of at most STREAM_CHUNK_ENTRIES lines
+each, then STREAM_END, after which the server waits for the selection. The client can start
+the selector on the first chunk. Streamed lists carry no generation id and stay out of both
+list caches, which would otherwise hold several copies of the largest lists.
+"""
+import collections
+import hashlib
+import heapq
+import json
+import logging
+import select
+import socket
+import zlib
+
+from menu_manager.payload import HEADER, send_frame, send_frame_parts, recv_frame
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+PROTOCOL_VERSION = 2
+MENU_TAG = b'\x02'  # Never the first byte of a JSON frame
+STREAM_TAG = b'\x03'
+STREAM_END = b'\x04'
+HELLO_WINDOW = 0.5  # A client that hasn't said hello by then is a version 1 client
+COMPRESSION_THRESHOLD = 64 * 1024  # Bodies smaller than this aren't worth compressing
+LIST_CACHE_SIZE = 4  # Entry lists each end remembers for reuse/delta menus
+STREAM_MIN_ENTRIES = 32 * 1024  # Shorter lists go in one frame
+STREAM_CHUNK_ENTRIES = 8 * 1024
+
+def _compress(data: bytes, method: str) -> bytes:
+    if method == "lz4":
+        return lz4_frame.compress(data)
+    return zlib.compress(data, 1)
+
+def _decompress(data, method: str) -> bytes:
+    if method == "lz4":
+        return lz4_frame.decompress(data)
+    return zlib.decompress(data)
+
+def supported_compression() -> list:
+    return ["lz4", "zlib"] if lz4_frame is not None else ["zlib"]
+
+def _is_local(conn) -> bool:
+    """UNIX sockets, socketpairs and loopback TCP: compressing costs more time than it saves there."""
+    if conn.family != socket.AF_INET and conn.family != socket.AF_INET6:
+        return True
+    import ipaddress  # Only TCP connections get here; query clients start faster without it
+    try:
+        return ipaddress.ip_address(conn.getpeername()[0]).is_loopback
+    except (OSError, ValueError):
+        return False
+
+def _hello_of(frame):
+    """The hello dict if `frame` is a client's hello, else None."""
+    if frame[:1] != b'{':
+        return None
+    try:
+        hello = json.loads(frame).get("hello")
+    except (ValueError, AttributeError):
+        return None
+    return hello if isinstance(hello, dict) else None
+
+def list_id(body: bytes, count: int) -> str:
+    """Generation id of a list joined into `body`. The count goes in too: [] and [""] join the same."""
+    digest = hashlib.blake2b(count.to_bytes(8, 'big'), digest_size=8)
+    digest.update(body)
+    return digest.hexdigest()
+
+def _chunks(entries):
+    for i in range(0, len(entries), STREAM_CHUNK_ENTRIES):
+        part = entries[i:i + STREAM_CHUNK_ENTRIES]
+        yield len(part), "\n".join(part).encode('utf-8')
+
+def _chunks_line_safe(entries) -> bool:
+    """Whether every entry survives being line-joined, checked chunk by chunk without holding the whole body."""
+    return all(chunk.count(b"\n") == count - 1 for count, chunk in _chunks(entries))
+
+
+class ListCache:
+    """LRU of entry lists by generation id. Only put() changes the order, and both ends call it for the same lists."""
+    def __init__(self, capacity=LIST_CACHE_SIZE):
+        self.capacity = capacity
+        self._lists = collections.OrderedDict()
+
+    def __contains__(self, gen):
+        return gen in self._lists
+
+    def get(self, gen):
+        return self._lists.get(gen)
+
+    def put(self, gen, entries):
+        self._lists[gen] = entries
+        self._lists.move_to_end(gen)
+        while len(self._lists) > self.capacity:
+            self._lists.popitem(last=False)
+
+
+def apply_delta(base, adds, removes, order):
+    kept = base
+    if removes:
+        removed = set(removes)
+        kept = [e for e in base if e not in removed]
+    if order == "sorted":
+        return list(heapq.merge(kept, adds))
+    return list(kept) + adds
+
+def make_delta(base, entries):
+    """
+    Returns (adds, removes, order) that turn `base` into `entries`, or None when a full list is
+    the better (or only) option: duplicates, reordering, or too many changes.
+    """
+    base_set, entry_set = set(base), set(entries)
+    if len(base_set) != len(base) or len(entry_set) != len(entries):
+        return None
+    adds = [e for e in entries if e not in base_set]
+    removes = [e for e in base if e not in entry_set]
+    if len(adds) + len(removes) > len(entries) // 2:
+        return None
+    # Adds keep their order from `entries`, so a sorted list gets sorted adds
+    for order in ("append", "sorted"):
+        if apply_delta(base, adds, removes, order) == entries:
+            return adds, removes, order
+    return None
+
+
+class MenuChannel:
+    """Server end of one selector connection, speaking whatever the client negotiated."""
+    def __init__(self, conn, version=1, compression=None, list_cache=0, stream=False):
+        self.conn = conn
+        self.version = version
+        self.compression = compression
+        self.stream = stream
+        self.session = None  # Token of the server session this connection is attached to
+        self.queries = False  # The client can re-query the server as the user types (see query_client)
+        self.closed = False  # Set when the client hangs up instead of answering
+        self.lists = ListCache(list_cache) if list_cache else None
+        self._last_list = {}  # prompt -> generation id last shown under it
+
+    @classmethod
+    def accept(cls, conn, window=HELLO_WINDOW):
+        """Waits for the client's hello and replies with the chosen capabilities."""
+        return cls.from_hello(conn, cls.read_hello(conn, window))
+
+    @staticmethod
+    def read_hello(conn, window=HELLO_WINDOW):
+        """
+        Returns the client's hello dict, or None if it says nothing within `window` seconds
+        (a version 1 client). Raises ConnectionError if the client hangs up or opens with
+        anything else.
+        """
+        readable, _, _ = select.select([conn], [], [], window)
+        if not readable:
+            return None
+        frame = recv_frame(conn, 'server')
+        if frame is None:
+            raise ConnectionError("Client hung up before saying hello")
+        hello = _hello_of(frame)
+        if hello is None:
+            raise ConnectionError("Client did not open with a hello")
+        return hello
+
+    @classmethod
+    def from_hello(cls, conn, hello, session=None):
+        """Negotiates from a hello returned by read_hello() and sends the welcome."""
+        if not hello:
+            return cls(conn)
+        version = min(PROTOCOL_VERSION, int(hello.get("version", 1)))
+        offered = [] if _is_local(conn) else hello.get("compression", [])
+        compression = next((c for c in supported_compression() if c in offered), None)
+        list_cache = min(LIST_CACHE_SIZE, int(hello.get("list_cache", 0))) if version >= 2 else 0
+        stream = version >= 2 and bool(hello.get("stream"))
+        channel = cls(conn, version, compression, list_cache, stream)
+        channel.session = session
+        channel.queries = bool(hello.get("queries"))
+        send_frame(conn, json.dumps({"welcome": channel.capabilities()}).encode(), 'server')
+        return channel
+
+    def capabilities(self) -> dict:
+        return {
+            "version": self.version,
+            "compression": self.compression,
+            "list_cache": self.lists.capacity if self.lists else 0,
+            "stream": self.stream,
+            "session": self.session,
+        }
+
+    def send_menu(self, entries, prompt, multi_select=False, text_input=True, query=None, indices=False):
+        meta = {"prompt": prompt, "multi_select": multi_select, "text_input": text_input}
+        if indices:
+            meta["indices"] = True  # Answer with positions in the list rather than the entries
+        if query:
+            meta["query"] = query  # Entries are a top-K; the client may ask the server for more (see query_client)
+        if self.version >= 2:
+            if self.stream and len(entries) >= STREAM_MIN_ENTRIES:
+                # Not cached at either end: a few of these would hold hundreds of MB
+                if _chunks_line_safe(entries):
+                    self._stream_lines(meta, entries)
+                    return
+            else:
+                body = "\n".join(entries).encode('utf-8')
+                # Entries containing newlines can't be line-joined; JSON handles them
+                if not entries or body.count(b"\n") == len(entries) - 1:
+                    self._send_line_list(meta, entries, body)
+                    return
+        meta["entries"] = entries
+        send_frame(self.conn, json.dumps(meta).encode('utf-8'), 'server')
+
+    def _send_line_list(self, meta, entries, body):
+        if self.lists is None:
+            self._send_lines(meta, body, len(entries))
+            return
+        gen = list_id(body, len(entries))
+        meta["list"] = gen
+        if not self._send_by_reference(meta, entries, gen):
+            self._send_lines(meta, body, len(entries))
+        # Snapshot: the caller may mutate its list, the client's copy won't change
+        self.lists.put(gen, list(entries))
+        self._last_list[meta["prompt"]] = gen
+
+    def _send_by_reference(self, meta, entries, gen) -> bool:
+        """Sends the list by id when the client has it, or as a delta when that's much smaller. False if neither applies."""
+        base_gen = self._last_list.get(meta["prompt"])
+        if gen in self.lists:
+            meta["reuse"] = True
+            self._send_lines(meta, b"", 0)
+            return True
+        if base_gen in self.lists and (delta := make_delta(self.lists.get(base_gen), entries)):
+            adds, removes, order = delta
+            meta.update({"base": base_gen, "order": order, "adds": len(adds)})
+            self._send_lines(meta, "\n".join(adds + removes).encode('utf-8'), len(adds) + len(removes))
+            return True
+        return False
+
+    def _stream_lines(self, meta, entries):
+        meta["stream"] = True
+        if self.compression:
+            meta["compression"] = self.compression
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        send_frame_parts(self.conn, [MENU_TAG, HEADER.pack(len(meta_bytes)), meta_bytes], 'server')
+        for _, chunk in _chunks(entries):
+            if self.compression:
+                chunk = _compress(chunk, self.compression)
+            send_frame_parts(self.conn, [STREAM_TAG, chunk], 'server')
+        send_frame(self.conn, STREAM_END, 'server')
+
+    def _send_lines(self, meta, body, count):
+        """`count` is the number of lines in `body`."""
+        meta["count"] = count
+        if self.compression and len(body) >= COMPRESSION_THRESHOLD:
+            body = _compress(body, self.compression)
+            meta["compression"] = self.compression
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        send_frame_parts(self.conn, [MENU_TAG, HEADER.pack(len(meta_bytes)), meta_bytes, body], 'server')
+
+    def recv_selection(self):
+        data = recv_frame(self.conn, 'server')
+        while data and _hello_of(data) is not None:
+            # Never an answer: taking it for one would pair every later selection with the wrong menu
+            logging.warning("[Protocol] Ignoring a hello in place of a selection")
+            data = recv_frame(self.conn, 'server')
+        if data is None:
+            self.closed = True
+        if not data:
+            return []
+        try:
+            selection = json.loads(data).get("selection", [])
+        except (json.JSONDecodeError, AttributeError):
+            return []
+        if isinstance(selection, list):
+            return selection
+        return [selection]
+
+    def exchange(self, entries, prompt, multi_select=False, text_input=True, query=None, indices=False):
+        self.send_menu(entries, prompt, multi_select, text_input, query, indices)
+        return self.recv_selection()
+
+
+class EntryStream:
+    """
+    Entries of a streamed menu, read off the socket chunk by chunk while they are iterated.
+    Can only be consumed once; whatever the selector didn't read is discarded by drain().
+    """
+    def __init__(self, channel, meta):
+        self.channel = channel
+        self.meta = meta
+        self.done = False
+
+    def chunks(self):
+        """Yields the newline-separated UTF-8 chunks as they arrive (no trailing newline)."""
+        while not self.done:
+            frame = recv_frame(self.channel.sock, 'client')
+            if not frame:
+                raise ConnectionError("Server closed the connection in the middle of a menu")
+            if frame[:1] == STREAM_END:
+                self.done = True
+                return
+            chunk = memoryview(frame)[1:]
+            if self.meta.get("compression"):
+                chunk = _decompress(chunk, self.meta["compression"])
+            yield chunk
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from str(chunk, 'utf-8').split("\n")
+
+    def drain(self):
+        for _ in self.chunks():
+            pass
+
+
+class ClientChannel:
+    """Selector end of a connection: announces its capabilities and decodes either menu format."""
+    def __init__(self, sock, list_cache=LIST_CACHE_SIZE, session=None):
+        self.sock = sock
+        self.session = session  # Token of a server session to resume
+        self.version = 1
+        self.compression = None
+        self.list_cache = list_cache
+        self.lists = None
+        self._stream = None  # EntryStream of the current menu, if it was streamed
+
+    def hello(self, query=None, queries=False):
+        """
+        Must be the first thing sent on the connection; the server waits for it.
+        `queries`: this client's selector can reload from the server as the user types.
+        """
+        hello = {
+            "version": PROTOCOL_VERSION,
+            "compression": supported_compression(),
+            "list_cache": self.list_cache,
+            "stream": True,
+        }
+        if queries:
+            hello["queries"] = True
+        if self.session:
+            hello["session"] = self.session
+        if query is not None:
+            hello["query"] = query  # A one-shot query instead of a menu session
+        send_frame(self.sock, json.dumps({"hello": hello}).encode(), 'client')
+
+    def recv_menu(self):
+        """
+        Returns the next menu as a dict (prompt, entries, multi_select, text_input), or None when
+        the server is done. For streamed menus `entries` is an EntryStream.
+        """
+        while True:
+            frame = recv_frame(self.sock, 'client')
+            if not frame:
+                return None
+            if frame[:1] == MENU_TAG:
+                return self._decode_lines(frame)
+            message = json.loads(frame)
+            if "welcome" in message:
+                self.version = message["welcome"].get("version", 1)
+                self.compression = message["welcome"].get("compression")
+                capacity = message["welcome"].get("list_cache", 0)
+                self.lists = ListCache(capacity) if capacity else None
+                self.session = message["welcome"].get("session")
+                continue
+            return message
+
+    def _decode_lines(self, frame):
+        (meta_len,) = HEADER.unpack_from(frame, 1)
+        start = 1 + HEADER.size
+        meta = json.loads(frame[start:start + meta_len])
+        if meta.get("stream"):
+            self._stream = meta["entries"] = EntryStream(self, meta)
+            return meta
+        body = memoryview(frame)[start + meta_len:]
+        if meta.get("compression"):
+            body = _decompress(body, meta["compression"])
+        lines = str(body, 'utf-8').split("\n") if meta.get("count") else []
+
+        gen = meta.get("list")
+        if gen is None:
+            meta["entries"] = lines
+            return meta
+        if self.lists is None:
+            raise ConnectionError("Server sent a cached list without negotiating list caching")
+        if meta.get("reuse"):
+            entries = self.lists.get(gen)
+        elif "base" in meta:
+            base = self.lists.get(meta["base"])
+            if base is None:
+                raise ConnectionError(f"Delta against unknown list {meta['base']}")
+            adds = meta["adds"]
+            entries = apply_delta(base, lines[:adds], lines[adds:], meta["order"])
+        else:
+            entries = lines
+        if entries is None:
+            raise ConnectionError(f"Server reused unknown list {gen}")
+        self.lists.put(gen, entries)
+        meta["entries"] = entries
+        return meta
+
+    def send_selection(self, selection):
+        if self._stream is not None:
+            self._stream.drain()  # The server only reads the selection after the whole list
+            self._stream = None
+        send_frame(self.sock, json.dumps({"selection": selection}).encode('utf-8'), 'client')
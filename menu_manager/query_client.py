@@ -0,0 +1,60 @@
+# menu_manager/query_client.py
+"""
+Prints the server's top results for a query. fzf runs it on every keystroke in query mode
+(`change:reload`), so fzf only ever holds a few thousand lines however big the workspace is.
+
+Being started per keystroke, it has to start fast: it runs with `python -S` (no site
+import; the package comes from PYTHONPATH, see query_env) and parses its fixed positional
+arguments by hand rather than importing argparse.
+"""
+import os
+import socket
+import sys
+
+from menu_manager.protocol import ClientChannel, EntryStream
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def query_command(socket_path, source):
+    """Shell command for fzf's reload action; fzf appends the quoted query."""
+    import shlex  # Only the selector client builds the command; keep it out of the per-keystroke start
+    return " ".join([
+        shlex.quote(sys.executable), "-S", "-m", "menu_manager.query_client",
+        shlex.quote(socket_path), shlex.quote(source),
+    ])
+
+def query_env():
+    """Environment for the selector so its reload commands can import this package."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (PACKAGE_ROOT, env.get("PYTHONPATH")) if p)
+    return env
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not 2 <= len(argv) <= 4:
+        print("usage: python -m menu_manager.query_client SOCKET_PATH SOURCE [QUERY [LIMIT]]", file=sys.stderr)
+        return 2
+    socket_path, source = argv[:2]
+    request = {"source": source, "text": argv[2] if len(argv) > 2 else ""}
+    if len(argv) > 3:
+        request["limit"] = int(argv[3])
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        channel = ClientChannel(s, list_cache=0)
+        channel.hello(query=request)
+        menu = channel.recv_menu()
+        if not menu:
+            return
+        out = sys.stdout.buffer
+        entries = menu["entries"]
+        if isinstance(entries, EntryStream):
+            for chunk in entries.chunks():
+                out.write(chunk)
+                out.write(b"\n")
+        elif entries:
+            out.write("\n".join(entries).encode('utf-8'))
+            out.write(b"\n")
+        out.flush()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# menu_manager/rofi_script.py
+"""
+rofi script-mode bridge to the daemon, so navigating menus keeps one rofi window open:
+
+    rofi -show workspace -modi "workspace:rofi-script.sh"
+
+rofi runs this once per step: with no argument to get the first menu, then with the picked
+entry (ROFI_RETV=1) or typed text (ROFI_RETV=2) as argv[1]. Each run resumes the daemon
+session whose token rofi keeps for us in ROFI_DATA, answers the menu that session is waiting
+on, and prints the next one. Printing nothing (the session ended) closes the window.
+Rows of menus that want indices carry theirs in ROFI_INFO.
+Needs the daemon to run with --session-timeout.
+"""
+import argparse
+import os
+import socket
+import sys
+
+from menu_manager.protocol import ClientChannel, EntryStream
+from menu_manager.session import read_session_token, write_session_token
+
+SOCKET_PATH = "/tmp/workspace_manager.sock"  # Same default as core.core_service, without importing it
+BACK = "‹ Back"
+BACK_INFO = "back"
+
+def mode_option(key, value):
+    return f"\0{key}\x1f{value}\n".encode('utf-8')
+
+def selection_from_rofi(text):
+    """What the user did in rofi, as a selection for the pending menu."""
+    info = os.environ.get("ROFI_INFO", "")
+    if info == BACK_INFO:
+        return []  # Same as cancelling the menu in the other frontends
+    if info.isdigit():
+        return [int(info)]  # Row of a menu that asked for indices
+    return [text] if text is not None else []
+
+def print_menu(menu, token, out):
+    out.write(mode_option("prompt", menu["prompt"]))
+    out.write(mode_option("data", token or ""))
+    out.write(mode_option("no-custom", "false" if menu.get("text_input", True) else "true"))
+    entries = menu["entries"]
+    if menu.get("indices"):
+        for i, entry in enumerate(entries):
+            out.write(f"{entry}\0info\x1f{i}\n".encode('utf-8'))
+    elif isinstance(entries, EntryStream):
+        for chunk in entries.chunks():
+            out.write(chunk)
+            out.write(b"\n")
+    elif entries:
+        out.write("\n".join(entries).encode('utf-8'))
+        out.write(b"\n")
+    out.write(f"{BACK}\0info\x1f{BACK_INFO}\n".encode('utf-8'))
+    out.flush()
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    parser = argparse.ArgumentParser(description="rofi script mode client for the workspace daemon")
+    parser.add_argument("--socket-path", default=SOCKET_PATH)
+    parser.add_argument("--session-file", default=None, help="Resume the last session when rofi opens")
+    parser.add_argument("selection", nargs="?", help="Passed by rofi; put it after `--` since entries may start with '-'")
+    args = parser.parse_args(argv[1:])
+
+    retv = int(os.environ.get("ROFI_RETV", "0"))
+    token = os.environ.get("ROFI_DATA") or None
+    if token is None and args.session_file:
+        token = read_session_token(args.session_file)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(args.socket_path)
+        channel = ClientChannel(s, session=token)
+        channel.hello()
+        menu = channel.recv_menu()
+        # Only answer a menu of the session the pick was made in; an expired session starts over
+        if menu and retv in (1, 2) and token and channel.session == token:
+            channel.send_selection(selection_from_rofi(args.selection))
+            menu = channel.recv_menu()
+        if args.session_file:
+            write_session_token(args.session_file, channel.session if menu else None)
+        if menu:
+            print_menu(menu, channel.session, sys.stdout.buffer)
+        # Disconnecting without an answer leaves the session waiting at this menu
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# menu_manager/session.py
+"""
+Menu sessions that outlive the selector connection.
+
+A session is one MenuManager walking its menus on its own thread. The manager talks to a
+SessionChannel instead of a connection: when the client goes away (killed, or dismissed in
+session mode) the pending menu waits for a client to come back with the session token, and
+is shown again to it. The workspace, cache and menu position stay where they were. The
+protocol's list cache (reuse/delta menus) does not: both ends of it belong to one connection,
+so a resumed client starts with an empty one and gets full lists again.
+"""
+import logging
+import secrets
+import socket
+import threading
+
+from menu_manager.protocol import MenuChannel
+
+
+def read_session_token(session_file):
+    try:
+        with open(session_file) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def write_session_token(session_file, token):
+    try:
+        with open(session_file, "w") as f:
+            f.write(token or "")
+    except OSError as e:
+        logging.warning(f"[Client] Could not save session token to {session_file}: {e}")
+
+
+class SessionChannel:
+    """
+    Stands in for a MenuChannel for the life of a session rather than one connection.
+    If nobody reattaches within `timeout` seconds the session expires: every menu then
+    answers [] so the menus unwind and the session thread ends.
+    """
+    def __init__(self, token, timeout):
+        self.token = token
+        self.timeout = timeout
+        self.expired = False
+        self._channel = None
+        self._released = None  # Set once the session is done with the current connection
+        self._cond = threading.Condition()
+
+    @property
+    def version(self):
+        return self._channel.version if self._channel else 0
+
+    @property
+    def queries(self):
+        return self._channel.queries if self._channel else False
+
+    def attach(self, channel):
+        """
+        Makes `channel` the session's client, replacing any current one. Returns an Event set
+        once the session no longer needs that connection, or None if the session has expired.
+        """
+        released = threading.Event()
+        with self._cond:
+            if self.expired:
+                return None
+            self._release_locked()  # The newest client of a session wins
+            self._channel, self._released = channel, released
+            self._cond.notify_all()
+        return released
+
+    def detach(self, channel=None):
+        with self._cond:
+            if channel is None or channel is self._channel:
+                self._release_locked()
+
+    def close(self):
+        with self._cond:
+            self.expired = True
+            self._release_locked()
+
+    def _release_locked(self):
+        if self._channel is not None:
+            try:
+                self._channel.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._released is not None:
+            self._released.set()
+        self._channel = self._released = None
+
+    def _wait_for_client(self):
+        with self._cond:
+            if self._channel is None and not self.expired:
+                logging.info(f"[Session] Waiting up to {self.timeout}s for a client to resume")
+                self._cond.wait_for(lambda: self._channel is not None, self.timeout)
+            if self._channel is None:
+                self.expired = True
+            return self._channel
+
+    def exchange(self, entries, prompt, multi_select=False, text_input=True, query=None, indices=False):
+        while True:
+            channel = self._wait_for_client()
+            if channel is None:
+                return []
+            if query and not channel.queries:
+                # Resumed by a client that can't re-query (a query menu only holds the top results)
+                logging.info(f"[Session] Client can't run query menu '{prompt}'; going back")
+                return []
+            try:
+                selection = channel.exchange(entries, prompt, multi_select, text_input, query, indices)
+            except OSError:
+                selection = None
+            if selection is None or channel.closed:
+                # Client went away; show the same menu to whoever resumes the session
+                self.detach(channel)
+                continue
+            return selection
+
+
+class SessionRegistry:
+    """
+    Attaches incoming connections to sessions by the token in their hello, starting a new
+    session (with a manager from `session_factory`) for unknown or expired tokens.
+    With `single=True` there is at most one session and every client resumes it, for
+    servers that own a single MenuManager.
+    """
+    def __init__(self, session_factory, timeout, single=False):
+        self.session_factory = session_factory
+        self.timeout = timeout
+        self.single = single
+        self.sessions = {}
+        self.finished = threading.Event()  # Set whenever the last session ends
+        self._lock = threading.Lock()
+
+    def _find(self, token):
+        with self._lock:
+            if self.single:
+                return next(iter(self.sessions.values()), None)
+            return self.sessions.get(token)
+
+    def serve(self, conn, hello):
+        """Serves one client connection, whose hello was already read. Returns when its session no longer needs it."""
+        session = self._find((hello or {}).get("session"))
+        released = None
+        if session is not None:
+            released = session.attach(MenuChannel.from_hello(conn, hello, session=session.token))
+            if released is not None:
+                logging.info("[Session] Client resumed session")
+        if released is None:
+            session = SessionChannel(secrets.token_urlsafe(16), self.timeout)
+            released = session.attach(MenuChannel.from_hello(conn, hello, session=session.token))
+            with self._lock:
+                self.sessions[session.token] = session
+                self.finished.clear()
+            threading.Thread(target=self._run, args=(session,), daemon=True).start()
+        released.wait()
+
+    def _run(self, session):
+        manager = self.session_factory()
+        manager.socket_conn = session
+        logging.info(f"[Session] Started ({len(self.sessions)} active)")
+        try:
+            manager.navigate_menu(manager.menu_structure_callable)
+        except Exception as e:
+            print(f"[Session] Error: {e}")
+        finally:
+            manager.socket_conn = None
+            session.close()
+            with self._lock:
+                self.sessions.pop(session.token, None)
+                if not self.sessions:
+                    self.finished.set()
+            logging.info(f"[Session] Ended ({len(self.sessions)} active)")
@@ -2,24 +2,45 @@
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+import threading
 from pathlib import Path
 
 class CacheUpdater(FileSystemEventHandler):
-    def __init__(self, cache):
+    def __init__(self, cache, listings=None, lock=None, on_change=None):
         self.cache = cache
+        self.listings = listings  # DirectoryListingCache to keep in step, if any
+        self.lock = lock or threading.Lock()  # The cache owner's lock: indexing threads change the cache too
+        self.on_change = on_change  # Called after every change to the cache
 
     def on_created(self, event):
+        if self.listings is not None:
+            self.listings.invalidate(event.src_path)
         path = Path(event.src_path).resolve()
         if path.is_file() or path.is_dir():
-            self.cache.add(str(path))
+            with self.lock:
+                self.cache.add(str(path))
+            self._changed()
 
     def on_deleted(self, event):
+        if self.listings is not None:
+            self.listings.invalidate(event.src_path)
         path = Path(event.src_path).resolve()
-        self.cache.discard(str(path))
+        with self.lock:
+            self.cache.discard(str(path))
+        self._changed()
 
     def on_moved(self, event):
+        if self.listings is not None:
+            self.listings.invalidate(event.src_path)
+            self.listings.invalidate(event.dest_path)
         old_path = Path(event.src_path).resolve()
         new_path = Path(event.dest_path).resolve()
-        self.cache.discard(str(old_path))
-        self.cache.add(str(new_path))
+        with self.lock:
+            self.cache.discard(str(old_path))
+            self.cache.add(str(new_path))
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
 
@@ -0,0 +1,3 @@
+#!/usr/bin/env bash
+# One rofi window for the whole menu tree, backed by the daemon (daemon.sh)
+rofi -show workspace -modi "workspace:/srv/projects/editor-menu/rofi-script.sh"
@@ -0,0 +1,6 @@
+#!/usr/bin/env bash
+# rofi script mode bridge to the daemon (daemon.sh); rofi runs this once per menu step.
+# Open with rofi-menu.sh.
+source /srv/projects/editor-menu/editor.sh
+
+cd "$root_dir" && python -m menu_manager.rofi_script --socket-path=/tmp/workspace_manager.sock --session-file=/tmp/workspace_manager.session -- "$@"
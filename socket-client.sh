@@ -6,8 +6,17 @@ dirs=("$0" "${projects[@]}")
 source /srv/projects/editor-menu/editor.sh
 # echo "${dirs[@]}"
 
+port=12345
+ready=$(mktemp -u /tmp/workspace_ready.XXXXXX)
+mkfifo "$ready"
+
+# The server writes to the FIFO once it is listening; the client blocks on it instead of polling connect()
+run --cwd=/srv/projects --interface=socket-server --port=$port --ready-fd=3 --workspace-file=workspace.json -- "${dirs[@]}" 3>"$ready" &
+SERVER_PID=$!
+
 # Launch the client in the foreground
-run --cwd=/srv/projects --interface=socket-client --workspace-file=workspace.json -- "${dirs[@]}"
+run --interface=socket-client --port=$port --ready-fd=3 3<"$ready"
+rm -f "$ready"
 
 # After the client exits, clean up the server (optional, but good for testing)
 kill $SERVER_PID
@@ -0,0 +1,90 @@
+# state/autosave.py
+import atexit
+import logging
+import threading
+import time
+
+class DebouncedWriter:
+    """
+    Coalesces save requests: every schedule() pushes the deadline back by `delay` seconds,
+    and `write` runs once on a background thread when requests stop coming in.
+    Pending writes are flushed on flush(), close() and interpreter exit.
+    """
+    def __init__(self, write, delay: float = 0.5):
+        self._write = write
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock() # Serializes background writes with flush()
+        self._deadline = None # monotonic time of the pending write, None if nothing is pending
+        self._thread = None
+        self._closed = False
+
+    def schedule(self):
+        with self._cond:
+            if self._closed:
+                write_now = True
+            else:
+                write_now = False
+                self._deadline = time.monotonic() + self.delay
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+                self._cond.notify()
+        if write_now:
+            self._write_pending()
+
+    def cancel(self):
+        """Drops the pending write (the caller is about to write itself)."""
+        with self._cond:
+            self._deadline = None
+
+    def flush(self):
+        """Performs the pending write now, waiting for one that is already in flight."""
+        with self._cond:
+            pending = self._deadline is not None
+            self._deadline = None
+        with self._write_lock:
+            if pending:
+                self._call_write()
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    @property
+    def pending(self) -> bool:
+        return self._deadline is not None
+
+    def _write_pending(self):
+        with self._write_lock:
+            self._call_write()
+
+    def _call_write(self):
+        try:
+            self._write()
+        except Exception as e:
+            logging.error(f"[ERROR] Background save failed: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._deadline is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return
+                self._deadline = None
+                # Taken before releasing the condition so flush() can't slip in between
+                self._write_lock.acquire()
+            try:
+                self._call_write()
+            finally:
+                self._write_lock.release()
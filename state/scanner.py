@@ -1,7 +1,8 @@
 # state/scanner.py
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Set
+from typing import Dict, Iterable, List, Set
 
 def validate_cache_against_fs(cache: Set[str], dirs: Set[Path], files: Set[Path]) -> bool:
     changed = False
@@ -25,3 +26,40 @@ def validate_cache_against_fs(cache: Set[str], dirs: Set[Path], files: Set[Path]
 
     return changed
 
+def _missing_in_directory(parent: Path, children: List[Path]) -> List[Path]:
+    """
+    One scandir() of `parent` answers existence for most of its listed children. Symlinks
+    (which exist only if their target does, like Path.exists()) and `..` still get a stat.
+    """
+    try:
+        with os.scandir(parent) as it:
+            names, links = set(), set()
+            for entry in it:
+                (links if entry.is_symlink() else names).add(entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return children
+    except OSError:
+        # e.g. parent is not readable; fall back to individual stats
+        return [p for p in children if not p.exists()]
+    return [
+        p for p in children
+        if p.name not in names and (p.name not in links and p.name != ".." or not os.path.exists(p))
+    ]
+
+def find_missing_paths(paths: Iterable[Path], max_workers: int = 8) -> Set[Path]:
+    """Returns the subset of `paths` that no longer exist, checking each parent directory once, in parallel."""
+    by_parent: Dict[Path, List[Path]] = {}
+    missing: Set[Path] = set()
+    for p in paths:
+        if p.parent == p:  # filesystem root
+            if not p.exists():
+                missing.add(p)
+            continue
+        by_parent.setdefault(p.parent, []).append(p)
+
+    if not by_parent:
+        return missing
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(by_parent))) as pool:
+        for result in pool.map(lambda item: _missing_in_directory(*item), by_parent.items()):
+            missing.update(result)
+    return missing
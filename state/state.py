@@ -4,9 +4,39 @@ from state.workspace import Workspace
 from clipboard.clipboard import Clipboard
 from search_config import SearchConfig
 import logging
+import threading
 
 class State:
     def __init__(self, workspace=None, clipboard=None, root_dir=None):
+        self._init_view(clipboard, root_dir)
+        self.workspace = workspace or Workspace("workspace.json")
+        self._dirty_lock = threading.Lock()
+        self.dirty_generation = 0 # Bumped whenever a change is marked, see mark_clean()
+        self.is_dirty: bool = False # True if there are unsaved changes
+        self.auto_save_enabled: bool = False # Controls if changes are auto-saveds
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+    @is_dirty.setter
+    def is_dirty(self, value: bool):
+        with self._dirty_lock:
+            if value:
+                self.dirty_generation += 1
+            self._dirty = value
+
+    def mark_clean(self, generation: int):
+        """
+        Clears is_dirty after a save whose data was taken at `generation` (dirty_generation read
+        before the snapshot), unless a change was marked since; that one still needs saving.
+        """
+        with self._dirty_lock:
+            if self.dirty_generation == generation:
+                self._dirty = False
+
+    def _init_view(self, clipboard=None, root_dir=None):
+        """Filters, root directory, clipboard queue: what one menu session is looking at."""
         self.use_gitignore = True
         self.include_dotfiles = False
         self.expansion_depth = None
@@ -24,10 +54,11 @@ class State:
         self.input_set = []
         self.workspace_files = set()
         self.clipboard = clipboard or Clipboard()
-        self.workspace = workspace or Workspace("workspace.json")
         self.search_config = SearchConfig()
-        self.is_dirty: bool = False # True if there are unsaved changes
-        self.auto_save_enabled: bool = False # Controls if changes are auto-saveds
+
+    def session_view(self) -> "SessionState":
+        """A separate view of this state for one daemon session (see SessionState)."""
+        return SessionState(self)
 
     def push_state(self):
         snapshot = {
@@ -143,3 +174,41 @@ class State:
         
         self.auto_save_enabled = config_dict.get("auto_save_enabled", False) # Default to False
         logging.debug(f"Applied State config from JSON: auto_save_enabled={self.auto_save_enabled}")
+
+
+class SessionState(State):
+    """
+    One daemon session's view of a shared State. Filters, root directory, clipboard queue and
+    the state stack are its own, starting from the shared state's current settings, so one
+    client's toggles and `cd` don't show up in the others. The workspace (with its cache) is
+    shared, and so are the dirty and auto-save flags, which describe the workspace.
+    Only the shared state's settings are saved to the workspace file.
+    """
+    def __init__(self, shared: State):
+        self.shared = shared
+        self._init_view(Clipboard(), shared.root_dir)
+        self.workspace = shared.workspace
+        self.apply_config(shared.get_persistable_config())  # Sets the shared auto-save flag to itself
+
+    @property
+    def is_dirty(self) -> bool:
+        return self.shared.is_dirty
+
+    @is_dirty.setter
+    def is_dirty(self, value: bool):
+        self.shared.is_dirty = value
+
+    @property
+    def dirty_generation(self) -> int:
+        return self.shared.dirty_generation
+
+    def mark_clean(self, generation: int):
+        self.shared.mark_clean(generation)
+
+    @property
+    def auto_save_enabled(self) -> bool:
+        return self.shared.auto_save_enabled
+
+    @auto_save_enabled.setter
+    def auto_save_enabled(self, value: bool):
+        self.shared.auto_save_enabled = value
@@ -1,21 +1,26 @@
 # workspace.py
 import json
 import fcntl
+import os
 from pathlib import Path
-import re
 from typing import List, Set
-import hashlib
 import logging
 
 from watchdog.observers import Observer
 import threading
 
 from menu_manager.watcher import CacheUpdater
+from menu_manager.hash import FileChangeDetector, hash_bytes
+from state.autosave import DebouncedWriter
+from state.scanner import find_missing_paths
 
-from filters.gitignore import is_ignored_by_stack
+from filters.blacklist import PatternMatcher
+from filters.query import QueryIndex
+from filters.gitignore import is_ignored_by_stack, update_gitignore_specs
 from filters.path_utils import resolve_path_and_inode
 from filters.filtering import filter_entries
 from filters.main import expand_directories, get_gitignore_specs
+from filesystem.listing import directory_listings
 
 class Workspace:
     def __init__(self, json_file=None, paths=None, cwd=None):
@@ -28,6 +33,7 @@ class Workspace:
         self._user_paths: Set[Path] = set()       # Paths explicitly added/managed by the user
         self._ignored_paths: Set[Path] = set()    # Paths explicitly removed by the user (blacklist of individual paths)
         self._generator_blacklist_patterns: List[str] = [] # List of regex patterns for generator output
+        self._blacklist_matcher = PatternMatcher() # Compiled form of the patterns above; rebuilt when they change
 
         # Store initial (loaded) state for dirty checking
         self._initial_user_paths: Set[Path] = set()
@@ -35,13 +41,21 @@ class Workspace:
         self._initial_generator_blacklist_patterns: List[str] = []
         self._initial_state_config: dict = {} # To store the state_config *as loaded from JSON*
         self._initial_json_file_exists: bool = self.json_file.exists() and self.json_file.stat().st_size > 0
-        self._last_loaded_hash: str | None = None # Initialize hash tracking
+        self._change_detector = FileChangeDetector(self.json_file) # Detects edits made by other instances
+        self._paths_lock = threading.RLock() # Guards the path sets/patterns against the background writer
+        self._save_lock = threading.Lock()
+        self._autosave = DebouncedWriter(self._write_json) # Auto-saves are coalesced and written off the menu thread
 
 
         self.cache: set[str] = set()  # cached paths (canonical strings)
         self.cache_file = Path('.cache.json')
         self.cache_lock = threading.RLock()
+        self._pruned = None  # Paths the blacklist kept out of the cache (see _index_unpruned); None if unknown
+        self._query_index = None
         self.observer = None
+        self._path_validation = None # Background existence check of stored user paths
+        self._watches = {}  # root Path -> watchdog ObservedWatch
+        self._watch_handler = None
 
         # Phase 1: Load all configuration from JSON. This will populate _initial_* sets/dict.
         self._load_config_from_json()
@@ -62,79 +76,171 @@ class Workspace:
 
         logging.debug(f"Workspace initialized: Generated={len(self._generated_paths)}, User={len(self._user_paths)}, Ignored={len(self._ignored_paths)}, Blacklist Patterns={len(self._generator_blacklist_patterns)}")
 
+    def _read_config_file(self):
+        """
+        Reads and parses the workspace file under a shared lock.
+        Returns (data, digest, stat_result), or None if the file is missing or empty.
+        """
+        if not self.json_file.exists() or self.json_file.stat().st_size == 0:
+            return None
+        with open(self.json_file, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            raw = f.read()
+            file_stat = os.fstat(f.fileno())
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return json.loads(raw), hash_bytes(raw), file_stat
+
+    @staticmethod
+    def _stored_path(p_str: str) -> Path:
+        """Stored paths are saved resolved; only resolve the ones that aren't, to avoid a syscall per path."""
+        p = Path(p_str)
+        if not p.is_absolute() or '..' in p.parts:
+            return p.resolve()
+        return p
+
+    def _parse_config(self, data: dict):
+        """
+        Converts raw JSON data into (user_paths, ignored_paths, patterns).
+        Paths are accepted as stored (they are saved resolved); user paths' existence is checked
+        by _validate_user_paths_async.
+        """
+        user_paths: Set[Path] = set(self._stored_path(p) for p in data.get("user_paths", []))
+
+        ignored_paths: Set[Path] = set(self._stored_path(p) for p in data.get("ignored_paths", []))
+        patterns: List[str] = data.get("generator_blacklist_patterns", [])
+        return user_paths, ignored_paths, patterns
+
     def _load_config_from_json(self):
         """Helper to load all configuration aspects (user_paths, ignored_paths, blacklist, and state_config) from JSON."""
-        # Calculate hash first for comparison *before* trying to load
-        current_file_hash_on_disk = self._calculate_file_hash(self.json_file)
+        try:
+            loaded = self._read_config_file()
+        except (json.JSONDecodeError, FileNotFoundError, Exception) as e:
+            logging.warning(f" Could not load workspace.json: {e}. Starting with fresh configuration.")
+            # Ensure _initial_* capture defaults if load failed
+            self._initial_user_paths = set()
+            self._initial_ignored_paths = set()
+            self._initial_generator_blacklist_patterns = []
+            self._initial_state_config = self._get_default_state_config()
+            self._change_detector.mark_synced() # Don't retry the same broken file on every list()
+            return
 
-        if not self.json_file.exists() or self.json_file.stat().st_size == 0:
+        if loaded is None:
             logging.debug(f"Workspace JSON file '{self.json_file}' not found or is empty.")
             # Set initial config to defaults if file is empty/non-existent
             self._initial_user_paths = set()
             self._initial_ignored_paths = set()
             self._initial_generator_blacklist_patterns = []
             self._initial_state_config = self._get_default_state_config()
-            self._last_loaded_hash = None # No file, no hash
-            
-            # Clear current runtime sets as well, in case of a reload to empty
-            self._user_paths.clear()
-            self._ignored_paths.clear()
-            self._generator_blacklist_patterns.clear()
-            self._generated_paths.clear() # Generated paths are *not* loaded from JSON, clear on full reload
+            self._change_detector.mark_synced() # Remember the file as missing/empty
             return
-        
-        try:
-            with open(self.json_file, "r") as f:
-                fcntl.flock(f, fcntl.LOCK_SH)
-                data = json.load(f)
-                fcntl.flock(f, fcntl.LOCK_UN)
-            
-            # Clear current workspace sets *before* populating to ensure a fresh state on reload
-            self._user_paths.clear()
-            self._ignored_paths.clear()
-            self._generator_blacklist_patterns.clear()
-            self._generated_paths.clear() # Always clear generated paths, they are only for current session CLI input
 
-            # Load Workspace-specific config
-            loaded_user_paths: Set[Path] = set()
-            for p_str in data.get("user_paths", []):
-                p_resolved = Path(p_str).resolve()
-                if p_resolved.exists():
-                    loaded_user_paths.add(p_resolved)
-                else:
-                    logging.warning(f" User path '{p_resolved}' from {self.json_file} does not exist on load, skipping.")
+        data, digest, file_stat = loaded
+        loaded_user_paths, loaded_ignored_paths, loaded_patterns = self._parse_config(data)
 
-            loaded_ignored_paths: Set[Path] = set(Path(p).resolve() for p in data.get("ignored_paths", []))
-            loaded_patterns: List[str] = data.get("generator_blacklist_patterns", [])
+        # Populate current workspace sets with loaded data
+        self._user_paths.update(loaded_user_paths)
+        self._ignored_paths.update(loaded_ignored_paths)
+        self._generator_blacklist_patterns.extend(loaded_patterns)
+        self._rebuild_blacklist_matcher()
 
-            # Populate current workspace sets with loaded data
-            self._user_paths.update(loaded_user_paths)
-            self._ignored_paths.update(loaded_ignored_paths)
-            self._generator_blacklist_patterns.extend(loaded_patterns)
+        # Populate initial (loaded) state for dirty checking (these are copies of what was just loaded)
+        self._initial_user_paths = loaded_user_paths.copy()
+        self._initial_ignored_paths = loaded_ignored_paths.copy()
+        self._initial_generator_blacklist_patterns = loaded_patterns.copy()
 
-            # Populate initial (loaded) state for dirty checking (these are copies of what was just loaded)
-            self._initial_user_paths = loaded_user_paths.copy()
-            self._initial_ignored_paths = loaded_ignored_paths.copy()
-            self._initial_generator_blacklist_patterns = loaded_patterns.copy()
+        # Load State-specific config
+        loaded_state_config: dict = data.get("state_config", {})
+        self._initial_state_config = self._merge_with_default_state_config(loaded_state_config)
 
-            # Load State-specific config
-            loaded_state_config: dict = data.get("state_config", {})
-            self._initial_state_config = self._merge_with_default_state_config(loaded_state_config)
-            
-            # Update the last loaded hash after successful load
-            self._last_loaded_hash = current_file_hash_on_disk
+        # Remember exactly what was loaded so only later edits count as external changes
+        self._change_detector.mark_synced(digest, file_stat)
+
+        self._validate_user_paths_async(loaded_user_paths)
 
-            logging.debug(f"Loaded {len(self._user_paths)} user paths, {len(self._ignored_paths)} ignored paths, {len(self._generator_blacklist_patterns)} blacklist patterns, and State config from '{self.json_file}'.")
+        logging.debug(f"Loaded {len(self._user_paths)} user paths, {len(self._ignored_paths)} ignored paths, {len(self._generator_blacklist_patterns)} blacklist patterns, and State config from '{self.json_file}'.")
 
+    def _reload_config_from_json(self):
+        """
+        Applies an external edit of the workspace file (e.g. a save from another launcher).
+        The new contents are diffed against the current sets and only the differences are applied,
+        so the cache and file watches are touched for the roots that actually changed.
+        Generated paths belong to this session and are kept.
+        """
+        try:
+            loaded = self._read_config_file()
         except (json.JSONDecodeError, FileNotFoundError, Exception) as e:
-            logging.warning(f" Could not load workspace.json: {e}. Starting with fresh configuration.")
-            # Ensure _initial_* capture defaults if load failed
-            self._initial_user_paths = set()
-            self._initial_ignored_paths = set()
-            self._initial_generator_blacklist_patterns = []
-            self._initial_state_config = self._get_default_state_config()
-            self._last_loaded_hash = None # Clear hash if load failed (as file content is unreliable)
-            
+            logging.warning(f" Could not reload workspace.json: {e}. Keeping current configuration.")
+            self._change_detector.mark_synced()
+            return
+
+        if loaded is None:
+            data, digest, file_stat = {}, None, None
+        else:
+            data, digest, file_stat = loaded
+        new_user_paths, new_ignored_paths, new_patterns = self._parse_config(data)
+
+        roots_before = self._active_paths()
+
+        with self._paths_lock:
+            added_user = new_user_paths - self._user_paths
+            removed_user = self._user_paths - new_user_paths
+            self._user_paths.difference_update(removed_user)
+            self._user_paths.update(added_user)
+
+            self._ignored_paths.difference_update(self._ignored_paths - new_ignored_paths)
+            self._ignored_paths.update(new_ignored_paths)
+
+            removed_patterns = set(self._generator_blacklist_patterns) - set(new_patterns)
+            added_patterns = set(new_patterns) - set(self._generator_blacklist_patterns)
+            if new_patterns != self._generator_blacklist_patterns:
+                self._generator_blacklist_patterns[:] = new_patterns
+                self._rebuild_blacklist_matcher()
+
+        self._initial_user_paths = new_user_paths.copy()
+        self._initial_ignored_paths = new_ignored_paths.copy()
+        self._initial_generator_blacklist_patterns = list(new_patterns)
+        self._initial_state_config = self._merge_with_default_state_config(data.get("state_config", {}))
+
+        if loaded is None:
+            self._change_detector.mark_synced()
+        else:
+            self._change_detector.mark_synced(digest, file_stat)
+
+        if added_user:
+            self._validate_user_paths_async(added_user)
+
+        roots_after = self._active_paths()
+        added_roots = roots_after - roots_before
+        removed_roots = roots_before - roots_after
+        logging.info(f"Applied external workspace changes: +{len(added_roots)} / -{len(removed_roots)} roots.")
+        if added_roots or removed_roots:
+            self._apply_root_changes(added_roots, removed_roots)
+        if added_patterns or removed_patterns:
+            self._apply_blacklist_changes(bool(added_patterns), bool(removed_patterns))
+
+    def _validate_user_paths_async(self, paths: Set[Path]):
+        """Checks that stored user paths still exist without holding up startup; vanished ones are dropped when done."""
+        if not paths:
+            return
+        paths = set(paths)
+        self._path_validation = threading.Thread(target=self._validate_user_paths, args=(paths,), daemon=True)
+        self._path_validation.start()
+
+    def _validate_user_paths(self, paths: Set[Path]):
+        missing = find_missing_paths(paths)
+        if not missing:
+            return
+        for p in sorted(missing):
+            logging.warning(f" User path '{p}' from {self.json_file} does not exist on load, skipping.")
+
+        with self._paths_lock:
+            vanished_roots = missing & self._active_paths()
+            self._user_paths.difference_update(missing)
+            # Treat them as never loaded, so dropping them doesn't make the workspace dirty
+            self._initial_user_paths.difference_update(missing)
+        if vanished_roots:
+            self._apply_root_changes(set(), vanished_roots)
+
     def _get_default_state_config(self) -> dict:
         """Returns a dictionary representing the default values for the persistable State attributes."""
         return {
@@ -165,59 +271,68 @@ class Workspace:
                 merged_config[key] = value
         return merged_config
 
+    def _rebuild_blacklist_matcher(self):
+        self._blacklist_matcher = PatternMatcher(self._generator_blacklist_patterns)
+
     def _is_blacklisted_by_generator_pattern(self, path: Path) -> bool:
         """Checks if a path matches any of the generator blacklist regex patterns."""
-        path_str = str(path)
-        for pattern in self._generator_blacklist_patterns:
-            try:
-                if re.search(pattern, path_str):
-                    return True
-            except re.error as e:
-                print(f"[ERROR] Invalid regex pattern in blacklist: '{pattern}' - {e}")
-        return False
+        return self._blacklist_matcher.search(str(path))
 
     def save(self, json_file_path: Path = None):
         """Saves the current workspace state (paths, blacklist, and state config) to the JSON file."""
+        self._autosave.cancel() # This write supersedes any pending auto-save
+        self._write_json(json_file_path)
+
+    def flush_autosave(self):
+        """Writes a pending auto-save immediately (e.g. before exiting)."""
+        self._autosave.flush()
+
+    def _write_json(self, json_file_path: Path = None):
+        with self._save_lock:
+            self._write_json_locked(json_file_path)
+
+    def _write_json_locked(self, json_file_path: Path = None):
         if json_file_path:
             self.json_file = json_file_path.resolve()
+            self._change_detector.retarget(self.json_file)
             logging.info(f"Workspace file path updated to: {self.json_file}")
 
         tmp_path = self.json_file.with_suffix(".tmp")
+        state = self.state if hasattr(self, 'state') else None
+        # Read before the snapshot: a change marked while we write keeps the state dirty
+        generation = state.dirty_generation if state is not None else None
         try:
-            with open(tmp_path, "w") as f:
+            with open(tmp_path, "wb") as f:
                 fcntl.flock(f, fcntl.LOCK_EX) # Exclusive lock for writing
                 
-                # Consolidate all non-ignored paths first
-                current_potential_active_paths = (self._user_paths | self._generated_paths) - self._ignored_paths
-                
-                # Further filter by generator blacklist patterns
-                final_paths_to_save = set()
-                for p in current_potential_active_paths:
-                    if not self._is_blacklisted_by_generator_pattern(p):
-                        final_paths_to_save.add(p)
-
-                data_to_save = {
-                    "user_paths": [str(p) for p in sorted(list(final_paths_to_save))], # CHANGED: Now reflects all filters
-                    "ignored_paths": [str(p) for p in sorted(list(self._ignored_paths))],
-                    "generator_blacklist_patterns": self._generator_blacklist_patterns
-                }
+                with self._paths_lock:
+                    # Consolidate all non-ignored paths, filtered by generator blacklist patterns
+                    final_paths_to_save = self._active_paths()
+
+                    data_to_save = {
+                        "user_paths": [str(p) for p in sorted(list(final_paths_to_save))], # CHANGED: Now reflects all filters
+                        "ignored_paths": [str(p) for p in sorted(list(self._ignored_paths))],
+                        "generator_blacklist_patterns": list(self._generator_blacklist_patterns)
+                    }
                 
                 if hasattr(self, 'state') and self.state is not None:
                     data_to_save["state_config"] = self.state.get_persistable_config()
 
-                json.dump(data_to_save, f, indent=2)
+                payload = json.dumps(data_to_save, indent=2).encode()
+                f.write(payload)
                 f.flush() # Ensure data is written to disk before unlocking/renaming
+                file_stat = os.fstat(f.fileno())
                 fcntl.flock(f, fcntl.LOCK_UN)
             
-            tmp_path.rename(self.json_file) # Atomic rename
+            tmp_path.rename(self.json_file) # Atomic rename (keeps inode and mtime of the tmp file)
             logging.info(f"Workspace saved to: {self.json_file}. User paths: {len(self._user_paths)}, Ignored paths: {len(self._ignored_paths)}, Blacklist patterns: {len(self._generator_blacklist_patterns)}")
             
-            # Update the last loaded hash after successful save
-            self._last_loaded_hash = self._calculate_file_hash(self.json_file)
+            # Our own write must not be picked up as an external change
+            self._change_detector.mark_synced(hash_bytes(payload), file_stat)
 
-            # Clear dirty flag after successful save
-            if hasattr(self, 'state') and self.state is not None:
-                self.state.is_dirty = False
+            # Clear dirty flag after successful save, unless something changed meanwhile
+            if state is not None:
+                state.mark_clean(generation)
 
         except Exception as e:
             print(f"[ERROR] Failed to save workspace to {self.json_file}: {e}")
@@ -228,33 +343,43 @@ class Workspace:
         """Helper to mark the state as dirty and trigger auto-save if enabled."""
         if hasattr(self, 'state') and self.state is not None:
             self.state.is_dirty = True
-            self.state.autoSave(self.save) # This will call workspace.save() and clear dirty flag
+            self.state.autoSave(self._autosave.schedule) # Written (and dirty flag cleared) by the background writer
         else:
             logging.warning("[WARNING] Workspace's state object is not set. Cannot mark dirty or auto-save via state.")
 
     def add_generator_blacklist_pattern(self, pattern: str):
         if pattern not in self._generator_blacklist_patterns:
-            self._generator_blacklist_patterns.append(pattern)
+            with self._paths_lock:
+                self._generator_blacklist_patterns.append(pattern)
+                self._rebuild_blacklist_matcher()
+            self._apply_blacklist_changes(patterns_added=True, patterns_removed=False)
             self._mark_dirty_and_auto_save()
             logging.debug(f"Added generator blacklist pattern: '{pattern}'.")
 
     def remove_generator_blacklist_pattern(self, pattern: str):
         if pattern in self._generator_blacklist_patterns:
-            self._generator_blacklist_patterns.remove(pattern)
+            with self._paths_lock:
+                self._generator_blacklist_patterns.remove(pattern)
+                self._rebuild_blacklist_matcher()
+            self._apply_blacklist_changes(patterns_added=False, patterns_removed=True)
             self._mark_dirty_and_auto_save()
             logging.debug(f"Removed generator blacklist pattern: '{pattern}'.")
 
     def get_generator_blacklist_patterns(self) -> List[str]: # Type hint corrected
         return self._generator_blacklist_patterns.copy()
 
+    def get_generator_blacklist_matcher(self) -> PatternMatcher:
+        """The compiled blacklist, for pruning blacklisted subtrees during traversal."""
+        return self._blacklist_matcher
+
     def add(self, entries: List[str], root_dir: Path = None): # Type hints corrected
         root = Path(root_dir) if root_dir else self.cwd
         added_count = 0
         for entry in entries:
             full_path = (root / entry).resolve()
             if full_path.exists() and full_path not in self._user_paths:
-                self._user_paths.add(full_path)
-                if full_path in self._ignored_paths:
+                with self._paths_lock:
+                    self._user_paths.add(full_path)
                     self._ignored_paths.discard(full_path)
                 added_count += 1
         if added_count > 0:
@@ -266,69 +391,66 @@ class Workspace:
         removed_count = 0
         for entry in entries:
             full_path = (root / entry).resolve()
-            if full_path in self._user_paths:
-                self._user_paths.discard(full_path)
-                self._ignored_paths.add(full_path)
-                removed_count += 1
-            elif full_path in self._generated_paths:
-                 self._generated_paths.discard(full_path)
-                 self._ignored_paths.add(full_path)
-                 removed_count += 1
+            with self._paths_lock:
+                if full_path in self._user_paths:
+                    self._user_paths.discard(full_path)
+                    self._ignored_paths.add(full_path)
+                    removed_count += 1
+                elif full_path in self._generated_paths:
+                    self._generated_paths.discard(full_path)
+                    self._ignored_paths.add(full_path)
+                    removed_count += 1
         if removed_count > 0:
             self._mark_dirty_and_auto_save()
             logging.info(f"Removed {removed_count} paths from workspace (added to ignored list).")
 
-    def _calculate_file_hash(self, file_path: Path) -> str | None:
-        """Calculates the SHA256 hash of the given file's content."""
-        if not file_path.exists():
-            return None
-        
-        hasher = hashlib.sha256()
-        try:
-            with open(file_path, 'rb') as f:
-                # Read in chunks to handle potentially large files efficiently
-                for chunk in iter(lambda: f.read(4096), b''):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
-        except Exception as e:
-            print(f"[ERROR] Failed to calculate hash for {file_path}: {e}")
-            return None
-
     def _check_for_external_changes_and_reload(self):
         """
         Checks if the workspace file on disk has changed externally.
         If it has, reloads the configuration from the file.
+        This runs on every list(), so the common path is a single stat() call.
         """
-        if not self.json_file.exists():
-            # If file disappeared, treat as changed or fresh start
-            if self._last_loaded_hash is not None:
-                logging.info(f"Workspace file '{self.json_file}' no longer exists; reloading to empty state.")
-                self._load_config_from_json() # Will effectively clear internal state
-            return
-
-        current_file_hash = self._calculate_file_hash(self.json_file)
-
-        if current_file_hash is None: # Error calculating hash, assume no change or handle as error
+        if not self._change_detector.has_changed():
             return
 
-        if self._last_loaded_hash != current_file_hash:
-            logging.info(f"Workspace file '{self.json_file}' has changed externally. Reloading configuration.")
-            self._load_config_from_json() # This method also updates self._last_loaded_hash
+        with self._paths_lock: # Daemon sessions may call list() concurrently; reload only once
+            if not self._change_detector.has_changed():
+                return
+            if not self.json_file.exists():
+                logging.info(f"Workspace file '{self.json_file}' no longer exists; reloading to empty state.")
+            else:
+                logging.info(f"Workspace file '{self.json_file}' has changed externally. Reloading configuration.")
+            self._reload_config_from_json() # This method also re-syncs the change detector
 
-    def list(self) -> List[Path]:
-        self._check_for_external_changes_and_reload() # Ensure current state before reading
-        """Returns a sorted list of all active paths in the workspace, applying all filters."""
+    def _active_paths(self) -> Set[Path]:
+        """All user and generated paths that are neither ignored nor blacklisted."""
         # Start with all user and generated paths, remove individually ignored ones
         all_potential_paths = (self._user_paths | self._generated_paths) - self._ignored_paths
-        
+
         # Now, filter out paths that match any generator blacklist pattern
         active_paths = set()
         for p in all_potential_paths:
             if not self._is_blacklisted_by_generator_pattern(p):
                 active_paths.add(p)
-        return list(active_paths)
+        return active_paths
+
+    def list(self) -> List[Path]:
+        """Returns a sorted list of all active paths in the workspace, applying all filters."""
+        self._check_for_external_changes_and_reload() # Ensure current state before reading
+        return list(self._active_paths())
 
     
+    def get_query_index(self) -> QueryIndex:
+        """Top-K search over the file cache, for server-side queries."""
+        if self._query_index is None:
+            self._query_index = QueryIndex(lambda: self.cache, self.cache_lock)
+        return self._query_index
+
+    def _cache_changed(self):
+        """Call after every change to self.cache, so the query index re-reads it."""
+        if self._query_index is not None:
+            self._query_index.invalidate()
+
     def list_workspace_files(self) -> Set[Path]:
         return {p for p in self.list() if p.is_file()}
 
@@ -339,10 +461,12 @@ class Workspace:
         return self.list_directories().union(self.list_workspace_files())
 
     def reset(self):
-        self._user_paths.clear()
-        self._generated_paths.clear()
-        self._ignored_paths.clear()
-        self._generator_blacklist_patterns.clear()
+        with self._paths_lock:
+            self._user_paths.clear()
+            self._generated_paths.clear()
+            self._ignored_paths.clear()
+            self._generator_blacklist_patterns.clear()
+            self._rebuild_blacklist_matcher()
         self._mark_dirty_and_auto_save()
         logging.info("[INFO] Workspace reset (all paths and blacklist patterns cleared).")
 
@@ -374,30 +498,42 @@ class Workspace:
     def initialize_cache(self):
         self._determine_initial_dirty_state()
         self.cache = self._load_or_build_cache()
-        self.start_file_watcher()
+        self._cache_changed()
+        self.observer = self.start_file_watcher()
         self._validate_cache
 
     def _load_or_build_cache(self):
         if self.cache_file.exists():
             try:
                 text = self.cache_file.read_text()
-                return set(json.loads(text))
+                data = json.loads(text)
             except:
                 return set()
+            if isinstance(data, list):
+                return set(data)  # Written before pruned subtrees were recorded
+            pruned = data.get("pruned")
+            self._pruned = None if pruned is None else set(Path(p) for p in pruned)
+            return set(data.get("entries", []))
         else:
             cache = self.build_cache()
             cache_set = set(str(p) for p in cache)
             self._save_cache(cache_set)
             return cache_set
 
-    def _save_cache(self):
-        text = json.dumps(self.cache)
+    def _save_cache(self, cache=None):
+        cache = self.cache if cache is None else cache
+        with self.cache_lock:
+            data = {"entries": sorted(cache)}
+            if self._pruned is not None:
+                data["pruned"] = sorted(str(p) for p in self._pruned)
+            text = json.dumps(data)
         self.cache_file.write_text(text)
 
     def _validate_cache(self):
         from state.scanner import validate_cache_against_fs
         updated = validate_cache_against_fs(self.cache, self.list_directories(), self.list_directories())
         if updated:
+            self._cache_changed()
             self._save_cache()
 
 
@@ -471,6 +607,29 @@ class Workspace:
         else:
             logging.error("[ERROR] Workspace's state object is not set. Cannot auto-save.")
 
+    def _expand_root(self, root: Path, gitignore_specs: list, processed_root_inodes: set, pruned: list = None) -> List[Path]:
+        """
+        Expands a single workspace root into its cache shard (empty if duplicate or ignored).
+        Paths the blacklist cut off are appended to `pruned`.
+        """
+        canonical_path, inode_key = resolve_path_and_inode(root)
+        if not canonical_path or not inode_key or inode_key in processed_root_inodes:
+            return []
+        processed_root_inodes.add(inode_key)
+
+        if self.state.use_gitignore and is_ignored_by_stack(root, gitignore_specs):
+            return []
+
+        return expand_directories(
+            [root],
+            self.state,
+            current_depth=0,
+            active_gitignore_specs=gitignore_specs,
+            visited_inodes_for_current_traversal=set(),
+            blacklist=self._blacklist_matcher,
+            pruned=pruned
+        )
+
     def build_cache(self):
         state = self.state
         logging.debug("build_greedy_cache: Starting full workspace scan and caching.")
@@ -480,32 +639,68 @@ class Workspace:
         global_gitignore_specs = get_gitignore_specs(project_root_for_gitignore, state.use_gitignore)
 
         cache = []
+        pruned = []
 
         for root in workspace_roots:
-            canonical_path, inode_key = resolve_path_and_inode(root)
-            if not canonical_path or not inode_key or inode_key in processed_root_inodes:
-                continue
-            processed_root_inodes.add(inode_key)
-
-            if state.use_gitignore and is_ignored_by_stack(root, global_gitignore_specs):
-                continue
-
-            visited_inodes = set()
-            root_entries = [root]
-
-            expanded = expand_directories(
-                root_entries,
-                state,
-                current_depth=0,
-                active_gitignore_specs=global_gitignore_specs,
-                visited_inodes_for_current_traversal=visited_inodes
-            )
-            cache.extend(expanded)
-
-        cache.extend(self.list_files)
+            cache.extend(self._expand_root(root, global_gitignore_specs, processed_root_inodes, pruned))
+        self._pruned = set(pruned)
+
+        cache.extend(self.list_workspace_files())
         logging.debug(f"build_greedy_cache: Cached {len(cache)} entries total.")
         return sorted(cache)
 
+    def _index_roots(self, roots):
+        """Adds the cache shards of newly added roots without rescanning the rest of the workspace."""
+        gitignore_specs = get_gitignore_specs(Path.cwd(), self.state.use_gitignore)
+        processed_root_inodes = set()
+        entries, pruned = [], []
+        for root in roots:
+            entries.extend(self._expand_root(root, gitignore_specs, processed_root_inodes, pruned))
+        with self.cache_lock:
+            self.cache.update(str(p) for p in entries)
+            if self._pruned is not None:
+                self._pruned.update(pruned)
+        self._cache_changed()
+        self._save_cache()
+        logging.debug(f"_index_roots: Indexed {len(entries)} entries for {len(roots)} new roots.")
+
+    def _drop_cache_shard(self, root: Path, remaining_roots: Set[Path]):
+        """Removes cached entries under `root` that aren't also covered by a remaining root."""
+        if any(root.is_relative_to(r) for r in remaining_roots):
+            return  # Still covered by an ancestor root
+        prefix = str(root)
+        nested = tuple(str(r) + os.sep for r in remaining_roots if r.is_relative_to(root))
+        with self.cache_lock:
+            stale = [
+                e for e in self.cache
+                if (e == prefix or e.startswith(prefix + os.sep)) and not e.startswith(nested)
+            ]
+            self.cache.difference_update(stale)
+            if self._pruned:
+                self._pruned = {
+                    p for p in self._pruned
+                    if not (str(p).startswith(prefix + os.sep) and not str(p).startswith(nested))
+                }
+        self._cache_changed()
+        logging.debug(f"_drop_cache_shard: Dropped {len(stale)} cached entries under '{root}'.")
+
+    def _apply_root_changes(self, added_roots: Set[Path], removed_roots: Set[Path]):
+        """Updates only the cache shards and watches affected by a change of workspace roots."""
+        if self.observer is None:
+            return  # initialize_cache hasn't run yet and will pick up the current roots
+
+        remaining_roots = self._active_paths()
+        for root in removed_roots:
+            self._unwatch_root(root)
+            self._drop_cache_shard(root, remaining_roots)
+        for root in added_roots:
+            self._watch_root(root)
+
+        if added_roots:
+            threading.Thread(target=self._index_roots, args=(added_roots,), daemon=True).start()
+        else:
+            self._save_cache()
+
     def query_from_cache(self):
         cache = self.cache
         logging.debug(f"query_from_cache: Filtering {len(cache)} cached entries.")
@@ -519,20 +714,105 @@ class Workspace:
             exit(1)
         return self.state
     
+    def _apply_blacklist_changes(self, patterns_added: bool, patterns_removed: bool):
+        """
+        Keeps roots, watches and cached entries consistent with a new blacklist.
+        New patterns drop matching cache entries. Removed patterns un-prune subtrees, which
+        are expanded in the background (see _index_unpruned).
+        """
+        if self.observer is None:
+            return
+        self.update_file_watcher()
+        if patterns_added and self._blacklist_matcher:
+            with self.cache_lock:
+                blacklisted = {e for e in self.cache if self._blacklist_matcher.search(e)}
+                self.cache.difference_update(blacklisted)
+                if self._pruned is not None:
+                    # Only the top of each dropped subtree, as expand_directories records them
+                    self._pruned.update(Path(e) for e in blacklisted if os.path.dirname(e) not in blacklisted)
+            self._cache_changed()
+        if patterns_removed:
+            threading.Thread(target=self._index_unpruned, daemon=True).start()
+        else:
+            self._save_cache()
+
+    def _index_unpruned(self):
+        """
+        Expands the pruned subtrees that the blacklist no longer matches, and nothing else.
+        Without a record of what was pruned (a cache file from an older version) every root
+        has to be re-indexed.
+        """
+        roots = self._active_paths()
+        with self.cache_lock:
+            if self._pruned is None:
+                candidates = None
+                self._pruned = set()  # Recorded from here on
+            else:
+                candidates = [p for p in self._pruned if not self._blacklist_matcher.search(str(p))]
+                self._pruned.difference_update(candidates)
+        if candidates is None:
+            logging.info("Blacklist patterns were removed and pruned paths are unknown; re-indexing all roots.")
+            self._index_roots(roots)
+            return
+
+        gitignore_specs = get_gitignore_specs(Path.cwd(), self.state.use_gitignore)
+        entries, pruned = [], []
+        for path in candidates:
+            # Expanded as if reached from the nearest root: same depth, same .gitignore stack
+            root = max((r for r in roots if path.is_relative_to(r)), key=lambda r: len(r.parts), default=None)
+            if root is None or root == path:
+                continue  # No longer in the workspace; a root that was blacklisted is re-added by update_file_watcher
+            specs = gitignore_specs
+            for ancestor in reversed(path.parents):
+                if ancestor.is_relative_to(root):
+                    specs = update_gitignore_specs(ancestor, specs)
+            entries.extend(expand_directories(
+                [path],
+                self.state,
+                current_depth=len(path.relative_to(root).parts),
+                active_gitignore_specs=specs,
+                visited_inodes_for_current_traversal=set(),
+                blacklist=self._blacklist_matcher,
+                pruned=pruned
+            ))
+        with self.cache_lock:
+            self.cache.update(str(p) for p in entries)
+            self._pruned.update(pruned)
+        self._cache_changed()
+        self._save_cache()
+        logging.debug(f"_index_unpruned: Indexed {len(entries)} entries under {len(candidates)} un-pruned paths.")
+
     def update_file_watcher(self):
-        self.watcher.stop()
-        self.watcher.join()  # ensure thread terminates
-        self.watcher = self.start_file_watcher()
-    
+        """Brings the file watches (and cache shards) in line with the current workspace roots."""
+        if self.observer is None:
+            return
+        current_roots = set(self.list())
+        watched_roots = set(self._watches)
+        self._apply_root_changes(current_roots - watched_roots, watched_roots - current_roots)
+
+    def _watch_root(self, root_path: Path):
+        try:
+            self._watches[root_path] = self.observer.schedule(self._watch_handler, str(root_path), recursive=True)
+            directory_listings.watch(root_path)
+        except OSError as e:
+            logging.warning(f"Could not watch '{root_path}': {e}")
+
+    def _unwatch_root(self, root_path: Path):
+        watch = self._watches.pop(root_path, None)
+        directory_listings.unwatch(root_path)
+        if watch is not None:
+            try:
+                self.observer.unschedule(watch)
+            except KeyError:
+                pass
+
     def start_file_watcher(self):
-        event_handler = CacheUpdater(self.cache)
+        self._watch_handler = CacheUpdater(self.cache, directory_listings, self.cache_lock, self._cache_changed)
         observer = Observer()
+        self.observer = observer
         root_paths = list(self.state.workspace.list())
         for root_path in root_paths:
-            observer.schedule(event_handler, str(root_path), recursive=True)
+            self._watch_root(root_path)
         observer_thread = threading.Thread(target=observer.start, daemon=True)
         observer_thread.start()
         return observer
-    
-
-
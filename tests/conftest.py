@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# The modules import each other from the repository root (`from menu_manager.payload import ...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+# tests/test_autosave.py
+import threading
+import time
+
+import pytest
+
+from state.autosave import DebouncedWriter
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = 0
+        self.written = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.written.set()
+
+
+def test_requests_are_coalesced():
+    write = Recorder()
+    writer = DebouncedWriter(write, delay=0.05)
+    for _ in range(5):
+        writer.schedule()
+    assert writer.pending and write.calls == 0
+    assert write.written.wait(2)
+    time.sleep(0.1)
+    assert write.calls == 1 and not writer.pending
+    writer.close()
+
+
+def test_flush_writes_now():
+    write = Recorder()
+    writer = DebouncedWriter(write, delay=60)
+    writer.flush()
+    assert write.calls == 0  # Nothing pending
+    writer.schedule()
+    writer.flush()
+    assert write.calls == 1 and not writer.pending
+    writer.close()
+    assert write.calls == 1
+
+
+def test_cancel_drops_the_pending_write():
+    write = Recorder()
+    writer = DebouncedWriter(write, delay=0.05)
+    writer.schedule()
+    writer.cancel()
+    time.sleep(0.15)
+    assert write.calls == 0
+    writer.close()
+
+
+def test_close_flushes_and_later_requests_write_at_once():
+    write = Recorder()
+    writer = DebouncedWriter(write, delay=60)
+    writer.schedule()
+    writer.close()
+    assert write.calls == 1
+    writer.schedule()
+    assert write.calls == 2
+
+
+def test_write_errors_are_logged(caplog):
+    def fail():
+        raise OSError("disk full")
+    writer = DebouncedWriter(fail, delay=60)
+    writer.schedule()
+    writer.flush()
+    assert "disk full" in caplog.text
+    writer.close()
+
+
+def test_mark_clean_keeps_changes_made_during_a_save():
+    pytest.importorskip("pyperclip")
+    pytest.importorskip("watchdog")
+    from state.state import State
+    state = State(workspace=object())
+    state.is_dirty = True
+    generation = state.dirty_generation  # Read before the snapshot, as _write_json does
+    state.is_dirty = True  # A change lands while the file is being written
+    state.mark_clean(generation)
+    assert state.is_dirty
+    state.mark_clean(state.dirty_generation)
+    assert not state.is_dirty
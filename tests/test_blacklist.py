@@ -0,0 +1,58 @@
+# tests/test_blacklist.py
+import re
+
+import pytest
+
+from filters import blacklist
+from filters.blacklist import PatternMatcher, required_literal
+
+
+@pytest.mark.parametrize("pattern, literal", [
+    (r"node_modules", "node_modules"),
+    (r"/build/.*\.o$", "/build/"),
+    (r"^/tmp/ab+c", "/tmp/a"),
+    (r"foo|bar", None),
+    (r"(?i)foo", None),
+    (r".*", None),
+    (r"[", None),
+])
+def test_required_literal(pattern, literal):
+    assert required_literal(pattern) == literal
+
+
+def test_required_literal_survives_a_changed_parser(monkeypatch):
+    class Broken:
+        @staticmethod
+        def parse(pattern):
+            return [("not", "what we expect")]
+    monkeypatch.setattr(blacklist, "sre_parse", Broken)
+    assert required_literal("node_modules") is None
+    monkeypatch.setattr(blacklist, "sre_parse", None)
+    assert required_literal("node_modules") is None
+
+
+PATTERNS = [r"node_modules", r"/build/.*\.o$", r"\.pyc$", r"foo|bar", r"(a)\1", r"(?i)README"]
+TEXTS = [
+    "/src/node_modules/x.js", "/src/build/main.o", "/src/build/main.c", "/src/x.pyc", "/src/x.py",
+    "/foo", "/src/aa", "/src/ab", "/docs/readme.md", "/docs/other.md", "",
+]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_pattern_matcher_agrees_with_re_search(text):
+    expected = any(re.search(p, text) for p in PATTERNS)
+    assert PatternMatcher(PATTERNS).search(text) == expected
+
+
+def test_invalid_patterns_are_skipped(capsys):
+    matcher = PatternMatcher(["(", r"\.log$"])
+    assert matcher.search("/var/x.log")
+    assert not matcher.search("/var/x.txt")
+    assert "Invalid regex" in capsys.readouterr().out
+
+
+def test_empty_matcher():
+    matcher = PatternMatcher()
+    assert not matcher
+    assert not matcher.search("/anything")
+    assert PatternMatcher(["x"])
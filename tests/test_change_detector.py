@@ -0,0 +1,76 @@
+# tests/test_change_detector.py
+import os
+
+from menu_manager import hash as hash_module
+from menu_manager.hash import FileChangeDetector, hash_bytes
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_unchanged_file_is_a_stat(tmp_path, monkeypatch):
+    path = tmp_path / "workspace.json"
+    write(path, b"{}")
+    detector = FileChangeDetector(path)
+    detector.mark_synced()
+    monkeypatch.setattr(hash_module, "hash_file", lambda p: (_ for _ in ()).throw(AssertionError("hashed")))
+    assert not detector.has_changed()
+
+
+def test_content_change_is_detected(tmp_path):
+    path = tmp_path / "workspace.json"
+    write(path, b"{}")
+    detector = FileChangeDetector(path)
+    detector.mark_synced()
+    write(path, b'{"user_paths": []}')
+    assert detector.has_changed()
+
+
+def test_touch_with_same_content_is_not_a_change(tmp_path, monkeypatch):
+    path = tmp_path / "workspace.json"
+    write(path, b"{}")
+    detector = FileChangeDetector(path)
+    detector.mark_synced()
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert not detector.has_changed()
+    # The new signature is remembered, so the next check doesn't hash again
+    monkeypatch.setattr(hash_module, "hash_file", lambda p: (_ for _ in ()).throw(AssertionError("hashed")))
+    assert not detector.has_changed()
+
+
+def test_file_appearing_and_disappearing(tmp_path):
+    path = tmp_path / "workspace.json"
+    detector = FileChangeDetector(path)
+    detector.mark_synced()
+    assert not detector.has_changed()
+    write(path, b"{}")
+    assert detector.has_changed()
+    detector.mark_synced()
+    os.remove(path)
+    assert detector.has_changed()
+
+
+def test_mark_synced_with_what_was_read(tmp_path):
+    path = tmp_path / "workspace.json"
+    write(path, b"{}")
+    with open(path, "rb") as f:
+        data = f.read()
+        st = os.fstat(f.fileno())
+    detector = FileChangeDetector(path)
+    detector.mark_synced(hash_bytes(data), st)
+    assert not detector.has_changed()
+    write(path, b"[]")
+    assert detector.has_changed()
+
+
+def test_retarget(tmp_path):
+    first, second = tmp_path / "a.json", tmp_path / "b.json"
+    write(first, b"{}")
+    write(second, b"[]")
+    detector = FileChangeDetector(first)
+    detector.mark_synced()
+    detector.retarget(second)
+    assert not detector.has_changed()
@@ -0,0 +1,28 @@
+# tests/test_frontend.py
+from menu_manager.frontend import numbered_lines, parse_indices, selection_indices
+
+
+def test_selection_indices_keeps_valid_ints():
+    entries = ["a", "b", "c"]
+    assert selection_indices(entries, [2, 0]) == [2, 0]
+    assert selection_indices(entries, [3, -1]) == []
+
+
+def test_selection_indices_looks_up_strings_by_first_occurrence():
+    entries = ["a", "dup", "b", "dup"]
+    assert selection_indices(entries, ["dup", "b"]) == [1, 2]
+
+
+def test_selection_indices_drops_anything_else():
+    entries = ["a", "b"]
+    assert selection_indices(entries, ["typed text", None, True, 1.0, 1]) == [1]
+
+
+def test_selection_indices_mixed():
+    assert selection_indices(["x", "y", "z"], ["z", 0]) == [2, 0]
+
+
+def test_numbered_lines_parse_back():
+    entries = ["one", "two\tcolumns", " three"]
+    assert parse_indices(list(numbered_lines(entries))) == [0, 1, 2]
+    assert parse_indices(["custom text", "-1", ""]) == []
@@ -0,0 +1,122 @@
+# tests/test_fuzzy.py
+import itertools
+import time
+
+import pytest
+
+from filters import fuzzy
+from filters.fuzzy import FuzzyMatcher, score_positions
+
+
+def test_only_subsequences_match():
+    matcher = FuzzyMatcher(["src/main.py", "docs/index.md", "setup.py"])
+    assert sorted(matcher.match("spy")) == ["setup.py", "src/main.py"]
+    assert matcher.match("xyz") == []
+
+
+def test_file_name_placement_is_scored():
+    # The leftmost match in the directory part is scattered; the one in the file name isn't
+    matcher = FuzzyMatcher(["m_e_n_u/x.py", "m_e_n_u/menu.py"])
+    assert matcher.match("menu") == ["m_e_n_u/menu.py", "m_e_n_u/x.py"]
+
+
+def test_consecutive_beats_scattered():
+    matcher = FuzzyMatcher(["a_x_b_x_c.txt", "abc.txt"])
+    assert matcher.match("abc") == ["abc.txt", "a_x_b_x_c.txt"]
+
+
+def test_boundary_bonus():
+    assert score_positions("foo/bar", [4]) > score_positions("foobar", [3])
+    assert score_positions("fooBar", [3]) > score_positions("foobar", [3])
+
+
+def test_ties_go_to_shortest_then_list_order():
+    matcher = FuzzyMatcher(["xab", "yab", "ab_long", "ab"])
+    assert matcher.match_indices("ab")[0] == 3
+    assert matcher.match_indices("b") == [3, 0, 1, 2]
+
+
+def test_case_sensitive_only_with_uppercase():
+    matcher = FuzzyMatcher(["Makefile", "makefile.bak"])
+    assert sorted(matcher.match("make")) == ["Makefile", "makefile.bak"]
+    assert matcher.match("Make") == ["Makefile"]
+
+
+def test_all_terms_must_match():
+    matcher = FuzzyMatcher(["src/app/view.py", "src/app/model.py", "tests/view.py"])
+    assert matcher.match("app view") == ["src/app/view.py"]
+
+
+def test_long_entries_are_ranked_too():
+    # A better match must not be dropped just because many shorter entries also match
+    entries = [f"q_u_e_r_y{i:05}" for i in range(6000)] + ["deep/path/to/some/long/directory/name/query.txt"]
+    matcher = FuzzyMatcher(entries)
+    assert matcher.match("query", limit=1) == [entries[-1]]
+
+
+def test_narrowing_and_backspacing_give_fresh_results():
+    entries = ["alpha", "alphabet", "beta", "gamma"]
+    matcher = FuzzyMatcher(entries)
+    for query in ["a", "al", "alp", "al", "a", "b", "be", "a b"]:
+        assert sorted(matcher.match(query)) == sorted(FuzzyMatcher(entries).match(query)), query
+
+
+def test_limit_and_empty_query():
+    matcher = FuzzyMatcher(["a1", "a2", "a3"])
+    assert len(matcher.match("a", limit=2)) == 2
+    assert matcher.match("  ") == ["a1", "a2", "a3"]
+    assert matcher.match("", limit=1) == ["a1"]
+
+
+PARTS = ["src", "Src", "lib", "s r", "main", "a_b", "x-y", "abc", "README", "sr", "my file"]
+ROOTS = ["/", "/", "/", "", "\\", "~/"]  # Entries not starting with a separator can score higher
+
+
+def sample_entries():
+    entries = []
+    for i, (root, a, b) in enumerate(itertools.product(ROOTS, PARTS, PARTS)):
+        entries.append(f"{root}{a}/{b}{'.py' if i % 3 else ''}")
+        entries.append(f"{root}{PARTS[i % len(PARTS)]}/{a}/{b}.md")
+    return entries
+
+
+@pytest.mark.parametrize("query", ["s", "sr", "S", "a b", "s/r", "ma py", "abc", "my", "x\\y"])
+def test_limited_ranking_matches_the_full_one(query):
+    entries = sample_entries()
+    full = FuzzyMatcher(entries).match_indices(query)
+    for limit in (1, 7, 60, 500):
+        assert FuzzyMatcher(entries).match_indices(query, limit) == full[:limit], limit
+
+
+def test_limited_ranking_stops_early(monkeypatch):
+    entries = [f"/src/pkg{i}/mod{i}.py" for i in range(20000)] + [f"/x/s{i}.c" for i in range(100)]
+    matcher = FuzzyMatcher(entries)
+    scorer = matcher._scorer
+    scored = []
+
+    def counting(terms):
+        score = scorer(terms)
+        return lambda i: scored.append(i) or score(i)
+    monkeypatch.setattr(matcher, "_scorer", counting)
+    assert matcher.match("s", limit=50) == entries[-100:-50]  # "/x/s1.c" etc. are shortest
+    assert len(scored) < 1000
+
+
+def test_deadline_returns_the_best_scored_so_far():
+    entries = [f"/a{i:05}/b.txt" for i in range(5000)]
+    matcher = FuzzyMatcher(entries)
+    results = matcher.match("ab", limit=10, deadline=time.monotonic() - 1)
+    assert len(results) == 10 and set(results) <= set(entries)
+
+
+def test_count():
+    matcher = FuzzyMatcher(["src/a.py", "src/b.py", "docs/c.md"])
+    assert matcher.count("py") == 2
+    assert matcher.count("") == 3
+    assert matcher.count("zz") == 0
+
+
+def test_unbounded_entries():
+    entries = ["/a", "b", "/c d", "\\e", "/f\tg", "/h"]
+    assert fuzzy._unbounded(entries, [len(e) for e in entries]) == {1, 2, 4}
+    assert fuzzy._unbounded(["/a", "/b"], [2, 2]) == set()
@@ -0,0 +1,71 @@
+# tests/test_interface.py
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from menu_manager.interface import _connect, run_socket_client, signal_ready, wait_until_ready
+
+
+def test_unix_socket_without_server_fails_at_once(tmp_path):
+    start = time.monotonic()
+    with pytest.raises(ConnectionError):
+        _connect(socket.AF_UNIX, str(tmp_path / "none.sock"), time.monotonic() + 10, 0.05)
+    assert time.monotonic() - start < 1
+
+
+def test_client_reports_a_missing_daemon(tmp_path, capsys):
+    run_socket_client(None, None, "cli", socket_path=str(tmp_path / "none.sock"))
+    assert "No server listening" in capsys.readouterr().out
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_tcp_connect_retries_until_the_server_listens():
+    port = free_port()
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    def listen_later():
+        time.sleep(0.2)
+        listener.bind(("127.0.0.1", port))
+        listener.listen()
+    threading.Thread(target=listen_later).start()
+    with listener, _connect(socket.AF_INET, ("127.0.0.1", port), time.monotonic() + 5, 0.02):
+        pass
+
+
+def test_tcp_connect_gives_up_at_the_deadline():
+    port = free_port()
+    start = time.monotonic()
+    with pytest.raises(ConnectionError):
+        _connect(socket.AF_INET, ("127.0.0.1", port), time.monotonic() + 0.2, 0.02)
+    assert 0.2 <= time.monotonic() - start < 2
+
+
+def test_ready_handshake():
+    read_fd, write_fd = os.pipe()
+    signal_ready(write_fd)
+    wait_until_ready(read_fd, timeout=1)
+
+
+def test_server_dying_before_ready():
+    read_fd, write_fd = os.pipe()
+    os.close(write_fd)
+    with pytest.raises(ConnectionError):
+        wait_until_ready(read_fd, timeout=1)
+
+
+def test_ready_timeout():
+    read_fd, write_fd = os.pipe()
+    try:
+        with pytest.raises(TimeoutError):
+            wait_until_ready(read_fd, timeout=0.05)
+    finally:
+        os.close(write_fd)
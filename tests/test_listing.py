@@ -0,0 +1,232 @@
+# tests/test_listing.py
+import os
+import threading
+import time
+
+import pytest
+
+from filesystem import listing
+from filesystem.listing import DirectoryListingCache, LargeListing
+
+
+@pytest.fixture
+def root(tmp_path):
+    path = os.path.realpath(tmp_path)  # Watched listings are only trusted on symlink-free paths
+    os.mkdir(os.path.join(path, "sub"))
+    for name in ["b.txt", "A.txt"]:
+        open(os.path.join(path, name), "w").close()
+    return path
+
+
+def touch(*parts):
+    open(os.path.join(*parts), "w").close()
+
+
+def test_sorted_directories_first(root):
+    result = DirectoryListingCache().get(root)
+    assert result.entries == [("sub", True), ("A.txt", False), ("b.txt", False)]
+    assert result.display() == ["sub/", "A.txt", "b.txt"]
+
+
+def test_unwatched_listing_sees_changes(root):
+    cache = DirectoryListingCache()
+    cache.get(root)
+    touch(root, "new.txt")
+    assert "new.txt" in cache.get(root).files()
+
+
+def test_watched_listing_is_trusted_until_invalidated(root):
+    cache = DirectoryListingCache()
+    cache.watch(root)
+    first = cache.get(root)
+    touch(root, "new.txt")
+    assert cache.get(root) is first
+    cache.invalidate(os.path.join(root, "new.txt"))
+    assert "new.txt" in cache.get(root).files()
+
+
+def test_invalidate_drops_parent_and_children(root):
+    cache = DirectoryListingCache()
+    cache.watch(root)
+    sub = os.path.join(root, "sub")
+    cached_root, cached_sub = cache.get(root), cache.get(sub)
+    cache.invalidate(sub)
+    assert cache.get(root) is not cached_root
+    assert cache.get(sub) is not cached_sub
+
+
+def test_symlinked_path_is_not_trusted(root):
+    cache = DirectoryListingCache()
+    cache.watch(root)
+    link = os.path.join(root, "link")
+    os.symlink(os.path.join(root, "sub"), link)
+    cache.get(link)
+    touch(root, "sub", "new.txt")  # The watcher reports this under sub/, never under link/
+    cache.invalidate(os.path.join(root, "sub", "new.txt"))
+    assert cache.get(link).files() == ["new.txt"]
+
+
+def test_files_leave_out_special_entries(root):
+    os.symlink(os.path.join(root, "missing"), os.path.join(root, "broken"))
+    os.symlink(os.path.join(root, "A.txt"), os.path.join(root, "good"))
+    os.mkfifo(os.path.join(root, "fifo"))
+    result = DirectoryListingCache().get(root)
+    assert result.files() == ["A.txt", "b.txt", "good"]
+    assert result.is_dir("broken") is False and result.is_dir("fifo") is False
+    assert result.is_dir("nothing") is None
+
+
+@pytest.fixture
+def large(root, monkeypatch):
+    monkeypatch.setattr(listing, "LARGE_DIRECTORY_ENTRIES", 50)
+    monkeypatch.setattr(listing, "PREVIEW_ENTRIES", 10)
+    monkeypatch.setattr(listing, "RUN_ENTRIES", 60)  # Still more than one run
+    for i in range(120):
+        touch(root, f"f{i:03}.txt")
+    for i in range(5):
+        os.mkdir(os.path.join(root, f"d{i}"))
+    return root
+
+
+def test_large_listing(large):
+    result = DirectoryListingCache().get(large)
+    assert isinstance(result, LargeListing)
+    assert len(result.entries) == 10
+    assert result.entries == sorted(result.entries, key=listing._sort_key)
+    assert result.done.wait(5)
+    entries = list(result.iter_entries())
+    expected = [(f"d{i}", True) for i in range(5)] + [("sub", True), ("A.txt", False), ("b.txt", False)]
+    expected += [(f"f{i:03}.txt", False) for i in range(120)]
+    assert entries == expected
+    assert len(result) == 128
+    assert result.dirs() == [f"d{i}" for i in range(5)] + ["sub"]
+    assert len(result.files()) == 122
+    assert result.matching("f11*") == [(f"f11{i}.txt", False) for i in range(10)]
+
+
+def test_large_listing_is_kept_while_sorting(large, monkeypatch):
+    release = threading.Event()
+    spill = listing._spill
+    def slow_spill(path, entries):
+        release.wait(5)
+        spill(path, entries)
+    monkeypatch.setattr(listing, "_spill", slow_spill)
+    cache = DirectoryListingCache()
+    first = cache.get(large)
+    assert first.racy  # Just written, so it would otherwise be read again
+    assert cache.get(large) is first
+    release.set()
+    assert first.done.wait(5)
+    assert cache.get(large) is not first
+
+
+def test_large_listing_sort_failure_is_raised(large, monkeypatch):
+    def fail(path, entries):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(listing, "_spill", fail)
+    result = DirectoryListingCache().get(large)
+    assert result.done.wait(5)
+    with pytest.raises(RuntimeError):
+        result.files()
+
+
+class BlockingScans:
+    """Stands in for scan_directory: records every read, and holds reads of `blocked` until released."""
+    def __init__(self, monkeypatch, blocked=()):
+        self.scan = listing.scan_directory
+        self.blocked = set(blocked)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.scanned = []
+        monkeypatch.setattr(listing, "scan_directory", self)
+        monkeypatch.setattr(listing, "PREFETCH_WORKERS", 1)
+
+    def __call__(self, path):
+        self.scanned.append(os.path.basename(path))
+        if path in self.blocked:
+            self.started.set()
+            assert self.release.wait(5)
+        return self.scan(path)
+
+
+@pytest.fixture
+def dirs(root):
+    paths = {}
+    for name in ["one", "two", "three"]:
+        paths[name] = os.path.join(root, name)
+        os.mkdir(paths[name])
+        touch(paths[name], f"{name}.txt")
+    return paths
+
+
+def drain(cache):
+    cache._executor.shutdown(wait=True)
+    cache._executor = None
+
+
+def test_prefetched_listing_is_not_read_again(dirs, monkeypatch):
+    scans = BlockingScans(monkeypatch)
+    cache = DirectoryListingCache()
+    cache.watch(os.path.dirname(dirs["one"]))  # Freshly made directories are only trusted when watched
+    cache.prefetch([dirs["one"], dirs["two"]])
+    drain(cache)
+    assert sorted(scans.scanned) == ["one", "two"]
+    assert cache.get(dirs["two"]).files() == ["two.txt"]
+    assert len(scans.scanned) == 2
+    assert not cache._inflight and not cache._wanted
+
+
+def test_get_waits_for_a_running_prefetch(dirs, monkeypatch):
+    scans = BlockingScans(monkeypatch, blocked=[dirs["one"]])
+    cache = DirectoryListingCache()
+    cache.prefetch([dirs["one"]])
+    assert scans.started.wait(5)
+    result = []
+    reader = threading.Thread(target=lambda: result.append(cache.get(dirs["one"])))
+    reader.start()
+    reader.join(0.1)
+    assert reader.is_alive()  # Waiting on the read in progress
+    scans.release.set()
+    reader.join(5)
+    assert result[0].files() == ["one.txt"]
+    assert scans.scanned == ["one"]
+    drain(cache)
+
+
+def test_get_does_not_queue_behind_other_prefetches(dirs, monkeypatch):
+    scans = BlockingScans(monkeypatch, blocked=[dirs["one"]])
+    cache = DirectoryListingCache()
+    cache.prefetch([dirs["one"], dirs["two"]])  # One worker: "two" waits behind "one"
+    assert scans.started.wait(5)
+    start = time.monotonic()
+    assert cache.get(dirs["two"]).files() == ["two.txt"]  # Read here, not after "one"
+    assert time.monotonic() - start < 1
+    assert dirs["two"] not in cache._inflight and dirs["two"] not in cache._wanted
+    scans.release.set()
+    drain(cache)
+    assert scans.scanned == ["one", "two"]
+
+
+def test_newer_menu_drops_queued_prefetches(dirs, monkeypatch):
+    scans = BlockingScans(monkeypatch, blocked=[dirs["one"]])
+    cache = DirectoryListingCache()
+    cache.prefetch([dirs["one"], dirs["two"]])
+    assert scans.started.wait(5)
+    cache.prefetch([dirs["three"]])
+    scans.release.set()
+    drain(cache)
+    assert scans.scanned == ["one", "three"]
+    assert not cache._inflight and not cache._wanted
+
+
+def test_recently_opened_directories_are_prefetched_first(dirs, monkeypatch):
+    scans = BlockingScans(monkeypatch, blocked=[dirs["one"]])
+    cache = DirectoryListingCache()
+    cache.get(dirs["three"])
+    cache.invalidate(dirs["three"])
+    cache.prefetch([dirs["one"]])
+    assert scans.started.wait(5)
+    cache.prefetch([dirs["one"], dirs["two"], dirs["three"]])
+    scans.release.set()
+    drain(cache)
+    assert scans.scanned == ["three", "one", "three", "two"]
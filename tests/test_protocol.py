@@ -0,0 +1,228 @@
+# tests/test_protocol.py
+import json
+import socket
+import threading
+
+import pytest
+
+from menu_manager import protocol
+from menu_manager.payload import recv_frame, send_frame
+from menu_manager.protocol import ClientChannel, EntryStream, MenuChannel
+
+
+class Server:
+    """Runs MenuChannel.exchange() calls on a thread and collects the selections they return."""
+    def __init__(self, conn):
+        self.conn = conn
+        self.channel = None
+        self.selections = []
+        self._thread = None
+
+    def run(self, menus):
+        def serve():
+            self.channel = MenuChannel.accept(self.conn, window=5)
+            for entries, prompt, kwargs in menus:
+                self.selections.append(self.channel.exchange(entries, prompt, **kwargs))
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+
+    def join(self):
+        self._thread.join(5)
+        assert not self._thread.is_alive()
+
+
+@pytest.fixture
+def pair():
+    server_sock, client_sock = socket.socketpair()
+    yield Server(server_sock), ClientChannel(client_sock)
+    server_sock.close()
+    client_sock.close()
+
+
+def answer(client, pick):
+    """Receives one menu, answers with `pick(entries)` and returns the menu."""
+    menu = client.recv_menu()
+    entries = menu["entries"]
+    if isinstance(entries, EntryStream):
+        entries = menu["entries"] = list(entries)
+    client.send_selection(pick(entries))
+    return menu
+
+
+def test_round_trip(pair):
+    server, client = pair
+    server.run([(["alpha", "beta", "gamma"], "Pick", {"multi_select": True})])
+    client.hello()
+    menu = answer(client, lambda entries: entries[1:])
+    server.join()
+    assert menu["entries"] == ["alpha", "beta", "gamma"]
+    assert menu["prompt"] == "Pick" and menu["multi_select"] is True
+    assert server.selections == [["beta", "gamma"]]
+    assert client.version == server.channel.version == protocol.PROTOCOL_VERSION
+
+
+def test_indices_selection(pair):
+    server, client = pair
+    server.run([(["a", "b", "c"], "Pick", {"indices": True})])
+    client.hello()
+    menu = answer(client, lambda entries: [2])
+    server.join()
+    assert menu["indices"] is True
+    assert server.selections == [[2]]
+
+
+def test_repeated_list_is_reused(pair):
+    server, client = pair
+    entries = [f"file{i}" for i in range(100)]
+    server.run([(entries, "Files", {}), (entries, "Files", {})])
+    client.hello()
+    first = answer(client, lambda e: [e[0]])
+    second = answer(client, lambda e: [e[-1]])
+    server.join()
+    assert "reuse" not in first and second["reuse"] is True
+    assert second["entries"] == entries
+    assert server.selections == [["file0"], ["file99"]]
+
+
+@pytest.mark.parametrize("lists", [([], [""]), ([""], []), (["", ""], [""])])
+def test_lists_that_join_the_same_are_told_apart(pair, lists):
+    server, client = pair
+    server.run([(entries, "Files", {}) for entries in lists])
+    client.hello()
+    menus = [answer(client, lambda e: []) for _ in lists]
+    server.join()
+    assert [list(m["entries"]) for m in menus] == list(lists)
+    assert "reuse" not in menus[1]
+
+
+def test_small_change_is_sent_as_delta(pair):
+    server, client = pair
+    before = [f"file{i:03}" for i in range(100)]
+    after = sorted(before[1:] + ["file050b"])
+    server.run([(before, "Files", {}), (after, "Files", {})])
+    client.hello()
+    answer(client, lambda e: [])
+    menu = answer(client, lambda e: [])
+    server.join()
+    assert "base" in menu
+    assert menu["entries"] == after
+
+
+def test_entries_with_newlines_go_as_json(pair):
+    server, client = pair
+    entries = ["one\ntwo", "three"]
+    server.run([(entries, "Pick", {})])
+    client.hello()
+    menu = answer(client, lambda e: [e[0]])
+    server.join()
+    assert menu["entries"] == entries
+    assert server.selections == [["one\ntwo"]]
+
+
+def test_long_list_is_streamed(pair, monkeypatch):
+    monkeypatch.setattr(protocol, "STREAM_MIN_ENTRIES", 10)
+    monkeypatch.setattr(protocol, "STREAM_CHUNK_ENTRIES", 7)
+    server, client = pair
+    entries = [f"entry{i}" for i in range(50)]
+    server.run([(entries, "Pick", {}), (entries, "Pick", {})])
+    client.hello()
+    first = client.recv_menu()
+    assert isinstance(first["entries"], EntryStream)
+    assert next(iter(first["entries"])) == "entry0"
+    client.send_selection(["entry3"])  # Drains the rest of the stream first
+    second = client.recv_menu()
+    assert isinstance(second["entries"], EntryStream) and "list" not in second  # Sent in full again
+    assert list(second["entries"]) == entries
+    client.send_selection(["entry49"])
+    server.join()
+    assert server.selections == [["entry3"], ["entry49"]]
+    assert not client.lists._lists and not server.channel.lists._lists
+
+
+def test_stray_hello_is_not_taken_for_a_selection(pair):
+    server, client = pair
+    server.run([(["a", "b"], "Pick", {})])
+    client.hello()
+    client.recv_menu()
+    send_frame(client.sock, json.dumps({"hello": {"version": 2}}).encode(), 'client')
+    client.send_selection(["b"])
+    server.join()
+    assert server.selections == [["b"]]
+
+
+def test_client_hanging_up_answers_nothing(pair):
+    server, client = pair
+    server.run([(["a"], "Pick", {})])
+    client.hello()
+    client.recv_menu()
+    client.sock.shutdown(socket.SHUT_WR)
+    server.join()
+    assert server.selections == [[]]
+    assert server.channel.closed
+
+
+def test_query_capability_is_negotiated(pair):
+    server, client = pair
+    server.run([])
+    client.hello(queries=True)
+    server.join()
+    assert server.channel.queries is True
+
+
+def test_silent_client_is_version_1():
+    server_sock, client_sock = socket.socketpair()
+    with server_sock, client_sock:
+        assert MenuChannel.read_hello(server_sock, window=0.05) is None
+
+
+def test_client_without_hello_is_served_v1_json():
+    server_sock, client_sock = socket.socketpair()
+    with server_sock, client_sock:
+        server = Server(server_sock)
+        server.run([(["a", "b"], "Pick", {})])
+        # An old client: reads the first menu without saying anything, then answers it
+        menu = json.loads(recv_frame(client_sock, 'client'))
+        assert menu["entries"] == ["a", "b"] and menu["prompt"] == "Pick"
+        send_frame(client_sock, json.dumps({"selection": ["b"]}).encode(), 'client')
+        server.join()
+        assert server.channel.version == 1
+        assert server.selections == [["b"]]
+
+
+def test_late_hello_stays_on_version_1():
+    server_sock, client_sock = socket.socketpair()
+    with server_sock, client_sock:
+        channel = MenuChannel.accept(server_sock, window=0.05)
+        client = ClientChannel(client_sock)
+        client.hello()
+        assert channel.version == 1
+        result = []
+        thread = threading.Thread(target=lambda: result.append(channel.exchange(["x"], "Pick")))
+        thread.start()
+        menu = client.recv_menu()
+        assert menu["entries"] == ["x"] and client.version == 1
+        client.send_selection(["x"])
+        thread.join(5)
+        assert result == [["x"]]
+
+
+def test_missing_hello_is_rejected():
+    server_sock, client_sock = socket.socketpair()
+    with server_sock, client_sock:
+        send_frame(client_sock, json.dumps({"selection": ["a"]}).encode(), 'client')
+        with pytest.raises(ConnectionError):
+            MenuChannel.read_hello(server_sock, window=1)
+
+
+@pytest.mark.parametrize("base, entries", [
+    (["a", "b", "c", "d"], ["a", "c", "d", "e"]),
+    (["b", "d", "f", "h"], ["a", "b", "d", "f", "h"]),
+])
+def test_make_delta_round_trips(base, entries):
+    adds, removes, order = protocol.make_delta(base, entries)
+    assert protocol.apply_delta(base, adds, removes, order) == entries
+
+
+def test_make_delta_refuses_duplicates_and_reordering():
+    assert protocol.make_delta(["a", "a"], ["a", "a", "b"]) is None
+    assert protocol.make_delta(["a", "b", "c", "d"], ["d", "c", "b", "a"]) is None
@@ -0,0 +1,68 @@
+# tests/test_query.py
+import threading
+
+import pytest
+
+from filters import query
+from filters.query import QueryIndex
+
+
+def test_snapshot_is_sorted_and_kept_until_invalidated():
+    paths = {"/b", "/a", "/c"}
+    index = QueryIndex(lambda: paths)
+    first = index.snapshot()
+    assert first == ["/a", "/b", "/c"]
+    paths.add("/d")
+    assert index.snapshot() is first  # Nobody said the collection changed
+    index.invalidate()
+    assert index.snapshot() == ["/a", "/b", "/c", "/d"]
+    assert first == ["/a", "/b", "/c"]  # Replaced, not changed in place
+
+
+@pytest.mark.parametrize("merge_max", [1000, 0])
+def test_changes_are_merged_or_resorted(monkeypatch, merge_max):
+    monkeypatch.setattr(query, "MERGE_MAX_CHANGES", merge_max)
+    paths = {f"/p{i:03}" for i in range(0, 100, 2)}
+    index = QueryIndex(lambda: paths, threading.Lock())
+    index.snapshot()
+    paths.difference_update({"/p000", "/p050"})
+    paths.update({"/p001", "/p099", "/a"})
+    index.invalidate()
+    assert index.snapshot() == sorted(paths)
+
+
+def test_matcher_survives_invalidation_without_changes():
+    paths = {"src/main.py", "docs/index.md"}
+    index = QueryIndex(lambda: paths)
+    matcher = index.matcher()
+    index.invalidate()
+    assert index.matcher() is matcher  # Its memo of recent queries is kept
+    paths.add("src/util.py")
+    index.invalidate()
+    assert index.matcher() is not matcher
+
+
+def test_top():
+    paths = {f"/src/file{i}.py" for i in range(10)} | {"/docs/readme.md"}
+    index = QueryIndex(lambda: paths)
+    assert index.top("readme") == ["/docs/readme.md"]
+    assert index.top("", limit=3) == sorted(paths)[:3]
+    assert len(index.top("py", limit=4)) == 4
+    assert len(index) == 11
+
+
+def test_cache_updater_reports_changes(tmp_path):
+    pytest.importorskip("watchdog")
+    from watchdog.events import FileCreatedEvent, FileDeletedEvent
+    from menu_manager.watcher import CacheUpdater
+    cache = set()
+    index = QueryIndex(lambda: cache)
+    index.snapshot()
+    updater = CacheUpdater(cache, on_change=index.invalidate)
+    path = tmp_path / "new.txt"
+    path.write_text("")
+    updater.on_created(FileCreatedEvent(str(path)))
+    assert index.snapshot() == [str(path.resolve())]
+    path.unlink()
+    updater.on_deleted(FileDeletedEvent(str(path)))
+    assert index.snapshot() == []
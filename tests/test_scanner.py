@@ -0,0 +1,42 @@
+# tests/test_scanner.py
+import os
+from pathlib import Path
+
+from state.scanner import find_missing_paths
+
+
+def test_missing_paths(tmp_path):
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "dir" / "file").write_text("")
+    (tmp_path / "other").mkdir()
+    present = [tmp_path / "dir", tmp_path / "dir" / "file", tmp_path / "other"]
+    absent = [tmp_path / "gone", tmp_path / "dir" / "gone", tmp_path / "nodir" / "file"]
+    assert find_missing_paths(present + absent) == set(absent)
+
+
+def test_symlinks_exist_only_with_their_target(tmp_path):
+    (tmp_path / "target").write_text("")
+    os.symlink(tmp_path / "target", tmp_path / "good")
+    os.symlink(tmp_path / "nowhere", tmp_path / "broken")
+    assert find_missing_paths([tmp_path / "good", tmp_path / "broken"]) == {tmp_path / "broken"}
+
+
+def test_dotdot_and_root(tmp_path):
+    (tmp_path / "dir").mkdir()
+    paths = [tmp_path / "dir" / "..", tmp_path / "missing" / "..", Path("/")]
+    assert find_missing_paths(paths) == {tmp_path / "missing" / ".."}
+
+
+def test_path_under_a_file(tmp_path):
+    (tmp_path / "file").write_text("")
+    assert find_missing_paths([tmp_path / "file" / "child"]) == {tmp_path / "file" / "child"}
+
+
+def test_agrees_with_path_exists(tmp_path):
+    (tmp_path / "d").mkdir()
+    (tmp_path / "f").write_text("")
+    os.symlink(tmp_path / "d", tmp_path / "link")
+    os.mkfifo(tmp_path / "fifo")
+    names = ["d", "f", "link", "fifo", "x", "d/..", "link/..", "f/..", "link/y"]
+    paths = [tmp_path / n for n in names]
+    assert find_missing_paths(paths) == {p for p in paths if not p.exists()}
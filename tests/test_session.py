@@ -0,0 +1,132 @@
+# tests/test_session.py
+import socket
+import threading
+
+from menu_manager.protocol import ClientChannel, MenuChannel
+from menu_manager.session import SessionRegistry, read_session_token, write_session_token
+
+
+class ScriptedManager:
+    """Shows `prompts` one after another and records what each answered."""
+    def __init__(self, prompts, query=None):
+        self.prompts = prompts
+        self.query = query
+        self.answers = []
+        self.socket_conn = None
+        self.menu_structure_callable = None
+        self.done = threading.Event()
+
+    def navigate_menu(self, _):
+        for prompt in self.prompts:
+            self.answers.append(self.socket_conn.exchange(["a", "b"], prompt, query=self.query))
+        self.done.set()
+
+
+class Connection:
+    """One client connection, served by the registry on a thread as the socket servers do."""
+    def __init__(self, registry, session=None, queries=False):
+        server_sock, client_sock = socket.socketpair()
+        self.client = ClientChannel(client_sock, session=session)
+        self.client.hello(queries=queries)
+
+        def serve():
+            with server_sock:
+                registry.serve(server_sock, MenuChannel.read_hello(server_sock, window=5))
+        self.thread = threading.Thread(target=serve, daemon=True)
+        self.thread.start()
+
+    def answer(self, selection):
+        menu = self.client.recv_menu()
+        self.client.send_selection(selection)
+        return menu
+
+    def hang_up(self):
+        self.client.sock.close()
+
+    def served(self, timeout=5):
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+
+def test_client_resumes_the_pending_menu():
+    manager = ScriptedManager(["One", "Two"])
+    registry = SessionRegistry(lambda: manager, timeout=5)
+    first = Connection(registry)
+    assert first.answer(["a"])["prompt"] == "One"
+    assert first.client.recv_menu()["prompt"] == "Two"
+    token = first.client.session
+    first.hang_up()  # Before answering "Two"
+    assert first.served()
+
+    second = Connection(registry, session=token)
+    assert second.answer(["b"])["prompt"] == "Two"  # Shown again to the new client
+    assert manager.done.wait(5)
+    assert manager.answers == [["a"], ["b"]]
+    assert second.client.session == token
+    assert second.served() and registry.finished.wait(5)
+
+
+def test_newest_client_of_a_session_wins():
+    manager = ScriptedManager(["One"])
+    registry = SessionRegistry(lambda: manager, timeout=5)
+    first = Connection(registry)
+    first.client.recv_menu()
+    second = Connection(registry, session=first.client.session)
+    assert first.served()  # Released without answering
+    assert second.answer(["a"])["prompt"] == "One"
+    assert manager.done.wait(5) and manager.answers == [["a"]]
+    first.hang_up()
+
+
+def test_unclaimed_session_expires():
+    managers = []
+
+    def factory():
+        managers.append(ScriptedManager(["One"]))
+        return managers[-1]
+    registry = SessionRegistry(factory, timeout=0.05)
+    first = Connection(registry)
+    first.client.recv_menu()
+    token = first.client.session
+    first.hang_up()
+    assert registry.finished.wait(5)
+    assert managers[0].answers == [[]]  # The menus unwind
+
+    late = Connection(registry, session=token)
+    assert late.client.recv_menu()["prompt"] == "One"
+    assert late.client.session != token and len(managers) == 2
+    late.hang_up()
+
+
+def test_query_menu_is_not_resumed_by_a_client_that_cannot_query():
+    manager = ScriptedManager(["Search"], query="q")
+    registry = SessionRegistry(lambda: manager, timeout=5)
+    first = Connection(registry, queries=True)
+    assert first.client.recv_menu()["query"] == "q"
+    token = first.client.session
+    first.hang_up()
+    second = Connection(registry, session=token)
+    assert manager.done.wait(5)
+    assert manager.answers == [[]]
+    assert second.served()
+    second.hang_up()
+
+
+def test_single_registry_resumes_without_a_token():
+    manager = ScriptedManager(["One"])
+    registry = SessionRegistry(lambda: manager, timeout=5, single=True)
+    first = Connection(registry)
+    first.client.recv_menu()
+    first.hang_up()
+    second = Connection(registry)
+    assert second.answer(["b"])["prompt"] == "One"
+    assert manager.done.wait(5) and manager.answers == [["b"]]
+
+
+def test_session_token_file(tmp_path):
+    path = tmp_path / "session"
+    assert read_session_token(path) is None
+    write_session_token(path, "abc")
+    assert read_session_token(path) == "abc"
+    write_session_token(path, None)
+    assert read_session_token(path) is None
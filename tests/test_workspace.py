@@ -0,0 +1,179 @@
+# tests/test_workspace.py
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("watchdog")
+pytest.importorskip("pathspec")
+pytest.importorskip("pyperclip")
+
+from state.workspace import Workspace
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    root = Path(os.path.realpath(tmp_path))
+    monkeypatch.chdir(root)  # The cache file lives in the working directory
+    for name in ["a", "b", "c"]:
+        (root / name).mkdir()
+        (root / name / "file.txt").write_text(name)
+    return root
+
+
+def wait_for(condition, timeout=5):
+    """Background indexing runs on its own thread."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def write_config(path, user_paths=(), ignored_paths=(), patterns=()):
+    data = {
+        "user_paths": [str(p) for p in user_paths],
+        "ignored_paths": [str(p) for p in ignored_paths],
+        "generator_blacklist_patterns": list(patterns),
+    }
+    path.write_text(json.dumps(data))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))  # Don't depend on mtime granularity
+
+
+def test_external_edit_is_applied_as_a_diff(tree):
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a", tree / "b"])
+    workspace = Workspace(config, paths=[str(tree / "c")], cwd=tree)
+    assert set(workspace.list()) == {tree / "a", tree / "b", tree / "c"}
+
+    write_config(config, user_paths=[tree / "b", tree / "c"], ignored_paths=[tree / "a"])
+    assert set(workspace.list()) == {tree / "b", tree / "c"}
+    assert workspace._user_paths == {tree / "b", tree / "c"}
+    assert workspace._generated_paths == {tree / "c"}  # This session's CLI paths are kept
+    assert workspace._ignored_paths == {tree / "a"}
+
+
+def test_external_blacklist_edit(tree):
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a", tree / "b"])
+    workspace = Workspace(config, cwd=tree)
+    write_config(config, user_paths=[tree / "a", tree / "b"], patterns=["/b$"])
+    assert set(workspace.list()) == {tree / "a"}
+    assert workspace.get_generator_blacklist_patterns() == ["/b$"]
+
+
+def test_own_save_is_not_an_external_change(tree, monkeypatch):
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a"])
+    workspace = Workspace(config, cwd=tree)
+    workspace.save()
+    monkeypatch.setattr(workspace, "_reload_config_from_json", lambda: pytest.fail("reloaded own save"))
+    workspace.list()
+
+
+def test_only_changed_roots_are_watched_and_indexed(tree):
+    from state.state import State
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a", tree / "b"])
+    workspace = Workspace(config, cwd=tree)
+    workspace.set_state(State(workspace=workspace))
+    workspace.initialize_cache()
+    assert set(workspace._watches) == {tree / "a", tree / "b"}
+    indexed = []
+    workspace._index_roots = indexed.append
+
+    write_config(config, user_paths=[tree / "b", tree / "c"])
+    workspace.list()
+    assert set(workspace._watches) == {tree / "b", tree / "c"}
+    wait_for(lambda: indexed)
+    assert indexed == [{tree / "c"}]
+    assert not any(e.startswith(str(tree / "a")) for e in workspace.cache)
+
+
+@pytest.fixture
+def indexed_workspace(tree):
+    from state.state import State
+    (tree / "a" / "build").mkdir()
+    (tree / "a" / "build" / "out.o").write_text("")
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a", tree / "b"], patterns=["/build$"])
+    workspace = Workspace(config, cwd=tree)
+    workspace.set_state(State(workspace=workspace))
+    workspace.initialize_cache()
+    return workspace
+
+
+def test_blacklist_prunes_and_records_subtrees(indexed_workspace, tree):
+    assert str(tree / "a" / "file.txt") in indexed_workspace.cache
+    assert not any("build" in e for e in indexed_workspace.cache)
+    assert indexed_workspace._pruned == {tree / "a" / "build"}
+    saved = json.loads(Path(".cache.json").read_text())
+    assert saved["pruned"] == [str(tree / "a" / "build")]
+
+
+def test_removed_pattern_expands_only_what_it_pruned(indexed_workspace, tree):
+    full_rescans = []
+    indexed_workspace._index_roots = full_rescans.append
+    indexed_workspace.remove_generator_blacklist_pattern("/build$")
+    wait_for(lambda: str(tree / "a" / "build" / "out.o") in indexed_workspace.cache)
+    assert str(tree / "a" / "build") in indexed_workspace.cache
+    assert full_rescans == []
+    assert indexed_workspace._pruned == set()
+
+
+def test_added_pattern_drops_and_records_subtrees(indexed_workspace, tree):
+    indexed_workspace.add_generator_blacklist_pattern("/a/file")
+    assert str(tree / "a" / "file.txt") not in indexed_workspace.cache
+    assert tree / "a" / "file.txt" in indexed_workspace._pruned
+    indexed_workspace.remove_generator_blacklist_pattern("/a/file")
+    wait_for(lambda: str(tree / "a" / "file.txt") in indexed_workspace.cache)
+
+
+def test_old_cache_file_falls_back_to_reindexing(tree):
+    from state.state import State
+    Path(".cache.json").write_text(json.dumps([str(tree / "a")]))
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a"], patterns=["/a/file"])
+    workspace = Workspace(config, cwd=tree)
+    workspace.set_state(State(workspace=workspace))
+    workspace.initialize_cache()
+    assert workspace.cache == {str(tree / "a")} and workspace._pruned is None
+    workspace.remove_generator_blacklist_pattern("/a/file")
+    wait_for(lambda: str(tree / "a" / "file.txt") in workspace.cache)
+
+
+def test_auto_save_is_debounced_and_flushed(tree):
+    from state.state import State
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a"])
+    workspace = Workspace(config, cwd=tree)
+    state = State(workspace=workspace)
+    workspace.set_state(state)
+    state.auto_save_enabled = True
+    workspace._autosave.delay = 60
+    workspace.add(["b"], root_dir=tree)
+    assert state.is_dirty and workspace._autosave.pending
+    assert str(tree / "b") not in config.read_text()
+    workspace.flush_autosave()
+    assert str(tree / "b") in json.loads(config.read_text())["user_paths"]
+    assert not state.is_dirty
+
+
+def test_vanished_user_paths_are_dropped_in_the_background(tree):
+    config = tree / "workspace.json"
+    write_config(config, user_paths=[tree / "a", tree / "gone"])
+    workspace = Workspace(config, cwd=tree)
+    workspace._path_validation.join(5)
+    assert set(workspace.list()) == {tree / "a"}
+    assert workspace._initial_user_paths == {tree / "a"}  # Not a change to save
+
+
+def test_query_index_follows_the_cache(indexed_workspace, tree):
+    index = indexed_workspace.get_query_index()
+    assert str(tree / "a" / "file.txt") in index.snapshot()
+    indexed_workspace.add_generator_blacklist_pattern("/a/file")
+    assert str(tree / "a" / "file.txt") not in index.snapshot()
+    indexed_workspace.remove_generator_blacklist_pattern("/build$")
+    wait_for(lambda: str(tree / "a" / "build" / "out.o") in index.snapshot())
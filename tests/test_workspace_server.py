@@ -0,0 +1,104 @@
+# tests/test_workspace_server.py
+import json
+import selectors
+import socket
+import time
+
+import pytest
+
+from core.core_service import WorkspaceClient, WorkspaceServer
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = WorkspaceServer(str(tmp_path / "workspace.sock"))
+    server.start()
+    yield server
+    server.sock.close()
+
+
+def test_clients_get_a_snapshot_then_deltas(server):
+    first = WorkspaceClient(server.socket_path)
+    wait_for(lambda: first.seq == 0)
+    first.add_file("/a")
+    first.add_file("/b")
+    first.remove_file("/a")
+    wait_for(lambda: first.seq == 3)
+    assert first.workspace == {"/b"}
+
+    second = WorkspaceClient(server.socket_path)
+    wait_for(lambda: second.seq == 3)
+    assert second.workspace == {"/b"}
+    second.add_file("/b")  # Not a change, so no delta
+    second.add_file("/c")
+    wait_for(lambda: first.seq == 4 and second.seq == 4)
+    assert first.workspace == second.workspace == {"/b", "/c"}
+
+
+def test_gap_in_deltas_triggers_a_resync(server):
+    client = WorkspaceClient(server.socket_path)
+    wait_for(lambda: client.seq == 0)
+    client.add_file("/a")
+    wait_for(lambda: "/a" in server.workspace)
+    client.handle_message(json.dumps({"type": "delta", "seq": 5, "added": ["/lost"], "removed": []}).encode())
+    # Deltas are ignored until the snapshot arrives (which may be right away)
+    client.handle_message(json.dumps({"type": "delta", "seq": 6, "added": ["/ignored"], "removed": []}).encode())
+    wait_for(lambda: client.seq == 1)
+    assert client.workspace == {"/a"}
+    assert server.seq == 1
+
+
+def attach(server):
+    """Registers one end of a socketpair as a client without starting the event loop."""
+    conn, peer = socket.socketpair()
+    conn.setblocking(False)
+    server.sel.register(conn, selectors.EVENT_READ, server.on_event)
+    server.clients[conn] = b""
+    server.outbox[conn] = bytearray()
+    return conn, peer
+
+
+def test_unsent_bytes_wait_for_the_socket(tmp_path):
+    server = WorkspaceServer(str(tmp_path / "unused.sock"))
+    conn, peer = attach(server)
+    with peer:
+        big = "x" * 100_000
+        while not server.outbox[conn]:
+            server.broadcast_delta(added=[big])
+        assert server.sel.get_key(conn).events & selectors.EVENT_WRITE
+        received = bytearray()
+        peer.settimeout(1)
+        while server.outbox[conn]:
+            received += peer.recv(1 << 20)
+            server.on_event(conn, selectors.EVENT_WRITE)
+        assert server.sel.get_key(conn).events == selectors.EVENT_READ
+        while received.count(b"\n") < server.seq:
+            received += peer.recv(1 << 20)
+        seqs = [json.loads(line)["seq"] for line in received.splitlines()]
+        assert seqs == list(range(1, server.seq + 1))
+
+
+def test_lagging_client_is_dropped(tmp_path):
+    server = WorkspaceServer(str(tmp_path / "unused.sock"))
+    conn, peer = attach(server)
+    other, other_peer = attach(server)
+    with peer, other_peer:
+        other_peer.setblocking(False)
+        big = "x" * 100_000
+        while conn in server.clients:
+            server.broadcast_delta(added=[big])
+            try:
+                while other_peer.recv(1 << 20):  # This one keeps up
+                    pass
+            except BlockingIOError:
+                pass
+            server.flush(other)
+        assert conn.fileno() == -1 and conn not in server.outbox
+        assert other in server.clients